@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Admission control for OCR
+At most max_in_flight extractions run OCR at once, whether they come from a
+job thread, the synchronous API or a batch upload. The rest wait in
+per-client queues that are served round-robin, so one parent uploading a
+stack of worksheets cannot push everyone else to the back. A waiter that is
+still queued at its deadline (deadline_seconds after its request arrived) is
+shed with AdmissionRejected instead of running OCR nobody is waiting for.
+
+The client and arrival time come from a context variable set per request
+(set_client); background jobs copy the submitting request's context, so a
+job keeps its client and its original arrival time.
+"""
+
+import math
+import time
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# (client ID, arrival time) of the request being handled in this context
+_client = contextvars.ContextVar('admission_client', default=(None, None))
+
+
+def set_client(client_id, arrived_at=None):
+    """Attribute OCR admitted from this context to client_id; returns a token for reset_client"""
+    return _client.set((client_id, arrived_at if arrived_at is not None else time.time()))
+
+
+def reset_client(token):
+    _client.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Raised when an extraction is not admitted (queue full or deadline passed)"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Too many OCR requests ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('client', 'slots', 'granted')
+
+    def __init__(self, client, slots):
+        self.client = client
+        self.slots = slots
+        self.granted = False
+
+
+class AdmissionController:
+    """Bounded OCR concurrency with per-client round-robin queues and deadlines"""
+
+    def __init__(self, max_in_flight, max_queued=32, max_queued_per_client=4, deadline_seconds=60):
+        """
+        Args:
+            max_in_flight (int): Extractions allowed to run OCR at the same time
+            max_queued (int): Waiters across all clients before new ones are rejected at once
+            max_queued_per_client (int): Waiters one client may have
+            deadline_seconds (float): Shed waiters this long after their request arrived (None = wait forever)
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.deadline_seconds = deadline_seconds
+        self._lock = threading.Lock()
+        self._granted = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._queues = OrderedDict()  # client -> deque of waiters; order = round-robin turn
+        self._queued = 0
+        self._avg_seconds = None
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'client_queue_full': 0, 'deadline': 0}
+
+    @contextmanager
+    def admit(self, slots=1):
+        """
+        Hold OCR slots for the current client for the duration of the block
+        Args:
+            slots (int): Slots to hold (a batch that fans out to several workers holds several)
+        Raises:
+            AdmissionRejected: If the queues are full or the deadline passes while waiting
+        """
+        client, arrived_at = _client.get()
+        slots = min(max(1, slots), self.max_in_flight)
+        self._acquire(client, slots, arrived_at)
+        started = time.time()
+        try:
+            yield
+        finally:
+            self._release(slots, time.time() - started)
+
+    def _acquire(self, client, slots, arrived_at):
+        with self._lock:
+            if not self._queues and self._in_flight + slots <= self.max_in_flight:
+                self._in_flight += slots
+                self.admitted += 1
+                return
+            queue = self._queues.get(client)
+            if self._queued >= self.max_queued:
+                raise self._reject('queue_full')
+            if queue is not None and len(queue) >= self.max_queued_per_client:
+                raise self._reject('client_queue_full')
+            waiter = _Waiter(client, slots)
+            if queue is None:
+                queue = self._queues[client] = deque()
+            queue.append(waiter)
+            self._queued += 1
+
+            deadline = None
+            if self.deadline_seconds is not None:
+                deadline = (arrived_at or time.time()) + self.deadline_seconds
+            while not waiter.granted:
+                timeout = None if deadline is None else deadline - time.time()
+                if timeout is not None and timeout <= 0:
+                    queue.remove(waiter)
+                    self._queued -= 1
+                    if not queue:
+                        del self._queues[client]
+                    self._dispatch()  # a big waiter leaving may unblock smaller ones behind it
+                    raise self._reject('deadline')
+                self._granted.wait(timeout)
+            self.admitted += 1
+
+    def _release(self, slots, seconds):
+        with self._lock:
+            self._in_flight -= slots
+            self._avg_seconds = seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * seconds
+            self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to the head waiter of each client in turn (called with the lock held)"""
+        granted = False
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            if self._in_flight + waiter.slots > self.max_in_flight:
+                break
+            queue.popleft()
+            self._queued -= 1
+            self._in_flight += waiter.slots
+            waiter.granted = True
+            granted = True
+            # This client's next waiter goes to the back of the rotation
+            del self._queues[client]
+            if queue:
+                self._queues[client] = queue
+        if granted:
+            self._granted.notify_all()
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        return AdmissionRejected(reason, self._retry_after())
+
+    def _retry_after(self):
+        """Estimate seconds until the current queue has drained"""
+        avg = self._avg_seconds or 5.0
+        return max(1, math.ceil(avg * (self._queued + 1) / self.max_in_flight))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self._in_flight,
+                'queued': self._queued,
+                'clients_waiting': len(self._queues),
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected)
+            }
@@ -8,56 +8,278 @@ A simple Flask application for uploading images and practicing Chinese character
 import os
 import re
 import json
-from flask import Flask, request, render_template, redirect, url_for, flash, abort, send_from_directory, jsonify
+import time
+import gzip
+import hashlib
+import threading
+import logging
+from PIL import Image
+from flask import Flask, Request, Response, request, g, render_template, redirect, url_for, flash, abort, send_file, send_from_directory, jsonify, stream_with_context
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
-import uuid
-import easyocr
+from importlib import metadata
+from ocr_cache import OCRCache, make_cache_key
+from image_derivatives import DerivativeStore
+from upload_store import UploadStore
+from unit_archive import ArchiveError, export_archive, import_archive
+from admission import AdmissionController, AdmissionRejected, set_client, reset_client
+from ocr_jobs import JobQueue, QueueFullError, report_progress, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED
+from ocr_pool import OCRWorkerPool, PoolFullError
+import metrics
+from logging_setup import configure_logging, set_request_id, reset_request_id, get_request_id, dump_enabled
+from vocab_parser import parse_vocabulary_from_ocr, load_keyword_config, get_matcher, set_matcher
+from vocab_store import SECTIONS, JSONVocabStore, SQLiteVocabStore, migrate_json_to_sqlite
+from vocab_index import KINDS, VocabIndex
+
+# Configuration
+# Data folders (uploads, saved units, OCR cache) are absolute: under $VOCAB_APP_DATA_DIR if set, else next to
+# app.py - never resolved against the working directory, which background threads would otherwise depend on
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_DATA_DIR = os.path.abspath(os.environ.get('VOCAB_APP_DATA_DIR', APP_ROOT))
+UPLOAD_FOLDER = os.path.join(APP_DATA_DIR, 'uploads')
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB in bytes
+
+# Batch worksheet upload (each file is still limited to MAX_FILE_SIZE)
+MAX_BATCH_FILES = 30
+MAX_BATCH_UPLOAD_SIZE = MAX_BATCH_FILES * MAX_FILE_SIZE
+
+# Bulk import of a unit archive (/api/import); read as a stream, never held in memory
+MAX_IMPORT_SIZE = 4 * 1024 * 1024 * 1024
+OCR_BATCH_SIZE = 4  # images per OCR worker call
+
+
+class UploadRequest(Request):
+    """Request class that allows a larger body for the batch upload and archive import endpoints only"""
+
+    @property
+    def max_content_length(self):
+        if self.url_rule is not None and self.url_rule.endpoint == 'batch_upload':
+            return MAX_BATCH_UPLOAD_SIZE
+        if self.url_rule is not None and self.url_rule.endpoint == 'import_units':
+            return MAX_IMPORT_SIZE
+        return super().max_content_length
 
-# Fix for Pillow compatibility with EasyOCR
-try:
-    from PIL import Image
-    if not hasattr(Image, 'ANTIALIAS'):
-        Image.ANTIALIAS = Image.LANCZOS
-except ImportError:
-    pass
 
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = 'your-secret-key-change-in-production'  # For flash messages
 
-# Configuration
-UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB in bytes
-
 # Set maximum file size for Flask
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # Saved vocabulary folder
-VOCAB_FOLDER = 'saved_vocab'
+VOCAB_FOLDER = os.path.join(APP_DATA_DIR, 'saved_vocab')
+UNIT_CATALOG_REVALIDATE_SECONDS = 30  # re-stat every unit file at most this often
+VOCAB_STORE_BACKEND = 'json'  # 'json' (saved_vocab/*.json) or 'sqlite'
+VOCAB_DB_PATH = os.path.join(APP_DATA_DIR, 'vocab.db')  # used by the sqlite backend
+
+# Word / character search across saved units (in-memory index, built in the background at startup)
+VOCAB_INDEX_WAIT_SECONDS = 5  # search requests during the initial build wait this long, then get HTTP 503
+VOCAB_SEARCH_MAX_RESULTS = 200
+
+# OCR settings (part of the OCR cache key - changing them invalidates cached results)
+# Chinese-only drops Latin letters from the recognizer's alphabet (digits stay), so
+# English "Unit N" headings are no longer read - only 单元N names the unit then
+OCR_CHINESE_ONLY = False
+OCR_LANGUAGES = ['ch_sim'] if OCR_CHINESE_ONLY else ['ch_sim', 'en']
+
+# Image preprocessing before OCR (None = feed the original upload to EasyOCR)
+# Note: bbox coordinates are then in the preprocessed (downscaled) image space
+OCR_PREPROCESS = {
+    'exif_transpose': True,
+    'max_long_edge': 1600,
+    'grayscale': True,
+    'autocontrast': True,
+}
+
+# Two-phase OCR: detect all boxes, recognize headers first, then only the
+# vocabulary bands between the headers and the end-section markers
+OCR_REGION_RECOGNITION = False
+
+# Extra section-header aliases, end markers and OCR corrections (optional JSON file, see vocab_parser.py)
+OCR_KEYWORDS_FILE = os.path.join(APP_ROOT, 'ocr_keywords.json')
+
+# Cache of raw OCR results keyed by image hash
+OCR_CACHE_FOLDER = os.path.join(APP_DATA_DIR, 'ocr_cache')
+OCR_CACHE_MAX_ENTRIES = 500
+OCR_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 50MB
+
+# OCR worker processes - each holds its own EasyOCR model (~hundreds of MB RSS)
+OCR_POOL_WORKERS = 2  # 0 = run OCR inside the Flask process
+OCR_TORCH_THREADS = max(1, (os.cpu_count() or 1) // max(1, OCR_POOL_WORKERS))
+OCR_POOL_MAX_QUEUED = 8  # extra OCR calls allowed to wait for a free worker
+OCR_EAGER_WARMUP = False  # load + warm the model(s) before accepting traffic
+OCR_IDLE_UNLOAD_SECONDS = None  # stop the workers (freeing their models) after this long without OCR; None = never
+OCR_WORKER_NICE = 10  # lower CPU priority of the workers, so pages and API reads stay fast while OCR saturates the cores
+
+# Admission control: OCR running at once across job threads, the synchronous API and batch uploads;
+# waiting requests are served round-robin per client and shed after the deadline
+OCR_MAX_IN_FLIGHT = max(1, OCR_POOL_WORKERS)
+OCR_ADMISSION_MAX_QUEUED = 16  # extractions waiting for a slot before new ones get HTTP 503 at once
+OCR_ADMISSION_MAX_QUEUED_PER_CLIENT = 4
+OCR_DEADLINE_SECONDS = 120  # extractions (and queued jobs) still waiting this long after the request are shed
+ADMISSION_CLIENT_HEADER = None  # e.g. 'X-Forwarded-For' behind a trusted proxy; default: the peer address
+ADMISSION_TRUSTED_PROXIES = 1  # proxies in front of the app that append to that header; earlier entries are client-sent
+
+# Background OCR jobs (one job thread per OCR worker)
+OCR_JOB_WORKERS = max(1, OCR_POOL_WORKERS)
+OCR_JOB_HISTORY = 200  # finished jobs kept for status lookups
+OCR_JOB_MAX_QUEUED = 50  # uploads get HTTP 503 + Retry-After beyond this
+SSE_KEEPALIVE_SECONDS = 15  # comment line sent on idle event streams so proxies keep them open
+
+# HTTP caching and compression
+UPLOAD_CACHE_MAX_AGE = 365 * 24 * 3600  # uploads are never rewritten (unique filenames)
+API_CACHE_CONTROL = 'no-cache'  # unit JSON: browsers revalidate every time, answered by a cheap 304
+GZIP_MIN_BYTES = 1024  # smaller JSON responses are sent uncompressed
+GZIP_LEVEL = 6
+
+# Uploads are stored by content hash; re-uploading a stored photo reuses its unit / extraction
+UPLOAD_NEAR_DUPLICATE_DISTANCE = 6  # perceptual-hash bits; a re-photographed sheet is logged (0 = off)
+
+# Upload retention, swept in the background; images of saved units and uploads being extracted are always kept
+UPLOAD_RETENTION_SECONDS = 30 * 24 * 3600  # unreferenced uploads unused this long are deleted (None = keep)
+UPLOAD_MAX_BYTES = 1024 * 1024 * 1024  # beyond this, least recently used unreferenced uploads go (None = no budget)
+UPLOAD_GC_INTERVAL_SECONDS = 3600
+UPLOAD_GC_MIN_AGE_SECONDS = 3600  # uploads used more recently than this are never deleted
+
+# Resized renditions of uploads (/uploads/<filename>?size=thumb|display), made in the background after upload
+DERIVATIVE_WORKERS = 1
+DERIVATIVE_WAIT_SECONDS = 2  # a request for a rendition still being generated waits this long, then gets the original
+
+# Logging: 'json' lines (one object per record, with request_id) or 'text'
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = 'json'
+LOG_DEBUG_SAMPLE_RATE = 0.05  # at DEBUG, fraction of requests that log full OCR/vocabulary dumps
+LOG_CONFIG = {'level': LOG_LEVEL, 'fmt': LOG_FORMAT, 'dump_sample_rate': LOG_DEBUG_SAMPLE_RATE}
+
+configure_logging(**LOG_CONFIG)
+log = logging.getLogger('app')
 
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(VOCAB_FOLDER, exist_ok=True)
 
-# Initialize PaddleOCR once at app startup (global singleton)
-ocr_instance = None
+# Header / correction matcher, compiled once
+set_matcher(load_keyword_config(OCR_KEYWORDS_FILE))
 
-def get_ocr():
-    """Get EasyOCR instance (initialize once globally)"""
-    global ocr_instance
-    if ocr_instance is None:
-        try:
-            print("Initializing EasyOCR (one-time setup)...")
-            # Initialize EasyOCR with Chinese and English support
-            ocr_instance = easyocr.Reader(['ch_sim', 'en'], gpu=False)
-            print("EasyOCR initialized successfully!")
-        except Exception as e:
-            print(f"Failed to initialize EasyOCR: {e}")
-            raise
-    return ocr_instance
+# Saved units (listing counts for the homepage / API are kept in memory by the store)
+if VOCAB_STORE_BACKEND == 'sqlite':
+    vocab_store = SQLiteVocabStore(VOCAB_DB_PATH)
+    if vocab_store.count_units() == 0 and any(f.endswith('.json') for f in os.listdir(VOCAB_FOLDER)):
+        log.info("Migrated %d units from %s to %s", migrate_json_to_sqlite(VOCAB_FOLDER, vocab_store),
+                 VOCAB_FOLDER, VOCAB_DB_PATH)
+else:
+    vocab_store = JSONVocabStore(VOCAB_FOLDER, revalidate_seconds=UNIT_CATALOG_REVALIDATE_SECONDS)
+vocab_index = VocabIndex()  # built in the background by start_background_tasks()
+
+upload_store = UploadStore(UPLOAD_FOLDER, near_duplicate_distance=UPLOAD_NEAR_DUPLICATE_DISTANCE)
+derivatives = DerivativeStore(UPLOAD_FOLDER, workers=DERIVATIVE_WORKERS)
+
+ocr_cache = OCRCache(OCR_CACHE_FOLDER, max_entries=OCR_CACHE_MAX_ENTRIES, max_bytes=OCR_CACHE_MAX_BYTES)
+
+# OCR worker processes are started on first use
+ocr_pool = OCRWorkerPool(OCR_LANGUAGES, num_workers=OCR_POOL_WORKERS,
+                         torch_threads=OCR_TORCH_THREADS, max_queued=OCR_POOL_MAX_QUEUED,
+                         eager_warmup=OCR_EAGER_WARMUP, log_config=LOG_CONFIG,
+                         idle_unload_seconds=OCR_IDLE_UNLOAD_SECONDS, worker_nice=OCR_WORKER_NICE)
+ocr_admission = AdmissionController(OCR_MAX_IN_FLIGHT, max_queued=OCR_ADMISSION_MAX_QUEUED,
+                                    max_queued_per_client=OCR_ADMISSION_MAX_QUEUED_PER_CLIENT,
+                                    deadline_seconds=OCR_DEADLINE_SECONDS)
+
+
+def get_ocr_config():
+    """OCR settings that affect readtext output (used in the cache key)"""
+    try:
+        model_version = metadata.version('easyocr')
+    except metadata.PackageNotFoundError:
+        model_version = 'unknown'
+    return {'languages': OCR_LANGUAGES, 'easyocr_version': model_version, 'preprocess': OCR_PREPROCESS,
+            'region_keywords': get_region_keywords()}
+
+
+def get_region_keywords():
+    """Keywords for region-restricted recognition (None = recognize the whole page)"""
+    if not OCR_REGION_RECOGNITION:
+        return None
+    return get_matcher().region_keywords()
+
+
+def run_ocr(filepath):
+    """
+    Run EasyOCR on an image, serving repeat images from the OCR cache
+    Args:
+        filepath (str): Path to the image file
+    Returns:
+        tuple: ([[bbox, text, confidence], ...], {stage_name: seconds})
+    """
+    with metrics.stage('read_image'):
+        with open(filepath, 'rb') as f:
+            image_bytes = f.read()
+    
+    cache_key = make_cache_key(image_bytes, get_ocr_config())
+    result = ocr_cache.get(cache_key)
+    if result is not None:
+        metrics.OCR_CACHE_LOOKUPS.inc(result='hit')
+        log.info("OCR cache hit for %s", filepath)
+        return result, {}
+    metrics.OCR_CACHE_LOOKUPS.inc(result='miss')
+    
+    metrics.OCR_CALLS.inc(mode='single')
+    waiting = time.perf_counter()
+    with ocr_admission.admit():
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - waiting, stage='admission_wait')
+        # ocr_call = queue wait + IPC + everything the worker reports in timings
+        with metrics.stage('ocr_call', expected=(PoolFullError,)):
+            result, timings = ocr_pool.readtext(image_bytes, OCR_PREPROCESS, get_region_keywords())
+    metrics.observe_stages(timings)
+    log.info("OCR finished for %s", filepath, extra={'ocr_timings': {stage: round(seconds, 3) for stage, seconds in timings.items()}})
+    return ocr_cache.put(cache_key, result), timings
+
+
+def run_ocr_batch(images):
+    """
+    OCR several images at once; cache hits are served directly and the misses
+    are sent to the worker pool in batches of OCR_BATCH_SIZE
+    Args:
+        images (list): Image bytes
+    Returns:
+        list: [(result, timings, error), ...] in input order (timings is {} for cache hits)
+    """
+    ocr_config = get_ocr_config()
+    cache_keys = [make_cache_key(image_bytes, ocr_config) for image_bytes in images]
+    outputs = [None] * len(images)
+    misses = []
+    for i, cache_key in enumerate(cache_keys):
+        result = ocr_cache.get(cache_key)
+        if result is not None:
+            outputs[i] = (result, {}, None)
+        else:
+            misses.append(i)
+    metrics.OCR_CACHE_LOOKUPS.inc(len(images) - len(misses), result='hit')
+    metrics.OCR_CACHE_LOOKUPS.inc(len(misses), result='miss')
+    
+    log.info("Batch OCR: %d cache hits, %d to OCR", len(images) - len(misses), len(misses))
+    metrics.OCR_CALLS.inc(len(misses), mode='batch')
+    batch_outputs = []
+    if misses:
+        # The batch fans out to one worker per OCR_BATCH_SIZE images, so it holds that many slots
+        waiting = time.perf_counter()
+        with ocr_admission.admit(slots=-(-len(misses) // OCR_BATCH_SIZE)):
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - waiting, stage='admission_wait')
+            with metrics.stage('ocr_batch_call', expected=(PoolFullError,)):
+                batch_outputs = ocr_pool.readtext_batch([images[i] for i in misses], OCR_PREPROCESS,
+                                                        get_region_keywords(), batch_size=OCR_BATCH_SIZE)
+    for i, (result, timings, error) in zip(misses, batch_outputs):
+        if error is None:
+            result = ocr_cache.put(cache_keys[i], result)
+            metrics.observe_stages(timings)
+        else:
+            metrics.ERRORS.inc(stage='ocr')
+        outputs[i] = (result, timings, error)
+    return outputs
 
 
 def allowed_file(filename):
@@ -72,36 +294,36 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def get_unique_filename(filename):
+def store_upload(image_bytes, original_filename):
     """
-    Generate a unique filename to prevent overwrites
-    Args:
-        filename (str): Original filename
+    Store an upload by content hash and start generating its renditions
     Returns:
-        str: Unique filename with UUID prefix
+        dict: filename, duplicate (identical image was already stored), near_duplicate_of
     """
-    # Get file extension
-    file_ext = filename.rsplit('.', 1)[1].lower()
-    # Generate unique filename with UUID
-    unique_filename = f"{uuid.uuid4().hex[:8]}_{secure_filename(filename)}"
-    return unique_filename
+    stored = upload_store.save(image_bytes, original_filename)
+    if stored['duplicate']:
+        metrics.UPLOADS.inc(result='duplicate')
+    else:
+        metrics.UPLOADS.inc(result='near_duplicate' if stored['near_duplicate_of'] else 'new')
+    derivatives.schedule(stored['filename'])
+    return stored
+
+
+def find_unit_for_image(filename):
+    """Saved unit that was extracted from this upload, if any"""
+    for unit in vocab_store.list_units():
+        if unit.get('image_filename') == filename:
+            return unit
+    return None
 
 
-def get_uploaded_images():
+def get_uploaded_images(limit=None):
     """
-    Get list of all uploaded images in the uploads folder
+    Get list of uploaded images, newest first (from the upload index, no directory scan)
     Returns:
         list: List of image filenames
     """
-    try:
-        files = os.listdir(UPLOAD_FOLDER)
-        # Filter only image files
-        image_files = [f for f in files if allowed_file(f)]
-        # Sort by modification time (newest first)
-        image_files.sort(key=lambda x: os.path.getmtime(os.path.join(UPLOAD_FOLDER, x)), reverse=True)
-        return image_files
-    except OSError:
-        return []
+    return upload_store.list_recent(limit)
 
 
 @app.route('/', methods=['GET', 'POST'])
@@ -125,16 +347,31 @@ def index():
         # Validate file type and save
         if file and allowed_file(file.filename):
             try:
-                # Generate unique filename
-                filename = get_unique_filename(file.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                # Save the file under its content hash
+                stored = store_upload(file.read(), file.filename)
+                filename = stored['filename']
+                
+                if stored['duplicate']:
+                    # Same photo as before: open its saved unit without any OCR
+                    unit = find_unit_for_image(filename)
+                    if unit:
+                        flash(f'This worksheet was uploaded before - opening {unit["unit_name"]}', 'success')
+                        return redirect(url_for('practice_unit', unit_name=unit['unit_name']))
+                else:
+                    flash(f'Image "{file.filename}" uploaded successfully!', 'success')
                 
-                # Save the file
-                file.save(filepath)
-                flash(f'Image "{file.filename}" uploaded successfully!', 'success')
+                # Start OCR in the background right away, or follow the job that
+                # already extracted this photo (the practice page retries on its
+                # own if the queue is currently full)
+                job_id = ocr_jobs.find_job(filename) if stored['duplicate'] else None
+                if job_id is None:
+                    try:
+                        job_id = ocr_jobs.submit(filename, client=g.client_id)
+                    except QueueFullError:
+                        job_id = None
                 
                 # Redirect directly to practice page with the uploaded image
-                return redirect(url_for('practice', filename=filename))
+                return redirect(url_for('practice', filename=filename, job=job_id))
                 
             except Exception as e:
                 flash(f'Error uploading file: {str(e)}', 'error')
@@ -144,23 +381,7 @@ def index():
         return redirect(request.url)
     
     # GET request - display the upload form and saved units
-    saved_units = []
-    try:
-        for fname in sorted(os.listdir(VOCAB_FOLDER)):
-            if fname.endswith('.json'):
-                fpath = os.path.join(VOCAB_FOLDER, fname)
-                with open(fpath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    saved_units.append({
-                        'unit_name': data.get('unit_name', ''),
-                        'unit_chinese': data.get('unit_chinese', ''),
-                        'spoken_count': len(data.get('spoken_vocab', [])),
-                        'practice_count': len(data.get('practice_vocab', []))
-                    })
-    except OSError:
-        pass
-    
-    return render_template('index.html', saved_units=saved_units)
+    return render_template('index.html', saved_units=vocab_store.list_units())
 
 
 @app.route('/uploads/<filename>')
@@ -169,10 +390,64 @@ def uploaded_file(filename):
     Serve uploaded files
     Args:
         filename (str): Name of the file to serve
+    Query:
+        size (str): Optional rendition - 'thumb' (homepage) or 'display' (practice page)
     """
-    # Security check - ensure filename is safe
+    # Security check - ensure filename is safe, and only serve stored uploads (never index.jsonl or temp files)
     safe_filename = secure_filename(filename)
-    return send_from_directory(app.config['UPLOAD_FOLDER'], safe_filename)
+    if not allowed_file(safe_filename) or not upload_store.adopt(safe_filename):
+        # adopt() is a dict lookup for indexed uploads; a legacy or copied-in image is indexed on first view
+        return Response(status=404)  # a plain 404, not the page_not_found redirect, for <img> requests
+    upload_store.touch(safe_filename)  # recently viewed uploads are evicted last
+    size = request.args.get('size')
+    if size:
+        if size not in derivatives.renditions:
+            abort(400)
+        path, mimetype = derivatives.lookup(safe_filename, size, accept_webp='image/webp' in request.headers.get('Accept', ''),
+                                            wait=DERIVATIVE_WAIT_SECONDS)
+        if path is None:
+            # Not generated yet: send the original, but don't let it be cached as the rendition
+            response = send_from_directory(app.config['UPLOAD_FOLDER'], safe_filename)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        response = send_file(os.path.abspath(path), mimetype=mimetype, etag=get_image_etag(path) or True,
+                             max_age=UPLOAD_CACHE_MAX_AGE)
+        response.cache_control.immutable = True
+        response.vary.add('Accept')
+        return response
+    
+    etag = upload_store.content_hash(safe_filename)  # recorded at upload, so a 304 never re-reads the file
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], safe_filename,
+                                   etag=etag or True, max_age=UPLOAD_CACHE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+
+def get_image_etag(path):
+    """ETag for a file on disk from its mtime and size (no read; stored uploads use their SHA-256 instead)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def cacheable_json(data, cache_control=API_CACHE_CONTROL):
+    """
+    JSON response with a strong ETag of its body; answers 304 when the client already has it
+    The gzip variant (see compress_response) carries the same ETag + '-gzip', so both match.
+    """
+    response = jsonify(data)
+    etag = hashlib.sha256(response.get_data()).hexdigest()[:32]
+    for candidate in (etag, f'{etag}-gzip'):
+        if request.if_none_match.contains(candidate):
+            response = Response(status=304)
+            etag = candidate
+            break
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 @app.route('/practice/<filename>')
@@ -196,7 +471,7 @@ def practice(filename):
         flash('Invalid file type!', 'error')
         return redirect(url_for('index'))
     
-    return render_template('practice.html', filename=safe_filename)
+    return render_template('practice.html', filename=safe_filename, job_id=request.args.get('job', ''))
 
 
 @app.route('/api/test')
@@ -205,6 +480,33 @@ def test_api():
     return jsonify({'status': 'API is working', 'message': 'Flask server is running'})
 
 
+@app.route('/api/ready')
+def readiness_probe():
+    """Readiness probe - 503 until the OCR model is warm (when eager warm-up is on)"""
+    readiness = ocr_pool.readiness()
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
+
+@app.route('/api/ocr-cache')
+def ocr_cache_stats():
+    """Report OCR cache hit/miss counters and size"""
+    return jsonify(ocr_cache.stats())
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics: stage latency histograms, OCR/cache/parse counters, errors"""
+    return app.response_class(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/api/ocr-pool')
+def ocr_pool_stats():
+    """Report OCR worker pool load, job queue counts, rendition generation and the vocabulary index"""
+    return jsonify({'pool': ocr_pool.stats(), 'admission': ocr_admission.stats(), 'jobs': ocr_jobs.stats(),
+                    'uploads': upload_store.stats(), 'derivatives': derivatives.stats(),
+                    'vocab_index': vocab_index.stats()})
+
+
 def extract_unit_name(ocr_result):
     """Extract unit name (e.g. '单元一', '单元二') from OCR results"""
     for bbox, text, confidence in ocr_result:
@@ -227,79 +529,167 @@ def extract_unit_name(ocr_result):
     return None, None
 
 
+def get_image_metadata(filename):
+    """Hash, size and dimensions of an uploaded image (None if it is missing)"""
+    image_path = os.path.join(UPLOAD_FOLDER, filename)
+    if not os.path.exists(image_path):
+        return None
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+    try:
+        # Only parses the header, no pixel decode
+        with Image.open(image_path) as img:
+            width, height = img.size
+    except OSError:
+        width = height = None
+    return {
+        'filename': filename,
+        'sha256': hashlib.sha256(image_bytes).hexdigest(),
+        'size_bytes': len(image_bytes),
+        'width': width,
+        'height': height,
+        'uploaded_at': str(os.path.getmtime(image_path))
+    }
+
+
 def save_unit_vocabulary(unit_name, unit_chinese, spoken_vocab, practice_vocab, filename):
-    """Save vocabulary for a unit to a JSON file"""
+    """Save vocabulary for a unit to the vocabulary store"""
+    image_meta = get_image_metadata(filename)
     unit_data = {
         'unit_name': unit_name,
         'unit_chinese': unit_chinese,
         'spoken_vocab': spoken_vocab,
         'practice_vocab': practice_vocab,
         'image_filename': filename,
-        'saved_at': str(os.path.getmtime(os.path.join(UPLOAD_FOLDER, filename))) if os.path.exists(os.path.join(UPLOAD_FOLDER, filename)) else ''
+        'saved_at': image_meta['uploaded_at'] if image_meta else ''
     }
     
-    # Use unit name as filename (e.g., "Unit_1.json")
-    safe_name = unit_name.replace(' ', '_')
-    vocab_path = os.path.join(VOCAB_FOLDER, f"{safe_name}.json")
-    
-    with open(vocab_path, 'w', encoding='utf-8') as f:
-        json.dump(unit_data, f, ensure_ascii=False, indent=2)
-    
-    print(f"Saved vocabulary for {unit_name} to {vocab_path}")
-    return vocab_path
+    location = vocab_store.save_unit(unit_data, image_meta)
+    vocab_index.update(unit_data)
+    log.info("Saved vocabulary for %s to %s", unit_name, location)
+    return location
 
 
 @app.route('/api/saved-units')
 def get_saved_units():
     """List all saved units with their vocabulary"""
-    units = []
-    try:
-        for filename in sorted(os.listdir(VOCAB_FOLDER)):
-            if filename.endswith('.json'):
-                filepath = os.path.join(VOCAB_FOLDER, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    units.append({
-                        'unit_name': data.get('unit_name', filename.replace('.json', '')),
-                        'unit_chinese': data.get('unit_chinese', ''),
-                        'spoken_count': len(data.get('spoken_vocab', [])),
-                        'practice_count': len(data.get('practice_vocab', [])),
-                        'image_filename': data.get('image_filename', '')
-                    })
-    except OSError:
-        pass
-    
-    return jsonify({'units': units})
+    return cacheable_json({'units': vocab_store.list_units()})
 
 
 @app.route('/api/load-unit/<unit_name>')
 def load_unit_vocabulary(unit_name):
     """Load saved vocabulary for a specific unit"""
-    safe_name = unit_name.replace(' ', '_')
-    vocab_path = os.path.join(VOCAB_FOLDER, f"{safe_name}.json")
-    
-    if not os.path.exists(vocab_path):
+    data = vocab_store.load_unit(unit_name)
+    if data is None:
         return jsonify({'error': f'Unit {unit_name} not found'}), 404
     
-    with open(vocab_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    return cacheable_json(data)
+
+
+def vocab_index_query_args():
+    """Validated 'section' query argument, or an error response"""
+    section = request.args.get('section') or None
+    if section is not None and section not in SECTIONS:
+        return None, (jsonify({'error': f"section must be one of {', '.join(SECTIONS)}"}), 400)
+    if not vocab_index.wait_ready(VOCAB_INDEX_WAIT_SECONDS):
+        response = jsonify({'error': 'The vocabulary index is still being built', 'retry_after': 1})
+        response.headers['Retry-After'] = '1'
+        return None, (response, 503)
+    return section, None
+
+
+@app.route('/api/search')
+def search_vocabulary():
+    """
+    Find the saved units containing a word or character
+    Query:
+        q (str): Word, part of a word or single character, e.g. '眼睛' or '眼'
+        section (str): 'spoken_vocab' or 'practice_vocab' (default: both)
+        limit (int): Maximum units returned
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing query parameter q'}), 400
+    section, error = vocab_index_query_args()
+    if error:
+        return error
+    limit = min(max(1, request.args.get('limit', 50, type=int)), VOCAB_SEARCH_MAX_RESULTS)
+    return cacheable_json(vocab_index.search(query, section=section, limit=limit))
+
+
+@app.route('/api/review-set')
+def review_set():
+    """
+    Every character (or word) practiced so far, most widespread first, for a review session
+    Query:
+        kind (str): 'characters' (default) or 'words'
+        section (str): 'spoken_vocab' or 'practice_vocab' (default: both)
+        unit (str): Only these units (repeatable; default: all saved units)
+    """
+    kind = request.args.get('kind', 'characters')
+    if kind not in KINDS:
+        return jsonify({'error': f"kind must be one of {', '.join(KINDS)}"}), 400
+    section, error = vocab_index_query_args()
+    if error:
+        return error
+    items = vocab_index.review_set(kind, section=section, unit_names=request.args.getlist('unit') or None)
+    return cacheable_json({'kind': kind, 'section': section, 'count': len(items), 'items': items})
+
+
+@app.route('/api/export')
+def export_units():
+    """
+    Download every saved unit and its source image as one tar archive (streamed, see unit_archive.py)
+    Query:
+        images (str): '0' to export the units only
+    """
+    include_images = request.args.get('images', '1') != '0'
+    filename = f"vocab-export-{time.strftime('%Y%m%d-%H%M%S')}.tar"
+    return Response(stream_with_context(export_archive(vocab_store, UPLOAD_FOLDER, include_images,
+                                                    is_stored_image=upload_store.contains)),
+                    mimetype='application/x-tar',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'})
+
+
+@app.route('/api/import', methods=['POST'])
+def import_units():
+    """
+    Import a unit archive from /api/export (raw tar body, or multipart 'file')
+    Query:
+        replace (str): '1' to overwrite units that already exist (default: skip them)
+    """
+    if request.mimetype == 'multipart/form-data':
+        file = request.files.get('file')
+        if not file:
+            return jsonify({'error': 'No archive uploaded'}), 400
+        stream = file.stream
+    else:
+        stream = request.stream
+    
+    def save_imported_unit(unit_data):
+        image_filename = unit_data['image_filename']
+        vocab_store.save_unit(unit_data, get_image_metadata(image_filename) if image_filename else None)
+        vocab_index.update(unit_data)
     
-    return jsonify(data)
+    try:
+        summary = import_archive(stream, save_imported_unit,
+                                 unit_exists=lambda name: vocab_store.load_unit(name) is not None,
+                                 store_image=lambda image_bytes, name: store_upload(image_bytes, name)['filename'],
+                                 is_image=allowed_file, max_image_bytes=MAX_FILE_SIZE,
+                                 replace=request.args.get('replace') == '1')
+    except ArchiveError as e:
+        return jsonify({'error': f'Invalid archive: {e}'}), 400
+    return jsonify(summary), 200 if summary['complete'] else 400
 
 
 @app.route('/practice-unit/<unit_name>')
 def practice_unit(unit_name):
     """Practice page for a saved unit (no OCR needed)"""
-    safe_name = unit_name.replace(' ', '_')
-    vocab_path = os.path.join(VOCAB_FOLDER, f"{safe_name}.json")
-    
-    if not os.path.exists(vocab_path):
+    data = vocab_store.load_unit(unit_name)
+    if data is None:
         flash(f'Unit {unit_name} not found!', 'error')
         return redirect(url_for('index'))
     
-    with open(vocab_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
     filename = data.get('image_filename', '')
     return render_template('practice.html', 
                            filename=filename, 
@@ -308,10 +698,226 @@ def practice_unit(unit_name):
                            saved_practice=json.dumps(data.get('practice_vocab', []), ensure_ascii=False))
 
 
+def process_image(filename):
+    """
+    Run OCR + vocabulary parsing on an uploaded image and save the unit if detected
+    Args:
+        filename (str): Secure filename inside the upload folder
+    Returns:
+        dict: spoken_vocab, practice_vocab, debug_info (+ unit_name/unit_chinese)
+    """
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    log.info("Processing image %s", filepath)
+    upload_store.touch(filename)
+    
+    # Run EasyOCR on the image (cached by image hash)
+    started = time.perf_counter()
+    result, ocr_timings = run_ocr(filepath)
+    vocabulary_data = build_vocabulary(result, ocr_timings, filename)
+    metrics.EXTRACTION_SECONDS.observe(time.perf_counter() - started)
+    return vocabulary_data
+
+
+def build_vocabulary(result, ocr_timings, filename):
+    """
+    Parse OCR output into vocabulary and save it per unit if a unit name was found
+    Args:
+        result (list): OCR result for the image
+        ocr_timings (dict): Stage timings from the OCR worker
+        filename (str): Secure filename inside the upload folder
+    Returns:
+        dict: spoken_vocab, practice_vocab, debug_info (+ unit_name/unit_chinese)
+    """
+    stage_timings = {}
+    
+    # Extract unit name from OCR
+    with metrics.stage('unit_name', stage_timings):
+        unit_name, unit_chinese = extract_unit_name(result)
+    if unit_name:
+        report_progress('unit', {'unit_name': unit_name, 'unit_chinese': unit_chinese})
+    
+    # Extract vocabulary using improved parsing
+    with metrics.stage('parse', stage_timings):
+        vocabulary_data = parse_vocabulary_from_ocr(result)
+    debug_info = vocabulary_data['debug_info']
+    # Reading mode can start before the unit is saved and the job finishes
+    report_progress('spoken', {'words': vocabulary_data['spoken_vocab']})
+    report_progress('practice', {'words': vocabulary_data['practice_vocab']})
+    metrics.PARSE_RESULTS.inc(method=get_extraction_method(debug_info))
+    debug_info['ocr_timings'] = {stage: round(seconds, 4) for stage, seconds in ocr_timings.items()}
+    
+    # Save vocabulary per unit if unit name was found
+    if unit_name:
+        with metrics.stage('save_unit', stage_timings):
+            save_unit_vocabulary(unit_name, unit_chinese, 
+                              vocabulary_data.get('spoken_vocab', []),
+                              vocabulary_data.get('practice_vocab', []),
+                              filename)
+        vocabulary_data['unit_name'] = unit_name
+        vocabulary_data['unit_chinese'] = unit_chinese
+    
+    debug_info['stage_timings'] = {stage: round(seconds, 4) for stage, seconds in stage_timings.items()}
+    log.info("Extracted %d spoken / %d practice words from %s (unit: %s)",
+             len(vocabulary_data['spoken_vocab']), len(vocabulary_data['practice_vocab']), filename, unit_name,
+             extra={'ocr_boxes': len(result) if result else 0, 'stage_timings': debug_info['stage_timings']})
+    if dump_enabled(log):
+        log.debug("Vocabulary extraction result: %s", vocabulary_data)
+    return vocabulary_data
+
+
+def get_extraction_method(debug_info):
+    """Which parser path produced the vocabulary: direct_vocabulary_lines, section_headers or fallback"""
+    if 'extraction_method' in debug_info:
+        return debug_info['extraction_method']
+    if debug_info.get('spoken_section_found') or debug_info.get('practice_section_found'):
+        return 'section_headers'
+    return 'fallback' if 'error' not in debug_info else 'empty'
+
+
+ocr_jobs = JobQueue(process_image, num_workers=OCR_JOB_WORKERS, history_limit=OCR_JOB_HISTORY,
+                    max_queued=OCR_JOB_MAX_QUEUED, deadline_seconds=OCR_DEADLINE_SECONDS)
+
+
+
+def sweep_uploads():
+    """
+    Apply upload retention: delete expired and over-budget uploads with their renditions
+    Returns:
+        dict: {'expired': [filename, ...], 'evicted': [filename, ...]}
+    """
+    upload_store.compact()  # persist access times first, so a crash mid-sweep cannot make uploads look idle
+    keep = {unit.get('image_filename') for unit in vocab_store.list_units()} | ocr_jobs.active_filenames()
+    removed = upload_store.collect(keep, max_age_seconds=UPLOAD_RETENTION_SECONDS, max_bytes=UPLOAD_MAX_BYTES,
+                                   min_age_seconds=UPLOAD_GC_MIN_AGE_SECONDS)
+    for reason, filenames in removed.items():
+        for filename in filenames:
+            derivatives.remove(filename)
+        metrics.UPLOADS_DELETED.inc(len(filenames), reason=reason)
+    if removed['expired'] or removed['evicted']:
+        upload_store.compact()  # drops the deleted entries
+    return removed
+
+
+def upload_maintenance():
+    """Background thread: hash uploads from before content addressing once, then sweep periodically"""
+    upload_store.adopt_existing(allowed_file)
+    while True:
+        try:
+            sweep_uploads()
+        except Exception:
+            log.exception("Upload retention sweep failed")
+        time.sleep(UPLOAD_GC_INTERVAL_SECONDS)
+
+
+def start_background_tasks():
+    """
+    Start the vocab index build, upload maintenance and eager OCR warm-up
+    Eager warm-up runs at import, so it also runs under gunicorn / flask run; /api/ready reports 503 until it is
+    done. Not in the debug reloader's parent process, which never serves requests.
+    """
+    threading.Thread(target=vocab_index.build, args=(vocab_store,), name='vocab-index', daemon=True).start()
+    threading.Thread(target=upload_maintenance, name='upload-maintenance', daemon=True).start()
+    if OCR_EAGER_WARMUP and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        ocr_pool.warm_up_in_background()
+
+
+# OCR worker processes are spawned, so under `python app.py` each one re-imports this file as __mp_main__.
+# They only need ocr_pool's worker functions - no index build, upload sweep or warm-up of a pool of their own.
+if __name__ != '__mp_main__':
+    start_background_tasks()
+
+metrics.Gauge('vocab_ocr_pool_pending', 'OCR calls running or waiting in the worker pool',
+              lambda: ocr_pool.stats()['pending'])
+metrics.Gauge('vocab_ocr_jobs_queued', 'Extraction jobs waiting for a job thread',
+              lambda: ocr_jobs.stats()[JOB_QUEUED])
+metrics.Gauge('vocab_upload_bytes', 'Bytes of stored original uploads',
+              lambda: upload_store.stats()['bytes'])
+metrics.Gauge('vocab_ocr_in_flight', 'Extractions holding an OCR admission slot',
+              lambda: ocr_admission.stats()['in_flight'])
+metrics.Gauge('vocab_ocr_admission_queued', 'Extractions waiting for an OCR admission slot',
+              lambda: ocr_admission.stats()['queued'])
+metrics.Gauge('vocab_ocr_jobs_shed', 'Queued extraction jobs shed at their deadline since start',
+              lambda: ocr_jobs.stats()['shed'])
+metrics.Gauge('vocab_ocr_model_loaded', 'Whether the OCR model(s) are resident (0 after an idle unload)',
+              lambda: int(ocr_pool.stats()['model_loaded']))
+metrics.Gauge('vocab_ocr_model_resident_bytes', 'RSS of the OCR worker processes as of their last result',
+              lambda: ocr_pool.stats()['memory']['resident_bytes'])
+metrics.Gauge('vocab_ocr_readtext_peak_rss_bytes', 'Highest RSS of an OCR worker during a readtext call',
+              lambda: ocr_pool.stats()['memory']['peak_readtext_bytes'] or 0)
+metrics.Gauge('vocab_ocr_model_unloads', 'Idle unloads of the OCR model(s) since start',
+              lambda: ocr_pool.stats()['unloads'])
+
+
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def get_client_id():
+    """
+    Who a request comes from, for fair OCR admission
+    With ADMISSION_CLIENT_HEADER set, this is the address the outermost trusted proxy saw: the
+    ADMISSION_TRUSTED_PROXIES-th entry from the right. Entries left of it are whatever the client sent,
+    and trusting them would let a client pick a new queue on every request.
+    """
+    if ADMISSION_CLIENT_HEADER:
+        hops = [hop.strip() for hop in request.headers.get(ADMISSION_CLIENT_HEADER, '').split(',')]
+        if len(hops) >= ADMISSION_TRUSTED_PROXIES and hops[-ADMISSION_TRUSTED_PROXIES]:
+            return hops[-ADMISSION_TRUSTED_PROXIES]
+    return request.remote_addr or 'unknown'
+
+
+@app.before_request
+def start_request():
+    # Reuse the caller's X-Request-ID (e.g. from a proxy) so logs correlate end to end
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id_token = set_request_id(incoming if REQUEST_ID_RE.match(incoming) else None)
+    g.request_started = time.perf_counter()
+    # Background jobs copy this context, so their OCR is admitted for the same client and deadline
+    g.client_id = get_client_id()
+    g.admission_token = set_client(g.client_id)
+
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unmatched',
+                                             method=request.method, status=response.status_code)
+    response.headers['X-Request-ID'] = get_request_id()
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """gzip JSON bodies of GZIP_MIN_BYTES or more for clients that accept it"""
+    if (response.mimetype != 'application/json' or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES or not request.accept_encodings['gzip']:
+        return response
+    response.set_data(gzip.compress(data, GZIP_LEVEL, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-gzip', weak)
+    return response
+
+
+@app.teardown_request
+def end_request(exc):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        reset_request_id(token)
+    token = g.pop('admission_token', None)
+    if token is not None:
+        reset_client(token)
+
+
 @app.route('/api/extract-vocabulary/<filename>')
 def extract_vocabulary(filename):
     """
-    Extract vocabulary from uploaded image using PaddleOCR
+    Extract vocabulary from uploaded image using EasyOCR (synchronous)
     Returns structured JSON with spoken_vocab and practice_vocab
     """
     # Security check - ensure filename is safe
@@ -323,361 +929,202 @@ def extract_vocabulary(filename):
         return jsonify({'error': 'Image not found'}), 404
     
     try:
-        # Get OCR instance (singleton - initialized once)
-        print("Getting OCR instance...")
-        ocr = get_ocr()
-        
-        print(f"Processing image: {filepath}")
-        print(f"File exists: {os.path.exists(filepath)}")
-        
-        # Run EasyOCR on the image
-        print("Starting OCR processing...")
-        result = ocr.readtext(filepath)
-        
-        print(f"OCR completed, result type: {type(result)}")
-        print(f"OCR result length: {len(result) if result else 'None'}")
-        
-        # Extract unit name from OCR
-        unit_name, unit_chinese = extract_unit_name(result)
-        print(f"Detected unit: {unit_name} ({unit_chinese})")
-        
-        # Extract vocabulary using improved parsing
-        vocabulary_data = parse_vocabulary_from_ocr(result)
-        
-        # Save vocabulary per unit if unit name was found
-        if unit_name:
-            save_unit_vocabulary(unit_name, unit_chinese, 
-                              vocabulary_data.get('spoken_vocab', []),
-                              vocabulary_data.get('practice_vocab', []),
-                              safe_filename)
-            vocabulary_data['unit_name'] = unit_name
-            vocabulary_data['unit_chinese'] = unit_chinese
-        
-        print(f"Vocabulary extraction completed: {vocabulary_data}")
-        
-        return jsonify(vocabulary_data)
+        return jsonify(process_image(safe_filename))
         
+    except (PoolFullError, AdmissionRejected):
+        raise
     except Exception as e:
-        print(f"OCR Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("OCR failed for %s", safe_filename)
         return jsonify({'error': f'OCR processing failed: {str(e)}'}), 500
 
 
-def parse_vocabulary_from_ocr(ocr_result):
+@app.route('/api/extract-vocabulary/<filename>/stream')
+def extract_vocabulary_stream(filename):
     """
-    Parse EasyOCR result to extract vocabulary from specific sections
-    EasyOCR format: [(bbox, text, confidence), ...]
-    Returns: {
-        "spoken_vocab": [...],   # 口语表达词汇
-        "practice_vocab": [...], # 识读词语
-        "debug_info": {...}      # For debugging
-    }
+    Streaming variant of extract_vocabulary (Server-Sent Events)
+    Follows ?job=<id>, else the image's existing job (e.g. the one its upload queued), else starts one,
+    and streams its progress: queued, running, unit, spoken, practice and finally result or failed.
     """
-    if not ocr_result:
-        return {
-            "spoken_vocab": [],
-            "practice_vocab": [],
-            "debug_info": {"error": "No OCR result"}
-        }
-    
-    # Extract text with confidence scores from EasyOCR format
-    text_items = []
-    all_raw_text = []
-    vocabulary_lines = []  # Special handling for vocabulary lines
-    
-    for bbox, text, confidence in ocr_result:
-        all_raw_text.append(f"{text}({confidence:.2f})")
-        
-        # Check for vocabulary patterns: lines with multiple period-separated short words
-        # A vocab line looks like: "我。快乐。眼晴。耳朵。鼻子" or "小。大。长大。人。水。吃"
-        period_count = text.count('。') + text.count('、')
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        if period_count >= 3 and chinese_chars >= 4:
-            vocabulary_lines.append({
-                'text': text,
-                'confidence': confidence,
-                'type': 'vocab_line'
-            })
-            print(f"Found vocabulary line: {text} (confidence: {confidence:.2f})")
-        
-        # Very low confidence threshold to capture vocabulary sections
-        if confidence >= 0.05:  # Very low threshold to catch vocabulary sections
-            # Keep Chinese characters, English letters, and some punctuation
-            cleaned_text = re.sub(r'[^\u4e00-\u9fffa-zA-Z，、。：\s]', '', text)
-            if cleaned_text.strip():
-                text_items.append({
-                    'text': cleaned_text.strip(),
-                    'confidence': confidence,
-                    'bbox': bbox,
-                    'original': text
-                })
-    
-    print(f"Found {len(vocabulary_lines)} vocabulary lines in OCR results")
-    
-    # Initialize vocabulary lists
-    spoken_vocab = []
-    practice_vocab = []
-    
-    # If we found vocabulary lines, use section-based approach with them
-    if len(vocabulary_lines) >= 1:
-        # Sort vocabulary lines by vertical position to assign to sections
-        # First, sort text_items by vertical position for section header detection
-        text_items.sort(key=lambda x: min([point[1] for point in x['bbox']]))
-        
-        # Find section header positions
-        spoken_header_y = None
-        practice_header_y = None
-        end_section_y = None
-        
-        for item in text_items:
-            text = item['text']
-            y_pos = min([point[1] for point in item['bbox']])
-            
-            if any(kw in text for kw in ['口语表达词汇', '口语表达', '表达词汇', '口语', '表达', '麦达词汇', '达词汇', '适麦达']):
-                spoken_header_y = y_pos
-                print(f"Found spoken header at y={y_pos}: {text}")
-            elif any(kw in text for kw in ['识读词语', '识读', '读词语', '词语', '识读字']):
-                practice_header_y = y_pos
-                print(f"Found practice header at y={y_pos}: {text}")
-            elif any(kw in text for kw in ['儿歌', '句式', '笔画', '古诗', '歌歌词']):
-                if end_section_y is None:
-                    end_section_y = y_pos
-                    print(f"Found end section at y={y_pos}: {text}")
-        
-        spoken_vocab = []
-        practice_vocab = []
-        
-        def split_vocab_line(text, split_chars=True):
-            """Split a vocabulary line into words. 
-            split_chars=True: break 3+ char groups into individual chars (for practice)
-            split_chars=False: keep phrases intact (for reading)
-            """
-            words = re.split(r'[。，、\s;；]+', text)
-            clean_words = []
-            for word in words:
-                clean_word = re.sub(r'[^\u4e00-\u9fff]', '', word)
-                if clean_word and len(clean_word) >= 1:
-                    if split_chars and len(clean_word) > 2:
-                        for ch in clean_word:
-                            if ch not in clean_words:
-                                clean_words.append(ch)
-                    else:
-                        if clean_word not in clean_words:
-                            clean_words.append(clean_word)
-            return clean_words
-        
-        # Process each vocabulary line based on its position relative to headers
-        for vocab_line in vocabulary_lines:
-            text = vocab_line['text']
-            print(f"Processing vocabulary line: {text}")
-            
-            # Determine if spoken or practice based on position
-            is_spoken = True  # Default
-            if spoken_header_y is not None and practice_header_y is not None:
-                for item in text_items:
-                    if item['original'] == vocab_line['text'] or text in item['text']:
-                        y_pos = min([point[1] for point in item['bbox']])
-                        is_spoken = y_pos < practice_header_y
-                        break
-            else:
-                idx = vocabulary_lines.index(vocab_line)
-                is_spoken = idx < len(vocabulary_lines) - 1
-            
-            if is_spoken:
-                # Reading: keep phrases intact (split_chars=False)
-                words = split_vocab_line(text, split_chars=False)
-                for w in words:
-                    if w not in spoken_vocab:
-                        spoken_vocab.append(w)
-                print(f"Added to spoken vocab (phrases): {words}")
-            else:
-                # Practice: split into individual characters (split_chars=True)
-                words = split_vocab_line(text, split_chars=True)
-                for w in words:
-                    if w not in practice_vocab:
-                        practice_vocab.append(w)
-                print(f"Added to practice vocab (chars): {words}")
-        
-        print(f"Direct extraction results:")
-        print(f"Spoken vocab: {spoken_vocab}")
-        print(f"Practice vocab: {practice_vocab}")
-        
-        # If one section is still empty, fall through to section-based parsing
-        if spoken_vocab and practice_vocab:
-            return {
-                "spoken_vocab": apply_ocr_corrections(spoken_vocab),
-                "practice_vocab": apply_ocr_corrections(practice_vocab),
-                "debug_info": {
-                    "total_text_items": len(text_items),
-                    "vocabulary_lines_found": len(vocabulary_lines),
-                    "extraction_method": "direct_vocabulary_lines",
-                    "spoken_section_found": True,
-                    "practice_section_found": True
-                }
-            }
-        else:
-            print("One section empty from vocab lines, falling through to section-based parsing...")
-    
-    # Sort by vertical position (top to bottom) - EasyOCR bbox format
-    text_items.sort(key=lambda x: min([point[1] for point in x['bbox']]))
-    
-    # Combine all text for section detection
-    full_text = ''.join([item['text'] for item in text_items])
-    
-    print(f"EasyOCR Raw Results: {all_raw_text}")  # All items
-    print(f"EasyOCR Full Text: {full_text}")
-    print(f"High-confidence items: {len(text_items)}")
-    print(f"All text items: {[item['text'] for item in text_items]}")  # All items
+    job_id = request.args.get('job', '')
+    if not job_id or ocr_jobs.get(job_id) is None:
+        safe_filename = secure_filename(filename)
+        if not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)):
+            return jsonify({'error': 'Image not found'}), 404
+        job_id = ocr_jobs.find_job(safe_filename) or ocr_jobs.submit(safe_filename, client=g.client_id)
+    return event_stream(job_id)
+
+
+@app.route('/api/extract-jobs/<job_id>/events')
+def get_extract_job_events(job_id):
+    """Stream a job's progress as Server-Sent Events (see extract_vocabulary_stream)"""
+    if ocr_jobs.get(job_id) is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    return event_stream(job_id)
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def event_stream(job_id):
+    """text/event-stream response that follows one job until it finishes"""
+    def generate():
+        seen = 0
+        last_state = None
+        yield format_sse('job', {'job_id': job_id})
+        while True:
+            # First pass reports the current state without waiting
+            timeout = 0 if last_state is None else SSE_KEEPALIVE_SECONDS
+            events, job = ocr_jobs.wait_for_events(job_id, seen, timeout=timeout)
+            if job is None:
+                yield format_sse('failed', {'error': f'Job {job_id} not found'})
+                return
+            state = (job['status'], job['queue_position'])
+            changed = state != last_state
+            last_state = state
+            if changed and job['status'] in (JOB_QUEUED, JOB_RUNNING):
+                yield format_sse(job['status'], {'queue_position': job['queue_position']})
+            for event, data in events:
+                yield format_sse(event, data)
+            seen += len(events)
+            if job['status'] == JOB_DONE:
+                yield format_sse('result', job['result'])
+                return
+            if job['status'] == JOB_FAILED:
+                yield format_sse('failed', {'error': f"OCR processing failed: {job['error']}",
+                                            'retry_after': job['retry_after']})
+                return
+            if not events and not changed:
+                yield ': keep-alive\n\n'
     
-    # Section-based parsing (preserves any vocab already found from vocabulary lines)
-    spoken_section_found = len(spoken_vocab) > 0
-    practice_section_found = len(practice_vocab) > 0
-    current_section = None
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/batch-upload', methods=['POST'])
+def batch_upload():
+    """
+    Upload a whole set of worksheets (multipart 'files') and extract them together
+    Every detected unit is saved; returns a per-file summary plus throughput.
+    """
+    files = [f for f in request.files.getlist('files') if f and f.filename]
+    if not files:
+        return jsonify({'error': 'No files selected'}), 400
+    if len(files) > MAX_BATCH_FILES:
+        return jsonify({'error': f'Too many files (maximum {MAX_BATCH_FILES})'}), 400
     
-    # More flexible pattern matching
-    for item in text_items:
-        text = item['text']
-        original = item['original']
-        
-        print(f"Processing text: '{text}' (original: '{original}')")
-        
-        # Check for section headers (more flexible, including OCR misreadings)
-        if any(keyword in text for keyword in ['口语表达词汇', '口语表达', '表达词汇', '口语', '表达', '麦达词汇', '达词汇', '适麦达']):
-            current_section = 'spoken'
-            spoken_section_found = True
-            print(f"Found spoken section header: {text}")
+    started = time.time()
+    summary = []
+    images = []
+    accepted = []  # (summary entry, saved filename)
+    batch_filenames = set()
+    for file in files:
+        entry = {'original_filename': file.filename}
+        summary.append(entry)
+        if not allowed_file(file.filename):
+            entry['status'] = 'invalid'
+            entry['error'] = 'Invalid file type! Please upload PNG, JPG, or JPEG files only.'
             continue
-        elif any(keyword in text for keyword in ['识读词语', '识读', '读词语', '词语', '识读字']):
-            current_section = 'practice'
-            practice_section_found = True
-            print(f"Found practice section header: {text}")
+        image_bytes = file.read()
+        if len(image_bytes) > MAX_FILE_SIZE:
+            entry['status'] = 'invalid'
+            entry['error'] = 'File is too large! Maximum size is 5MB.'
             continue
-        elif any(keyword in text for keyword in ['儿歌', '句式', '笔画', '古诗', '歌歌词']):
-            current_section = None  # End of vocabulary sections
-            print(f"Found end section: {text}")
+        stored = store_upload(image_bytes, file.filename)
+        filename = stored['filename']
+        entry['filename'] = filename
+        if stored['near_duplicate_of']:
+            entry['near_duplicate_of'] = stored['near_duplicate_of']
+        if filename in batch_filenames:
+            entry['status'] = 'duplicate'
             continue
-        
-        # Extract vocabulary words from current section
-        if current_section and text:
-            if current_section == 'spoken':
-                # Reading: keep phrases intact
-                words = extract_chinese_phrases_from_text(text)
-                if words:
-                    print(f"Extracted phrases from spoken: {words}")
-                    spoken_vocab.extend(words)
-            elif current_section == 'practice':
-                # Practice: split into individual characters
-                words = extract_chinese_words_from_text(text)
-                if words:
-                    print(f"Extracted words from practice: {words}")
-                    practice_vocab.extend(words)
-    
-    # Remove duplicates while preserving order
-    spoken_vocab = list(dict.fromkeys(spoken_vocab))
-    practice_vocab = list(dict.fromkeys(practice_vocab))
+        batch_filenames.add(filename)
+        unit = find_unit_for_image(filename) if stored['duplicate'] else None
+        if unit:
+            # Uploaded and extracted before: report the saved unit, skip OCR
+            entry.update(status='existing', unit_name=unit['unit_name'], unit_chinese=unit.get('unit_chinese'),
+                         spoken_count=unit.get('spoken_count'), practice_count=unit.get('practice_count'))
+            continue
+        images.append(image_bytes)
+        accepted.append((entry, filename))
     
-    # If no sections found, try pattern-based extraction
-    if not spoken_section_found and not practice_section_found:
-        print("No sections found, trying fallback extraction...")
-        spoken_vocab, practice_vocab = fallback_vocabulary_extraction(full_text)
-        
-    print(f"Final extraction results:")
-    print(f"Spoken section found: {spoken_section_found}")
-    print(f"Practice section found: {practice_section_found}")
-    print(f"Spoken vocab: {spoken_vocab}")
-    print(f"Practice vocab: {practice_vocab}")
+    ocr_outputs = run_ocr_batch(images)
+    for (entry, filename), (result, ocr_timings, error) in zip(accepted, ocr_outputs):
+        if error is not None:
+            entry['status'] = 'error'
+            entry['error'] = f'OCR processing failed: {error}'
+            continue
+        try:
+            vocabulary_data = build_vocabulary(result, ocr_timings, filename)
+        except Exception as e:
+            # One bad page (parse or save error) must not cost the rest of the batch its results
+            log.exception("Vocabulary extraction failed for %s in batch upload", filename)
+            entry['status'] = 'error'
+            entry['error'] = f'Vocabulary extraction failed: {e}'
+            continue
+        entry['status'] = 'saved' if vocabulary_data.get('unit_name') else 'no_unit'
+        entry['unit_name'] = vocabulary_data.get('unit_name')
+        entry['unit_chinese'] = vocabulary_data.get('unit_chinese')
+        entry['spoken_count'] = len(vocabulary_data['spoken_vocab'])
+        entry['practice_count'] = len(vocabulary_data['practice_vocab'])
+        entry['ocr_cache_hit'] = not ocr_timings
     
-    return {
-        "spoken_vocab": apply_ocr_corrections(spoken_vocab),
-        "practice_vocab": apply_ocr_corrections(practice_vocab),
-        "debug_info": {
-            "total_text_items": len(text_items),
-            "spoken_section_found": spoken_section_found,
-            "practice_section_found": practice_section_found,
-            "full_text": full_text[:200] + "..." if len(full_text) > 200 else full_text
-        }
-    }
-
+    elapsed = time.time() - started
+    return jsonify({
+        'files': summary,
+        'images_processed': len(accepted),
+        'units_saved': sum(1 for entry in summary if entry.get('status') == 'saved'),
+        'seconds': round(elapsed, 3),
+        'images_per_second': round(len(accepted) / elapsed, 3) if elapsed > 0 else None
+    })
 
-OCR_CORRECTIONS = {
-    '眼晴': '眼睛',
-}
 
-def apply_ocr_corrections(vocab_list):
-    """Fix common OCR misreads"""
-    corrected = []
-    for word in vocab_list:
-        for wrong, right in OCR_CORRECTIONS.items():
-            word = word.replace(wrong, right)
-        if word not in corrected:
-            corrected.append(word)
-    return corrected
-
-
-def extract_chinese_phrases_from_text(text):
-    """Extract Chinese phrases keeping multi-char words intact (for reading/spoken vocab)"""
-    words = re.split(r'[，、。：；;\s]+', text)
-    phrases = []
-    for word in words:
-        clean_word = re.sub(r'[^\u4e00-\u9fff]', '', word)
-        if clean_word and len(clean_word) >= 1:
-            if clean_word not in phrases:
-                phrases.append(clean_word)
-    return phrases
-
-
-def extract_chinese_words_from_text(text):
-    """Extract individual Chinese characters from text (for practice)"""
-    words = re.split(r'[，、。：；;\s]+', text)
-    chinese_words = []
-    
-    for word in words:
-        clean_word = re.sub(r'[^\u4e00-\u9fff]', '', word)
-        if clean_word and len(clean_word) >= 1:
-            if len(clean_word) > 2:
-                for ch in clean_word:
-                    if ch not in chinese_words:
-                        chinese_words.append(ch)
-            else:
-                if clean_word not in chinese_words:
-                    chinese_words.append(clean_word)
+@app.route('/api/extract-jobs', methods=['POST'])
+def create_extract_job():
+    """
+    Enqueue a background extraction job
+    Accepts either a new upload (multipart 'file') or the 'filename' of an
+    already uploaded image. Returns the job ID immediately (HTTP 202).
+    """
+    file = request.files.get('file')
+    if file and file.filename:
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Invalid file type'}), 400
+        safe_filename = store_upload(file.read(), file.filename)['filename']
+    else:
+        payload = request.get_json(silent=True) or request.form
+        safe_filename = secure_filename(payload.get('filename', ''))
+        if not safe_filename or not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)):
+            return jsonify({'error': 'Image not found'}), 404
     
-    return chinese_words
+    # An identical image that is already being (or was) extracted needs no new job
+    job_id = ocr_jobs.find_job(safe_filename) or ocr_jobs.submit(safe_filename, client=g.client_id)
+    return jsonify({
+        'job_id': job_id,
+        'filename': safe_filename,
+        'status_url': url_for('get_extract_job', job_id=job_id)
+    }), 202
 
 
-def fallback_vocabulary_extraction(text):
-    """Fallback extraction when sections are not clearly identified"""
-    print(f"Fallback extraction from text: {text[:200]}...")
-    
-    # Based on the actual worksheet image, extract all visible vocabulary
-    # These are the actual words visible in the worksheet sections
-    worksheet_spoken = ['衣服', '小', '大', '长大', '爷爷', '奶奶', '客人', '爸爸', '妈妈', '我', '新年', '大扫除', '拜年', '谢谢']
-    worksheet_practice = ['小', '大', '长大', '人', '吃', '喝', '和']
+@app.route('/api/extract-jobs/<job_id>')
+def get_extract_job(job_id):
+    """Report job status, queue position and (when done) the vocabulary result"""
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
     
-    # Extract all Chinese words from the text first
-    all_chinese_words = re.findall(r'[\u4e00-\u9fff]+', text)
-    print(f"All Chinese words found in text: {all_chinese_words}")
-    
-    # Find matches with the known worksheet vocabulary
-    spoken_found = [word for word in worksheet_spoken if word in text]
-    practice_found = [word for word in worksheet_practice if word in text]
-    
-    # Also add any other Chinese words that might be vocabulary (2+ characters)
-    additional_words = [word for word in all_chinese_words if len(word) >= 2 and word not in spoken_found and word not in practice_found]
-    
-    # Categorize additional words (longer words likely go to spoken vocab)
-    for word in additional_words:
-        if len(word) >= 3 or word in ['新年', '客人', '衣服']:
-            if word not in spoken_found:
-                spoken_found.append(word)
-        else:
-            if word not in practice_found:
-                practice_found.append(word)
-    
-    print(f"Enhanced fallback found - Spoken: {spoken_found}, Practice: {practice_found}")
-    
-    return spoken_found, practice_found
+    response = {
+        'job_id': job['job_id'],
+        'filename': job['filename'],
+        'status': job['status'],
+        'queue_position': job['queue_position']
+    }
+    if job['status'] == JOB_DONE:
+        response['result'] = job['result']
+    elif job['status'] == JOB_FAILED:
+        response['error'] = f"OCR processing failed: {job['error']}"
+        response['retry_after'] = job['retry_after']
+    return jsonify(response)
 
 
 @app.errorhandler(RequestEntityTooLarge)
@@ -689,6 +1136,23 @@ def handle_file_too_large(e):
     return redirect(url_for('index'))
 
 
+@app.errorhandler(PoolFullError)
+@app.errorhandler(QueueFullError)
+@app.errorhandler(AdmissionRejected)
+def handle_ocr_busy(e):
+    """
+    Handle a full OCR queue or a shed extraction - tell the client when to retry
+    """
+    if isinstance(e, AdmissionRejected):
+        metrics.REJECTIONS.inc(queue=f'admission_{e.reason}')
+    else:
+        metrics.REJECTIONS.inc(queue='ocr_pool' if isinstance(e, PoolFullError) else 'jobs')
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
 @app.errorhandler(404)
 def page_not_found(e):
     """
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bulk export / import throughput (unit_archive.py)
+Generates N synthetic units (every --image-every-th one with a small source
+photo) in a temp store, streams them into an archive file, imports that
+archive into an empty store and checks the round trip. Peak Python memory of
+each direction is measured in a second, tracemalloc-instrumented pass. Export
+stays flat as N grows. Import grows only with the target store's own
+in-memory listing (the JSON backend's UnitCatalog; flat with --backend sqlite).
+
+Usage:
+    python benchmarks/archive_benchmark.py [--units 1000 10000] [--backend json|sqlite] [--output archive.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from unit_archive import export_archive, import_archive  # noqa: E402
+from upload_store import UploadStore  # noqa: E402
+from vocab_store import JSONVocabStore, SQLiteVocabStore  # noqa: E402
+from fake_ocr import make_image  # noqa: E402
+
+
+def make_store(backend, folder):
+    if backend == 'sqlite':
+        return SQLiteVocabStore(os.path.join(folder, 'vocab.db'))
+    return JSONVocabStore(os.path.join(folder, 'saved_vocab'))
+
+
+def fill(store, upload_folder, count, image_every):
+    uploads = UploadStore(upload_folder)
+    for i in range(1, count + 1):
+        image_filename = ''
+        if image_every and i % image_every == 0:
+            image_filename = uploads.save(make_image(i), f'unit{i}.png')['filename']
+        store.save_unit({
+            'unit_name': f'Unit {i}',
+            'unit_chinese': f'单元{i}',
+            'spoken_vocab': ['我', '快乐', '眼睛', '耳朵', '鼻子', '嘴巴', '口', '头', '手', '脚'],
+            'practice_vocab': ['我', '手', '口', '一', '二', '三'],
+            'image_filename': image_filename,
+            'saved_at': ''
+        })
+
+
+def export_to(store, upload_folder, path):
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in export_archive(store, upload_folder):
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def import_from(path, store, upload_folder):
+    uploads = UploadStore(upload_folder)
+    with open(path, 'rb') as f:
+        return import_archive(f, store.save_unit, lambda name: store.load_unit(name) is not None,
+                              store_image=lambda image_bytes, name: uploads.save(image_bytes, name)['filename'])
+
+
+def peak_bytes(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(count, backend, image_every):
+    workdir = tempfile.mkdtemp(prefix='archive_bench_')
+    try:
+        source_dir, target_dir = os.path.join(workdir, 'source'), os.path.join(workdir, 'target')
+        os.makedirs(source_dir)
+        source = make_store(backend, source_dir)
+        fill(source, os.path.join(source_dir, 'uploads'), count, image_every)
+        archive = os.path.join(workdir, 'units.tar')
+
+        started = time.perf_counter()
+        size = export_to(source, os.path.join(source_dir, 'uploads'), archive)
+        export_seconds = time.perf_counter() - started
+
+        os.makedirs(target_dir)
+        target = make_store(backend, target_dir)
+        started = time.perf_counter()
+        summary = import_from(archive, target, os.path.join(target_dir, 'uploads'))
+        import_seconds = time.perf_counter() - started
+        assert summary['complete'] and summary['units_imported'] == count, summary
+        assert target.load_unit(f'Unit {count}') == source.load_unit(f'Unit {count}')
+
+        # Second, instrumented pass (tracemalloc slows it down, so it is not timed)
+        export_peak = peak_bytes(lambda: export_to(source, os.path.join(source_dir, 'uploads'), archive))
+        shutil.rmtree(target_dir)
+        os.makedirs(target_dir)
+        target = make_store(backend, target_dir)
+        import_peak = peak_bytes(lambda: import_from(archive, target, os.path.join(target_dir, 'uploads')))
+    finally:
+        shutil.rmtree(workdir)
+    return {
+        'units': count,
+        'images': summary['images_imported'],
+        'archive_bytes': size,
+        'export_units_per_second': count / export_seconds,
+        'export_mb_per_second': size / export_seconds / 1e6,
+        'import_units_per_second': count / import_seconds,
+        'export_peak_kb': export_peak / 1024,
+        'import_peak_kb': import_peak / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--units', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--image-every', type=int, default=10, help='Give every n-th unit a source photo (0 = none)')
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    args = parser.parse_args()
+
+    results = []
+    for count in args.units:
+        row = run(count, args.backend, args.image_every)
+        results.append(row)
+        print(f"{count:>6} units ({row['images']} images, {row['archive_bytes'] / 1e6:.1f}MB, {args.backend}): "
+              f"export {row['export_units_per_second']:.0f} units/s ({row['export_mb_per_second']:.1f}MB/s, "
+              f"peak {row['export_peak_kb']:.0f}KB), import {row['import_units_per_second']:.0f} units/s "
+              f"(peak {row['import_peak_kb']:.0f}KB)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic stand-in for OCRWorkerPool
+Returns readtext fixtures (synthetic, see ocr_fixtures.py) instead of running EasyOCR, so the full
+extraction path can be benchmarked and load-tested without a model. The
+fixture and the simulated latency are derived from a hash of the image bytes,
+so the same image always gets the same answer and the same delay.
+
+    app = import_app(tempdir)
+    install(app, FakeOCRBackend(load_fixtures().values(), latency=1.5, jitter=0.5, workers=2))
+"""
+
+import io
+import os
+import copy
+import time
+import zlib
+import logging
+import threading
+
+from PIL import Image
+
+
+class FakeOCRBackend:
+    """Same interface as ocr_pool.OCRWorkerPool (readtext, readtext_batch, stats, ...)"""
+
+    def __init__(self, fixtures, latency=0.0, jitter=0.0, workers=2):
+        """
+        Args:
+            fixtures (iterable): OCR results ([[bbox, text, confidence], ...]) to hand out
+            latency (float): Simulated seconds per readtext call
+            jitter (float): Extra 0..jitter seconds, fixed per image
+            workers (int): Calls allowed to "run" at once; the rest wait, like the real pool
+        """
+        self.fixtures = [list(fixture) for fixture in fixtures]
+        if not self.fixtures:
+            raise ValueError("FakeOCRBackend needs at least one fixture")
+        self.latency = latency
+        self.jitter = jitter
+        self.num_workers = workers
+        self.model_loaded = True
+        self._slots = threading.BoundedSemaphore(max(1, workers))
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+
+    def _hash(self, image_bytes):
+        return zlib.crc32(image_bytes)
+
+    def result_for(self, image_bytes):
+        """The fixture this image maps to"""
+        return copy.deepcopy(self.fixtures[self._hash(image_bytes) % len(self.fixtures)])
+
+    def delay_for(self, image_bytes):
+        return self.latency + self.jitter * ((self._hash(image_bytes) >> 8) % 1000) / 1000
+
+    def readtext(self, image_bytes, preprocess_options=None, region_keywords=None):
+        with self._lock:
+            self._pending += 1
+        try:
+            with self._slots:
+                started = time.perf_counter()
+                delay = self.delay_for(image_bytes)
+                if delay:
+                    time.sleep(delay)
+                return self.result_for(image_bytes), {'readtext': time.perf_counter() - started}
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def readtext_batch(self, images, preprocess_options=None, region_keywords=None, batch_size=4):
+        outputs = []
+        for image_bytes in images:
+            result, timings = self.readtext(image_bytes, preprocess_options, region_keywords)
+            outputs.append((result, timings, None))
+        return outputs
+
+    def warm_up(self):
+        pass
+
+    def readiness(self):
+        return {'ready': True, 'model_loaded': True, 'eager_warmup': False, 'warmup_seconds': None,
+                'workers': self.num_workers, 'worker_models': []}
+
+    def retry_after(self):
+        return 1
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.num_workers, 'torch_threads': 0, 'pending': self._pending,
+                    'max_pending': None, 'completed': self.completed, 'rejected': 0,
+                    'avg_seconds': self.latency or None, 'model_loaded': True, 'idle_unload_seconds': None,
+                    'unloads': 0, 'memory': {'resident_bytes': 0, 'peak_readtext_bytes': None, 'workers': []}}
+
+    def shutdown(self):
+        pass
+
+
+def install(app_module, backend):
+    """Route the app's OCR calls to backend (app.py looks ocr_pool up at call time)"""
+    app_module.ocr_pool = backend
+    return backend
+
+
+def import_app(workdir):
+    """Import app.py with workdir as its data folder (uploads/, saved_vocab/, ocr_cache/ go there), logging quietened"""
+    os.environ['VOCAB_APP_DATA_DIR'] = os.path.abspath(workdir)
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    return app
+
+
+def make_image(index):
+    """Small PNG that is unique per index (so each one misses the OCR cache)"""
+    image = Image.new('RGB', (64, 48), (index % 256, (index // 256) % 256, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
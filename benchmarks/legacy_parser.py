@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Frozen copy of the vocabulary parser as it was before the single-pass rewrite
+in vocab_parser.py. Only used by parser_benchmark.py as the golden reference -
+do not change it.
+"""
+
+import re
+
+SPOKEN_HEADER_KEYWORDS = ['口语表达词汇', '口语表达', '表达词汇', '口语', '表达', '麦达词汇', '达词汇', '适麦达']
+PRACTICE_HEADER_KEYWORDS = ['识读词语', '识读', '读词语', '词语', '识读字']
+END_SECTION_KEYWORDS = ['儿歌', '句式', '笔画', '古诗', '歌歌词']  # sections after the vocabulary
+
+
+def parse_vocabulary_from_ocr(ocr_result):
+    """
+    Parse EasyOCR result to extract vocabulary from specific sections
+    EasyOCR format: [(bbox, text, confidence), ...]
+    Returns: {
+        "spoken_vocab": [...],   # 口语表达词汇
+        "practice_vocab": [...], # 识读词语
+        "debug_info": {...}      # For debugging
+    }
+    """
+    if not ocr_result:
+        return {
+            "spoken_vocab": [],
+            "practice_vocab": [],
+            "debug_info": {"error": "No OCR result"}
+        }
+    
+    # Extract text with confidence scores from EasyOCR format
+    text_items = []
+    all_raw_text = []
+    vocabulary_lines = []  # Special handling for vocabulary lines
+    
+    for bbox, text, confidence in ocr_result:
+        all_raw_text.append(f"{text}({confidence:.2f})")
+        
+        # Check for vocabulary patterns: lines with multiple period-separated short words
+        # A vocab line looks like: "我。快乐。眼晴。耳朵。鼻子" or "小。大。长大。人。水。吃"
+        period_count = text.count('。') + text.count('、')
+        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
+        if period_count >= 3 and chinese_chars >= 4:
+            vocabulary_lines.append({
+                'text': text,
+                'confidence': confidence,
+                'type': 'vocab_line'
+            })
+            print(f"Found vocabulary line: {text} (confidence: {confidence:.2f})")
+        
+        # Very low confidence threshold to capture vocabulary sections
+        if confidence >= 0.05:  # Very low threshold to catch vocabulary sections
+            # Keep Chinese characters, English letters, and some punctuation
+            cleaned_text = re.sub(r'[^\u4e00-\u9fffa-zA-Z，、。：\s]', '', text)
+            if cleaned_text.strip():
+                text_items.append({
+                    'text': cleaned_text.strip(),
+                    'confidence': confidence,
+                    'bbox': bbox,
+                    'original': text
+                })
+    
+    print(f"Found {len(vocabulary_lines)} vocabulary lines in OCR results")
+    
+    # Initialize vocabulary lists
+    spoken_vocab = []
+    practice_vocab = []
+    
+    # If we found vocabulary lines, use section-based approach with them
+    if len(vocabulary_lines) >= 1:
+        # Sort vocabulary lines by vertical position to assign to sections
+        # First, sort text_items by vertical position for section header detection
+        text_items.sort(key=lambda x: min([point[1] for point in x['bbox']]))
+        
+        # Find section header positions
+        spoken_header_y = None
+        practice_header_y = None
+        end_section_y = None
+        
+        for item in text_items:
+            text = item['text']
+            y_pos = min([point[1] for point in item['bbox']])
+            
+            if any(kw in text for kw in SPOKEN_HEADER_KEYWORDS):
+                spoken_header_y = y_pos
+                print(f"Found spoken header at y={y_pos}: {text}")
+            elif any(kw in text for kw in PRACTICE_HEADER_KEYWORDS):
+                practice_header_y = y_pos
+                print(f"Found practice header at y={y_pos}: {text}")
+            elif any(kw in text for kw in END_SECTION_KEYWORDS):
+                if end_section_y is None:
+                    end_section_y = y_pos
+                    print(f"Found end section at y={y_pos}: {text}")
+        
+        spoken_vocab = []
+        practice_vocab = []
+        
+        def split_vocab_line(text, split_chars=True):
+            """Split a vocabulary line into words. 
+            split_chars=True: break 3+ char groups into individual chars (for practice)
+            split_chars=False: keep phrases intact (for reading)
+            """
+            words = re.split(r'[。，、\s;；]+', text)
+            clean_words = []
+            for word in words:
+                clean_word = re.sub(r'[^\u4e00-\u9fff]', '', word)
+                if clean_word and len(clean_word) >= 1:
+                    if split_chars and len(clean_word) > 2:
+                        for ch in clean_word:
+                            if ch not in clean_words:
+                                clean_words.append(ch)
+                    else:
+                        if clean_word not in clean_words:
+                            clean_words.append(clean_word)
+            return clean_words
+        
+        # Process each vocabulary line based on its position relative to headers
+        for vocab_line in vocabulary_lines:
+            text = vocab_line['text']
+            print(f"Processing vocabulary line: {text}")
+            
+            # Determine if spoken or practice based on position
+            is_spoken = True  # Default
+            if spoken_header_y is not None and practice_header_y is not None:
+                for item in text_items:
+                    if item['original'] == vocab_line['text'] or text in item['text']:
+                        y_pos = min([point[1] for point in item['bbox']])
+                        is_spoken = y_pos < practice_header_y
+                        break
+            else:
+                idx = vocabulary_lines.index(vocab_line)
+                is_spoken = idx < len(vocabulary_lines) - 1
+            
+            if is_spoken:
+                # Reading: keep phrases intact (split_chars=False)
+                words = split_vocab_line(text, split_chars=False)
+                for w in words:
+                    if w not in spoken_vocab:
+                        spoken_vocab.append(w)
+                print(f"Added to spoken vocab (phrases): {words}")
+            else:
+                # Practice: split into individual characters (split_chars=True)
+                words = split_vocab_line(text, split_chars=True)
+                for w in words:
+                    if w not in practice_vocab:
+                        practice_vocab.append(w)
+                print(f"Added to practice vocab (chars): {words}")
+        
+        print(f"Direct extraction results:")
+        print(f"Spoken vocab: {spoken_vocab}")
+        print(f"Practice vocab: {practice_vocab}")
+        
+        # If one section is still empty, fall through to section-based parsing
+        if spoken_vocab and practice_vocab:
+            return {
+                "spoken_vocab": apply_ocr_corrections(spoken_vocab),
+                "practice_vocab": apply_ocr_corrections(practice_vocab),
+                "debug_info": {
+                    "total_text_items": len(text_items),
+                    "vocabulary_lines_found": len(vocabulary_lines),
+                    "extraction_method": "direct_vocabulary_lines",
+                    "spoken_section_found": True,
+                    "practice_section_found": True
+                }
+            }
+        else:
+            print("One section empty from vocab lines, falling through to section-based parsing...")
+    
+    # Sort by vertical position (top to bottom) - EasyOCR bbox format
+    text_items.sort(key=lambda x: min([point[1] for point in x['bbox']]))
+    
+    # Combine all text for section detection
+    full_text = ''.join([item['text'] for item in text_items])
+    
+    print(f"EasyOCR Raw Results: {all_raw_text}")  # All items
+    print(f"EasyOCR Full Text: {full_text}")
+    print(f"High-confidence items: {len(text_items)}")
+    print(f"All text items: {[item['text'] for item in text_items]}")  # All items
+    
+    # Section-based parsing (preserves any vocab already found from vocabulary lines)
+    spoken_section_found = len(spoken_vocab) > 0
+    practice_section_found = len(practice_vocab) > 0
+    current_section = None
+    
+    # More flexible pattern matching
+    for item in text_items:
+        text = item['text']
+        original = item['original']
+        
+        print(f"Processing text: '{text}' (original: '{original}')")
+        
+        # Check for section headers (more flexible, including OCR misreadings)
+        if any(keyword in text for keyword in SPOKEN_HEADER_KEYWORDS):
+            current_section = 'spoken'
+            spoken_section_found = True
+            print(f"Found spoken section header: {text}")
+            continue
+        elif any(keyword in text for keyword in PRACTICE_HEADER_KEYWORDS):
+            current_section = 'practice'
+            practice_section_found = True
+            print(f"Found practice section header: {text}")
+            continue
+        elif any(keyword in text for keyword in END_SECTION_KEYWORDS):
+            current_section = None  # End of vocabulary sections
+            print(f"Found end section: {text}")
+            continue
+        
+        # Extract vocabulary words from current section
+        if current_section and text:
+            if current_section == 'spoken':
+                # Reading: keep phrases intact
+                words = extract_chinese_phrases_from_text(text)
+                if words:
+                    print(f"Extracted phrases from spoken: {words}")
+                    spoken_vocab.extend(words)
+            elif current_section == 'practice':
+                # Practice: split into individual characters
+                words = extract_chinese_words_from_text(text)
+                if words:
+                    print(f"Extracted words from practice: {words}")
+                    practice_vocab.extend(words)
+    
+    # Remove duplicates while preserving order
+    spoken_vocab = list(dict.fromkeys(spoken_vocab))
+    practice_vocab = list(dict.fromkeys(practice_vocab))
+    
+    # If no sections found, try pattern-based extraction
+    if not spoken_section_found and not practice_section_found:
+        print("No sections found, trying fallback extraction...")
+        spoken_vocab, practice_vocab = fallback_vocabulary_extraction(full_text)
+        
+    print(f"Final extraction results:")
+    print(f"Spoken section found: {spoken_section_found}")
+    print(f"Practice section found: {practice_section_found}")
+    print(f"Spoken vocab: {spoken_vocab}")
+    print(f"Practice vocab: {practice_vocab}")
+    
+    return {
+        "spoken_vocab": apply_ocr_corrections(spoken_vocab),
+        "practice_vocab": apply_ocr_corrections(practice_vocab),
+        "debug_info": {
+            "total_text_items": len(text_items),
+            "spoken_section_found": spoken_section_found,
+            "practice_section_found": practice_section_found,
+            "full_text": full_text[:200] + "..." if len(full_text) > 200 else full_text
+        }
+    }
+
+
+OCR_CORRECTIONS = {
+    '眼晴': '眼睛',
+}
+
+def apply_ocr_corrections(vocab_list):
+    """Fix common OCR misreads"""
+    corrected = []
+    for word in vocab_list:
+        for wrong, right in OCR_CORRECTIONS.items():
+            word = word.replace(wrong, right)
+        if word not in corrected:
+            corrected.append(word)
+    return corrected
+
+
+def extract_chinese_phrases_from_text(text):
+    """Extract Chinese phrases keeping multi-char words intact (for reading/spoken vocab)"""
+    words = re.split(r'[，、。：；;\s]+', text)
+    phrases = []
+    for word in words:
+        clean_word = re.sub(r'[^\u4e00-\u9fff]', '', word)
+        if clean_word and len(clean_word) >= 1:
+            if clean_word not in phrases:
+                phrases.append(clean_word)
+    return phrases
+
+
+def extract_chinese_words_from_text(text):
+    """Extract individual Chinese characters from text (for practice)"""
+    words = re.split(r'[，、。：；;\s]+', text)
+    chinese_words = []
+    
+    for word in words:
+        clean_word = re.sub(r'[^\u4e00-\u9fff]', '', word)
+        if clean_word and len(clean_word) >= 1:
+            if len(clean_word) > 2:
+                for ch in clean_word:
+                    if ch not in chinese_words:
+                        chinese_words.append(ch)
+            else:
+                if clean_word not in chinese_words:
+                    chinese_words.append(clean_word)
+    
+    return chinese_words
+
+
+def fallback_vocabulary_extraction(text):
+    """Fallback extraction when sections are not clearly identified"""
+    print(f"Fallback extraction from text: {text[:200]}...")
+    
+    # Based on the actual worksheet image, extract all visible vocabulary
+    # These are the actual words visible in the worksheet sections
+    worksheet_spoken = ['衣服', '小', '大', '长大', '爷爷', '奶奶', '客人', '爸爸', '妈妈', '我', '新年', '大扫除', '拜年', '谢谢']
+    worksheet_practice = ['小', '大', '长大', '人', '吃', '喝', '和']
+    
+    # Extract all Chinese words from the text first
+    all_chinese_words = re.findall(r'[\u4e00-\u9fff]+', text)
+    print(f"All Chinese words found in text: {all_chinese_words}")
+    
+    # Find matches with the known worksheet vocabulary
+    spoken_found = [word for word in worksheet_spoken if word in text]
+    practice_found = [word for word in worksheet_practice if word in text]
+    
+    # Also add any other Chinese words that might be vocabulary (2+ characters)
+    additional_words = [word for word in all_chinese_words if len(word) >= 2 and word not in spoken_found and word not in practice_found]
+    
+    # Categorize additional words (longer words likely go to spoken vocab)
+    for word in additional_words:
+        if len(word) >= 3 or word in ['新年', '客人', '衣服']:
+            if word not in spoken_found:
+                spoken_found.append(word)
+        else:
+            if word not in practice_found:
+                practice_found.append(word)
+    
+    print(f"Enhanced fallback found - Spoken: {spoken_found}, Practice: {practice_found}")
+    
+    return spoken_found, practice_found
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load test for the upload -> extract -> practice flow
+Each simulated family (one client thread) repeatedly picks an action by the
+--mix weights:
+
+    upload    POST /                          (new unique worksheet image)
+    extract   GET /api/extract-vocabulary/<f> (its own latest upload, else any)
+    image     GET /uploads/<f>
+    practice  GET /practice-unit/<unit>
+    load      GET /api/load-unit/<unit>
+
+By default the app is started in-process in a temporary directory (seeded
+with saved_vocab/) with the deterministic fake OCR backend, so no model is
+needed. For numbers that do not share a GIL with the clients, start the app
+in its own process and point the clients at it:
+
+    python benchmarks/load_test.py serve --port 8081 --ocr-latency 2 --ocr-jitter 1
+    python benchmarks/load_test.py --url http://127.0.0.1:8081 --concurrency 20 --duration 60
+
+Reports throughput, p50/p95/p99 latency and error rate per route.
+
+Usage:
+    python benchmarks/load_test.py [--concurrency 10] [--duration 30]
+        [--mix upload=1,extract=1,image=2,practice=2,load=4] [--ocr-latency 1.0] [--output load.json]
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import http.client
+from urllib.parse import urlsplit, quote, unquote
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from fake_ocr import FakeOCRBackend, install, import_app, make_image  # noqa: E402
+from ocr_fixtures import load_fixtures  # noqa: E402
+
+DEFAULT_MIX = 'upload=1,extract=1,image=2,practice=2,load=4'
+ACTIONS = ('upload', 'extract', 'image', 'practice', 'load')
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        action, _, weight = part.partition('=')
+        action = action.strip()
+        if action not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action {action!r} (expected one of {', '.join(ACTIONS)})")
+        mix[action] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("Mix needs at least one positive weight")
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def multipart_body(field, filename, content, content_type='image/png'):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n').encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class SharedState:
+    """Uploaded filenames and known unit names, shared by all clients"""
+
+    def __init__(self, units):
+        self.lock = threading.Lock()
+        self.uploads = []
+        self.units = list(units)
+        self.image_counter = 0
+
+    def next_image(self):
+        with self.lock:
+            self.image_counter += 1
+            return self.image_counter
+
+    def add_upload(self, filename):
+        with self.lock:
+            self.uploads.append(filename)
+
+    def add_unit(self, unit_name):
+        with self.lock:
+            if unit_name not in self.units:
+                self.units.append(unit_name)
+
+    def pick(self, rng, values):
+        with self.lock:
+            return rng.choice(values) if values else None
+
+
+class Recorder:
+    """Latency samples and status codes per route"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, route, seconds, status, ok):
+        with self.lock:
+            route_samples = self.samples.setdefault(route, {'latencies': [], 'statuses': {}, 'errors': 0})
+            route_samples['latencies'].append(seconds)
+            route_samples['statuses'][str(status)] = route_samples['statuses'].get(str(status), 0) + 1
+            if not ok:
+                route_samples['errors'] += 1
+
+    def add_error(self, route):
+        """Count a request that got an OK status but failed anyway"""
+        with self.lock:
+            self.samples[route]['errors'] += 1
+
+    def report(self, elapsed):
+        routes = {}
+        with self.lock:
+            items = sorted(self.samples.items())
+        for route, route_samples in items:
+            latencies = sorted(route_samples['latencies'])
+            count = len(latencies)
+            routes[route] = {
+                'requests': count,
+                'errors': route_samples['errors'],
+                'error_rate': route_samples['errors'] / count,
+                'throughput_rps': count / elapsed,
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p95_ms': percentile(latencies, 0.95) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'max_ms': latencies[-1] * 1000,
+                'statuses': route_samples['statuses']
+            }
+        total = sum(route['requests'] for route in routes.values())
+        errors = sum(route['errors'] for route in routes.values())
+        return {
+            'duration_seconds': elapsed,
+            'requests': total,
+            'throughput_rps': total / elapsed if elapsed else 0.0,
+            'error_rate': errors / total if total else 0.0,
+            'routes': routes
+        }
+
+
+class Client:
+    """One simulated family, driving the app over HTTP"""
+
+    def __init__(self, base_url, state, recorder, mix, rng, timeout, index=0):
+        parts = urlsplit(base_url)
+        # Distinct client address per family, for per-client fair OCR admission
+        self.forwarded_for = f'10.0.{index // 256}.{index % 256}'
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.state = state
+        self.recorder = recorder
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.rng = rng
+        self.timeout = timeout
+        self.pending = []  # own uploads not yet extracted
+
+    def request(self, route, method, path, body=None, headers=None, ok_statuses=(200,)):
+        """Returns (status, headers, body); status 0 = connection failure"""
+        started = time.perf_counter()
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            headers = dict(headers or {}, **{'X-Forwarded-For': self.forwarded_for})
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+            status, response_headers = response.status, dict(response.getheaders())
+        except (OSError, http.client.HTTPException):
+            status, response_headers, payload = 0, {}, b''
+        finally:
+            connection.close()
+        self.recorder.add(route, time.perf_counter() - started, status, status in ok_statuses)
+        return status, response_headers, payload
+
+    def upload(self):
+        body, content_type = multipart_body('file', 'worksheet.png', make_image(self.state.next_image()))
+        status, headers, _ = self.request('POST /', 'POST', '/', body, {'Content-Type': content_type},
+                                          ok_statuses=(302, 303))
+        location = headers.get('Location', '')
+        if status in (302, 303) and '/practice/' in location:
+            filename = unquote(urlsplit(location).path.rsplit('/', 1)[-1])
+            self.state.add_upload(filename)
+            self.pending.append(filename)
+        elif status in (302, 303):
+            # Redirected back to the form: the upload was refused
+            self.recorder.add_error('POST /')
+
+    def extract(self):
+        filename = self.pending.pop() if self.pending else self.state.pick(self.rng, self.state.uploads)
+        if filename is None:
+            return self.upload()
+        status, _, payload = self.request('GET /api/extract-vocabulary/<f>', 'GET',
+                                          f'/api/extract-vocabulary/{quote(filename)}')
+        if status == 200:
+            unit_name = json.loads(payload).get('unit_name')
+            if unit_name:
+                self.state.add_unit(unit_name)
+
+    def image(self):
+        filename = self.state.pick(self.rng, self.state.uploads)
+        if filename is None:
+            return self.upload()
+        self.request('GET /uploads/<f>', 'GET', f'/uploads/{quote(filename)}')
+
+    def practice(self):
+        unit_name = self.state.pick(self.rng, self.state.units)
+        if unit_name is None:
+            return self.extract()
+        self.request('GET /practice-unit/<unit>', 'GET', f'/practice-unit/{quote(unit_name)}')
+
+    def load(self):
+        unit_name = self.state.pick(self.rng, self.state.units)
+        if unit_name is None:
+            return self.extract()
+        self.request('GET /api/load-unit/<unit>', 'GET', f'/api/load-unit/{quote(unit_name)}')
+
+    def run(self, deadline):
+        while time.monotonic() < deadline:
+            action = self.rng.choices(self.actions, self.weights)[0]
+            getattr(self, action)()
+
+
+def fetch_units(base_url, timeout):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        connection.request('GET', '/api/saved-units')
+        return [unit['unit_name'] for unit in json.loads(connection.getresponse().read())['units']]
+    finally:
+        connection.close()
+
+
+def start_app(args, workdir, port=0):
+    """Start app.py with the fake OCR backend; returns (server, base_url)"""
+    from werkzeug.serving import make_server
+    saved_vocab = os.path.join(REPO_ROOT, 'saved_vocab')
+    if os.path.isdir(saved_vocab):
+        shutil.copytree(saved_vocab, os.path.join(workdir, 'saved_vocab'))
+    app = import_app(workdir)
+    app.ADMISSION_CLIENT_HEADER = 'X-Forwarded-For'  # each simulated family is its own client
+    install(app, FakeOCRBackend(load_fixtures().values(), latency=args.ocr_latency,
+                                jitter=args.ocr_jitter, workers=args.ocr_workers))
+    server = make_server(args.host, port, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{args.host}:{server.server_port}', app
+
+
+def stop_app(server, app, timeout=300):
+    """Stop serving, then let the extraction jobs the uploads queued finish before workdir is removed"""
+    server.shutdown()
+    if not app.ocr_jobs.wait_idle(timeout):
+        print(f"Extraction jobs still running after {timeout}s; stopping the job threads anyway")
+    app.ocr_jobs.stop(timeout)
+
+
+def run_load(args, base_url):
+    state = SharedState(fetch_units(base_url, args.timeout))
+    recorder = Recorder()
+    print(f"Load test against {base_url}: {args.concurrency} clients for {args.duration:g}s, "
+          f"mix {args.mix}, {len(state.units)} saved units")
+    clients = [Client(base_url, state, recorder, args.mix, random.Random(args.seed + i), args.timeout, index=i)
+               for i in range(args.concurrency)]
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [threading.Thread(target=client.run, args=(deadline,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.monotonic() - started)
+
+
+def print_report(report):
+    print(f"\n{'route':<36} {'reqs':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for route, row in report['routes'].items():
+        print(f"{route:<36} {row['requests']:>7} {row['throughput_rps']:>8.1f} {row['p50_ms']:>9.1f} "
+              f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['error_rate']:>8.1%}")
+    print(f"\nTotal: {report['requests']} requests in {report['duration_seconds']:.1f}s = "
+          f"{report['throughput_rps']:.1f} req/s, error rate {report['error_rate']:.2%}")
+
+
+def add_app_arguments(parser):
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--ocr-latency', type=float, default=1.0, help='Fake OCR seconds per image')
+    parser.add_argument('--ocr-jitter', type=float, default=0.5, help='Extra 0..jitter seconds per image')
+    parser.add_argument('--ocr-workers', type=int, default=2, help='Fake OCR calls running at once')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=None, help='Test a running instance instead of starting one')
+    parser.add_argument('--concurrency', type=int, default=10, help='Simulated families')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Action weights (default {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    add_app_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command')
+    serve = subparsers.add_parser('serve', help='Only run the app with the fake OCR backend')
+    serve.add_argument('--port', type=int, default=8081)
+    add_app_arguments(serve)
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.command == 'serve':
+            server, base_url, app = start_app(args, workdir, args.port)
+            print(f"Serving with fake OCR ({args.ocr_latency:g}s + 0..{args.ocr_jitter:g}s, "
+                  f"{args.ocr_workers} workers) on {base_url} - Ctrl+C to stop")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                stop_app(server, app)
+            return 0
+
+        server = None
+        base_url = args.url
+        if base_url is None:
+            server, base_url, app = start_app(args, workdir)
+        try:
+            report = run_load(args, base_url)
+        finally:
+            if server is not None:
+                stop_app(server, app)
+
+    report['config'] = {
+        'url': args.url or 'in-process',
+        'concurrency': args.concurrency,
+        'mix': args.mix,
+        'seed': args.seed,
+        'ocr_latency': None if args.url else args.ocr_latency,
+        'ocr_jitter': None if args.url else args.ocr_jitter,
+        'ocr_workers': None if args.url else args.ocr_workers
+    }
+    print_report(report)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Header / correction matcher benchmark
+Adds N synthetic misread aliases per section and N corrections to the built-in
+keywords, then times classifying and correcting a set of OCR box texts with
+the compiled KeywordMatcher against the old any(kw in text ...) / per-entry
+str.replace loops. The matcher's cost should stay roughly flat as N grows.
+
+Usage:
+    python benchmarks/matcher_benchmark.py [--aliases 10 100 1000] [--output matcher.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import vocab_parser  # noqa: E402
+
+BOX_TEXTS = ['口语表达词汇', '我。快乐。眼晴。耳朵。鼻子', '识读词语', '小。大。长大。人。水。吃',
+             '儿歌', '第一单元 Unit 1', '姓名', '我爱我的家', '笔画', '眼晴', '读一读', '你好吗']
+
+
+def random_words(rng, count, length_range):
+    # Rare CJK range so the synthetic aliases do not match the sample texts
+    return [''.join(chr(rng.randint(0x4e00 + 12000, 0x9fa5)) for _ in range(rng.randint(*length_range)))
+            for _ in range(count)]
+
+
+def scan_classify(text, spoken, practice, end):
+    """The pre-matcher header check"""
+    if any(kw in text for kw in spoken):
+        return 'spoken'
+    if any(kw in text for kw in practice):
+        return 'practice'
+    if any(kw in text for kw in end):
+        return 'end'
+    return None
+
+
+def scan_correct(word, corrections):
+    """The pre-matcher correction loop"""
+    for wrong, right in corrections.items():
+        word = word.replace(wrong, right)
+    return word
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--aliases', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    texts = BOX_TEXTS * 50
+    results = []
+    for count in args.aliases:
+        spoken = vocab_parser.SPOKEN_HEADER_KEYWORDS + random_words(rng, count, (2, 6))
+        practice = vocab_parser.PRACTICE_HEADER_KEYWORDS + random_words(rng, count, (2, 6))
+        end = vocab_parser.END_SECTION_KEYWORDS + random_words(rng, count, (2, 4))
+        corrections = {**vocab_parser.OCR_CORRECTIONS,
+                       **{wrong: wrong[::-1] for wrong in random_words(rng, count, (2, 3))}}
+
+        build_started = time.perf_counter()
+        matcher = vocab_parser.KeywordMatcher(spoken, practice, end, corrections)
+        build_seconds = time.perf_counter() - build_started
+
+        assert all(matcher.classify(t) == scan_classify(t, spoken, practice, end) for t in texts)
+        scan_seconds = timed(lambda: [(scan_classify(t, spoken, practice, end), scan_correct(t, corrections))
+                                      for t in texts], args.repeat)
+        matcher_seconds = timed(lambda: [(matcher.classify(t), matcher.correct(t)) for t in texts], args.repeat)
+        row = {
+            'aliases_per_section': count,
+            'boxes': len(texts),
+            'build_ms': build_seconds * 1000,
+            'scan_us_per_box': scan_seconds / len(texts) * 1e6,
+            'matcher_us_per_box': matcher_seconds / len(texts) * 1e6
+        }
+        results.append(row)
+        print(f"{count:>5} aliases: scan {row['scan_us_per_box']:.2f}us/box, matcher {row['matcher_us_per_box']:.2f}us/box "
+              f"(built in {row['build_ms']:.1f}ms)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+OCR result fixtures and synthetic generators shared by the benchmarks
+- OCR result fixtures live in benchmarks/fixtures/*.json in the normalized
+  [[bbox, text, confidence], ...] format (the same as ocr_cache/).
+  unit_1.json / unit_2.json are SYNTHETIC: hand-built from saved_vocab/Unit_1.json
+  and Unit_2.json (made-up boxes, confidences, noise and misreads), not
+  EasyOCR output, so accuracy numbers from them say nothing about real OCR.
+  `python benchmarks/suite.py record <images_dir>` adds fixtures recorded from
+  real photos with EasyOCR.
+- synthetic_page() / stacked_page() / scaled_page() build randomized
+  worksheets from saved units, up to thousands of boxes.
+"""
+
+import os
+import json
+import random
+
+import vocab_parser
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, 'fixtures')
+
+FALLBACK_UNIT = {
+    'unit_name': 'Unit 1',
+    'unit_chinese': '单元一',
+    'spoken_vocab': ['我', '快乐', '眼晴', '耳朵', '鼻子', '嘴巴', '口', '头', '手', '脚'],
+    'practice_vocab': ['我', '手', '口', '一', '二', '三', '大扫除']
+}
+NOISE_TEXTS = ['Name:', '12', 'Class 3', '姓名', '第一课', '（ ）', '读一读', '1.', 'ABC']
+
+
+def load_recorded(dirs):
+    """[(name, ocr_result), ...] from OCR result JSON files (fixtures or ocr_cache/ entries)"""
+    corpus = []
+    for folder in dirs:
+        for fname in sorted(os.listdir(folder)):
+            if not fname.endswith('.json'):
+                continue
+            with open(os.path.join(folder, fname), 'r', encoding='utf-8') as f:
+                try:
+                    result = json.load(f)
+                except ValueError:
+                    continue
+            if isinstance(result, list) and all(isinstance(entry, list) and len(entry) == 3 for entry in result):
+                corpus.append((os.path.join(folder, fname), [tuple(entry) for entry in result]))
+    return corpus
+
+
+def load_fixtures():
+    """{fixture name: ocr_result} for benchmarks/fixtures/*.json (synthetic unless re-recorded)"""
+    return {os.path.splitext(os.path.basename(path))[0]: result
+            for path, result in load_recorded([FIXTURES_DIR])}
+
+
+def load_units():
+    folder = os.path.join(REPO_ROOT, 'saved_vocab')
+    units = []
+    if os.path.isdir(folder):
+        for fname in sorted(os.listdir(folder)):
+            if fname.endswith('.json'):
+                with open(os.path.join(folder, fname), 'r', encoding='utf-8') as f:
+                    units.append(json.load(f))
+    return units or [FALLBACK_UNIT]
+
+
+def box(x, y, width, height):
+    return [[x, y], [x + width, y], [x + width, y + height], [x, y + height]]
+
+
+def synthetic_page(rng, unit, y_offset=0):
+    """One worksheet photo worth of OCR boxes with randomized layout quirks"""
+    boxes = []
+    y = y_offset + 20
+
+    def add(text, confidence=None, x=None, height=30):
+        nonlocal y
+        confidence = rng.uniform(0.02, 0.99) if confidence is None else confidence
+        boxes.append((box(x if x is not None else rng.randint(10, 80), y + rng.randint(-3, 3),
+                          20 * max(1, len(text)), height), text, confidence))
+        y += height + rng.randint(5, 25)
+
+    def add_words(words, vocab_line):
+        if vocab_line:
+            separator = rng.choice(['。', '、', '。'])
+            prefix = rng.choice(['', '', '1.', '(', ' '])
+            add(prefix + separator.join(words), rng.uniform(0.3, 0.99))
+        else:
+            for word in words:
+                add(word, rng.uniform(0.1, 0.99), height=rng.choice([20, 30]))
+
+    add(f"{unit.get('unit_chinese', '')} {unit.get('unit_name', '')}".strip(), 0.9)
+    for _ in range(rng.randint(0, 3)):
+        add(rng.choice(NOISE_TEXTS))
+
+    headers = rng.choice(['both', 'both', 'both', 'spoken', 'practice', 'none'])
+    spoken = list(unit.get('spoken_vocab', []))
+    practice = list(unit.get('practice_vocab', []))
+    vocab_lines = rng.random() < 0.7
+
+    if headers in ('both', 'spoken'):
+        add(rng.choice(vocab_parser.SPOKEN_HEADER_KEYWORDS[:3] + ['口语表达词汇：', '适麦达词汇']), 0.8)
+    for start in range(0, len(spoken), rng.randint(4, 6)):
+        add_words(spoken[start:start + 6], vocab_lines)
+    if rng.random() < 0.2 and spoken:
+        add_words(spoken[:5], vocab_lines)  # repeated line
+
+    if headers in ('both', 'practice'):
+        add(rng.choice(vocab_parser.PRACTICE_HEADER_KEYWORDS[:2] + ['识读词语：']), 0.8)
+    add_words(practice, vocab_lines or rng.random() < 0.5)
+
+    if rng.random() < 0.6:
+        add(rng.choice(vocab_parser.END_SECTION_KEYWORDS), 0.7)
+        for _ in range(rng.randint(0, 4)):
+            add(rng.choice(NOISE_TEXTS + ['小。大。人。水。吃', '我爱我的家']))
+
+    if rng.random() < 0.3:
+        rng.shuffle(boxes)  # readtext order is not always top to bottom
+    return boxes, y
+
+
+def synthetic_corpus(count, seed, units):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        page, _ = synthetic_page(rng, rng.choice(units))
+        corpus.append((f'synthetic-{i}', page))
+    return corpus
+
+
+def stacked_page(rng, units, pages):
+    """Several worksheets one below the other (multi-page scan)"""
+    result = []
+    y_offset = 0
+    for _ in range(pages):
+        page, y_offset = synthetic_page(rng, rng.choice(units), y_offset)
+        result.extend(page)
+    return result
+
+
+def scaled_page(boxes, seed=1, units=None):
+    """A stacked page with (about) the requested number of OCR boxes"""
+    rng = random.Random(seed)
+    units = units or load_units()
+    result = []
+    y_offset = 0
+    while len(result) < boxes:
+        page, y_offset = synthetic_page(rng, rng.choice(units), y_offset)
+        result.extend(page)
+    return result[:boxes]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vocabulary parser benchmark and golden-output check
+Runs the single-pass parser (vocab_parser.py) and the frozen previous
+implementation (benchmarks/legacy_parser.py) over a golden corpus and fails if
+any output differs. The corpus is:
+
+- OCR results: the synthetic worksheet fixtures in benchmarks/fixtures/ plus
+  every *.json file ([[bbox, text, confidence], ...], the format stored in
+  ocr_cache/) in the given directories, e.g. real recorded results in ocr_cache/
+- seeded synthetic worksheets built from saved_vocab/ units, covering misread
+  headers, missing headers, repeated lines, noise and low-confidence boxes
+
+Then it times both parsers on dense pages (several worksheets stacked, as in a
+multi-page scan).
+
+Usage:
+    python benchmarks/parser_benchmark.py [ocr_cache/ ...] [--synthetic 300] [--stack 1 10 50] [--output parser.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import contextlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import vocab_parser  # noqa: E402
+import legacy_parser  # noqa: E402
+from ocr_fixtures import load_recorded, load_units, synthetic_corpus, stacked_page, FIXTURES_DIR  # noqa: E402
+
+
+def parse_quietly(parse, ocr_result):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parse(ocr_result)
+
+
+def timed(parse, ocr_result, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse_quietly(parse, ocr_result)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recorded_dirs', nargs='*', help='Directories of recorded OCR result JSON files')
+    parser.add_argument('--synthetic', type=int, default=300, help='Number of synthetic worksheets')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--stack', type=int, nargs='+', default=[1, 10, 50], help='Worksheets per dense page')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    args = parser.parse_args()
+
+    units = load_units()
+    corpus = load_recorded([FIXTURES_DIR] + args.recorded_dirs) + synthetic_corpus(args.synthetic, args.seed, units)
+
+    mismatches = []
+    for name, ocr_result in corpus:
+        expected = parse_quietly(legacy_parser.parse_vocabulary_from_ocr, ocr_result)
+        actual = parse_quietly(vocab_parser.parse_vocabulary_from_ocr, ocr_result)
+        if actual != expected:
+            mismatches.append(name)
+            print(f"MISMATCH {name}:\n  expected {expected}\n  actual   {actual}")
+    print(f"Golden check: {len(corpus) - len(mismatches)}/{len(corpus)} identical")
+
+    rng = random.Random(args.seed)
+    timings = []
+    for pages in args.stack:
+        ocr_result = stacked_page(rng, units, pages)
+        legacy_seconds = timed(legacy_parser.parse_vocabulary_from_ocr, ocr_result, args.repeat)
+        new_seconds = timed(vocab_parser.parse_vocabulary_from_ocr, ocr_result, args.repeat)
+        row = {
+            'worksheets': pages,
+            'boxes': len(ocr_result),
+            'legacy_ms': legacy_seconds * 1000,
+            'single_pass_ms': new_seconds * 1000,
+            'speedup': legacy_seconds / new_seconds if new_seconds else 0.0
+        }
+        timings.append(row)
+        print(f"{pages:>4} worksheets / {row['boxes']:>5} boxes: legacy {row['legacy_ms']:.2f}ms, "
+              f"single-pass {row['single_pass_ms']:.2f}ms (x{row['speedup']:.1f})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'corpus_size': len(corpus), 'mismatches': mismatches, 'timings': timings},
+                      f, ensure_ascii=False, indent=2)
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Preprocessing benchmark: original upload vs preprocessed image
+Runs EasyOCR in-process on recorded worksheet photos both ways and reports
+end-to-end latency (preprocess + readtext) and extraction accuracy.
+
+Accuracy is the F1 score of spoken_vocab / practice_vocab against the saved
+unit whose image_filename matches the photo (saved_vocab/*.json). Photos with
+no saved unit are scored against the unprocessed path's own output.
+
+Usage:
+    python benchmarks/preprocess_benchmark.py uploads/ [--max-long-edge 1600] [--output preprocess.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import app  # noqa: E402
+from ocr_pool import get_ocr, _run_readtext  # noqa: E402
+
+
+def f1_score(found, expected):
+    """F1 of two word lists treated as sets"""
+    found, expected = set(found), set(expected)
+    if not found and not expected:
+        return 1.0
+    overlap = len(found & expected)
+    if overlap == 0:
+        return 0.0
+    precision = overlap / len(found)
+    recall = overlap / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+
+def load_expected(vocab_folder):
+    """Map image_filename -> saved unit vocabulary"""
+    expected = {}
+    for fname in os.listdir(vocab_folder):
+        if fname.endswith('.json'):
+            with open(os.path.join(vocab_folder, fname), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('image_filename'):
+                expected[data['image_filename']] = data
+    return expected
+
+
+def run_variant(reader, image_bytes, preprocess_options):
+    """Time one OCR+parse pass; returns (seconds, timings, vocabulary_data)"""
+    started = time.perf_counter()
+    result, timings = _run_readtext(reader, image_bytes, preprocess_options)
+    vocabulary_data = app.parse_vocabulary_from_ocr(result)
+    return time.perf_counter() - started, timings, vocabulary_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images_dir', help='Directory of recorded worksheet photos')
+    parser.add_argument('--vocab-dir', default=os.path.join(REPO_ROOT, app.VOCAB_FOLDER))
+    parser.add_argument('--max-long-edge', type=int, default=None, help='Override OCR_PREPROCESS max_long_edge')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    args = parser.parse_args()
+
+    preprocess_options = dict(app.OCR_PREPROCESS or {})
+    if args.max_long_edge is not None:
+        preprocess_options['max_long_edge'] = args.max_long_edge
+
+    expected_by_image = load_expected(args.vocab_dir)
+    reader = get_ocr(app.OCR_LANGUAGES)
+    rows = []
+
+    for fname in sorted(os.listdir(args.images_dir)):
+        if not app.allowed_file(fname):
+            continue
+        with open(os.path.join(args.images_dir, fname), 'rb') as f:
+            image_bytes = f.read()
+
+        row = {'image': fname, 'bytes': len(image_bytes)}
+        outputs = {}
+        for variant, options in (('original', None), ('preprocessed', preprocess_options)):
+            runs = [run_variant(reader, image_bytes, options) for _ in range(args.repeat)]
+            outputs[variant] = runs[-1][2]
+            row[f'{variant}_seconds'] = statistics.median(r[0] for r in runs)
+            row[f'{variant}_stage_seconds'] = runs[-1][1]
+
+        reference = expected_by_image.get(fname) or outputs['original']
+        row['reference'] = 'saved_unit' if fname in expected_by_image else 'original_output'
+        for variant, data in outputs.items():
+            row[f'{variant}_spoken_f1'] = f1_score(data['spoken_vocab'], reference['spoken_vocab'])
+            row[f'{variant}_practice_f1'] = f1_score(data['practice_vocab'], reference['practice_vocab'])
+        row['speedup'] = row['original_seconds'] / row['preprocessed_seconds']
+        rows.append(row)
+        print(f"{fname}: {row['original_seconds']:.2f}s -> {row['preprocessed_seconds']:.2f}s "
+              f"(x{row['speedup']:.2f}), practice F1 {row['original_practice_f1']:.2f} -> {row['preprocessed_practice_f1']:.2f}")
+
+    if not rows:
+        print(f"No PNG/JPG images found in {args.images_dir}")
+        return 1
+
+    summary = {
+        'images': len(rows),
+        'preprocess_options': preprocess_options,
+        'median_speedup': statistics.median(r['speedup'] for r in rows),
+        'original_seconds_median': statistics.median(r['original_seconds'] for r in rows),
+        'preprocessed_seconds_median': statistics.median(r['preprocessed_seconds'] for r in rows),
+        'original_f1_mean': statistics.mean((r['original_spoken_f1'] + r['original_practice_f1']) / 2 for r in rows),
+        'preprocessed_f1_mean': statistics.mean((r['preprocessed_spoken_f1'] + r['preprocessed_practice_f1']) / 2 for r in rows),
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'images': rows}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
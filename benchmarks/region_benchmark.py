@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Region-restricted recognition benchmark
+Golden check (no model needed): replays OCR results - the fixtures in
+benchmarks/fixtures/, any recorded results passed with --recorded (for example
+ocr_cache/) and seeded synthetic worksheets - through region_ocr's box
+selection, with recognition answered from the result itself, and fails unless
+the parsed vocabulary and unit name equal parse_vocabulary_from_ocr on the
+full result.
+
+With a directory of worksheet photos it also runs full-page readtext and
+two-phase region recognition with EasyOCR, compares OCR CPU time and checks
+that the parsed vocabulary is identical.
+
+Usage:
+    python benchmarks/region_benchmark.py [uploads/] [--recorded ocr_cache/] [--no-preprocess] [--output region.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import app  # noqa: E402
+from ocr_pool import get_ocr, _run_readtext  # noqa: E402
+from region_ocr import recognize_regions  # noqa: E402
+from ocr_fixtures import load_recorded, load_units, synthetic_corpus, FIXTURES_DIR  # noqa: E402
+
+PARSED_FIELDS = ('spoken_vocab', 'practice_vocab')
+
+
+def parse(ocr_result):
+    vocabulary_data = app.parse_vocabulary_from_ocr(ocr_result)
+    vocabulary_data['unit_name'] = app.extract_unit_name(ocr_result)[0]
+    return vocabulary_data
+
+
+def replay_regions(ocr_result, region_keywords):
+    """Region recognition of a recorded result: detection gives its boxes, recognition its entries"""
+    boxes = [(bbox, True) for bbox, _, _ in ocr_result]  # 4-point boxes, kept in readtext() order
+    page_height = max((point[1] for bbox, _, _ in ocr_result for point in bbox), default=0) + 1
+    result, _, stats = recognize_regions(boxes, page_height, lambda indexes: {i: ocr_result[i] for i in indexes},
+                                         region_keywords)
+    return result, stats
+
+
+def golden_check(corpus, region_keywords):
+    """Names of the OCR results whose region-mode parse differs from the full-page parse"""
+    mismatches = []
+    recognized = detected = 0
+    for name, ocr_result in corpus:
+        region_result, stats = replay_regions(ocr_result, region_keywords)
+        recognized += stats['boxes_recognized']
+        detected += stats['boxes_detected']
+        expected, actual = parse(ocr_result), parse(region_result)
+        if any(expected[field] != actual[field] for field in PARSED_FIELDS + ('unit_name',)):
+            mismatches.append(name)
+            print(f"MISMATCH {name}:")
+            for field in PARSED_FIELDS + ('unit_name',):
+                print(f"  {field}: full={expected[field]} region={actual[field]}")
+    print(f"Golden check: {len(corpus) - len(mismatches)}/{len(corpus)} identical "
+          f"({recognized}/{detected} boxes recognized)")
+    return mismatches
+
+
+def run_variant(reader, image_bytes, preprocess_options, region_keywords):
+    """Returns (cpu seconds, wall seconds, parsed vocabulary)"""
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    result, _ = _run_readtext(reader, image_bytes, preprocess_options, region_keywords)
+    cpu_seconds, wall_seconds = time.process_time() - cpu_started, time.perf_counter() - wall_started
+    return cpu_seconds, wall_seconds, parse(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images_dir', nargs='?', help='Directory of recorded worksheet photos')
+    parser.add_argument('--recorded', nargs='*', default=[], help='Directories of recorded OCR result JSON files')
+    parser.add_argument('--synthetic', type=int, default=300, help='Number of synthetic worksheets')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-preprocess', action='store_true', help='OCR the original images')
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    args = parser.parse_args()
+
+    region_keywords = app.get_matcher().region_keywords()
+    corpus = load_recorded([FIXTURES_DIR] + args.recorded) + synthetic_corpus(args.synthetic, args.seed, load_units())
+    mismatches = golden_check(corpus, region_keywords)
+    if not args.images_dir:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'corpus_size': len(corpus), 'mismatches': mismatches}, f, ensure_ascii=False, indent=2)
+        return 1 if mismatches else 0
+
+    preprocess_options = None if args.no_preprocess else app.OCR_PREPROCESS
+    reader = get_ocr(app.OCR_LANGUAGES)
+    rows = []
+
+    for fname in sorted(os.listdir(args.images_dir)):
+        if not app.allowed_file(fname):
+            continue
+        with open(os.path.join(args.images_dir, fname), 'rb') as f:
+            image_bytes = f.read()
+
+        full_cpu, full_wall, full_data = run_variant(reader, image_bytes, preprocess_options, None)
+        region_cpu, region_wall, region_data = run_variant(reader, image_bytes, preprocess_options, region_keywords)
+        identical = all(full_data[field] == region_data[field] for field in PARSED_FIELDS + ('unit_name',))
+        rows.append({
+            'image': fname,
+            'full_cpu_seconds': full_cpu,
+            'region_cpu_seconds': region_cpu,
+            'full_wall_seconds': full_wall,
+            'region_wall_seconds': region_wall,
+            'cpu_saving': 1 - region_cpu / full_cpu if full_cpu else 0.0,
+            'identical_output': identical
+        })
+        print(f"{fname}: CPU {full_cpu:.2f}s -> {region_cpu:.2f}s, identical={identical}")
+        if not identical:
+            for field in PARSED_FIELDS:
+                print(f"  {field}: full={full_data[field]} region={region_data[field]}")
+
+    if not rows:
+        print(f"No PNG/JPG images found in {args.images_dir}")
+        return 1
+
+    summary = {
+        'images': len(rows),
+        'median_cpu_saving': statistics.median(r['cpu_saving'] for r in rows),
+        'identical_outputs': sum(r['identical_output'] for r in rows),
+        'golden_mismatches': mismatches
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'images': rows}, f, ensure_ascii=False, indent=2)
+    return 0 if summary['identical_outputs'] == len(rows) and not mismatches else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
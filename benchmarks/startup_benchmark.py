@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup benchmark for the web tier
+Imports app.py in a fresh interpreter, serves the first request, and reports
+import time, time to first response and RSS - plus whether easyocr/torch
+were dragged in. Use --max-import-seconds / --max-rss-mb to fail CI on regressions.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--max-import-seconds 1.0] [--max-rss-mb 150]
+"""
+
+import os
+import sys
+import json
+import argparse
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter
+PROBE = r'''
+import sys, time, json
+started = time.perf_counter()
+import app
+import_seconds = time.perf_counter() - started
+client = app.app.test_client()
+started = time.perf_counter()
+status = client.get('/').status_code
+first_request_seconds = time.perf_counter() - started
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+print(json.dumps({
+    'import_seconds': import_seconds,
+    'first_request_seconds': first_request_seconds,
+    'first_request_status': status,
+    'rss_mb': rss_mb(),
+    'easyocr_loaded': 'easyocr' in sys.modules,
+    'torch_loaded': 'torch' in sys.modules
+}))
+'''
+
+
+def run_once():
+    """Run the probe in a fresh interpreter (data in a temp dir, with a copy of saved_vocab/) and return its measurements"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        saved_vocab = os.path.join(REPO_ROOT, 'saved_vocab')
+        if os.path.isdir(saved_vocab):
+            shutil.copytree(saved_vocab, os.path.join(data_dir, 'saved_vocab'))
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=REPO_ROOT,
+                                env={**os.environ, 'VOCAB_APP_DATA_DIR': data_dir},
+                                capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-seconds', type=float, default=None)
+    parser.add_argument('--max-rss-mb', type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    summary = {
+        'runs': args.runs,
+        'import_seconds_median': statistics.median(r['import_seconds'] for r in runs),
+        'first_request_seconds_median': statistics.median(r['first_request_seconds'] for r in runs),
+        'rss_mb_median': statistics.median(r['rss_mb'] for r in runs),
+        'easyocr_loaded': any(r['easyocr_loaded'] for r in runs),
+        'torch_loaded': any(r['torch_loaded'] for r in runs)
+    }
+    print(json.dumps(summary, indent=2))
+
+    failures = []
+    if summary['easyocr_loaded'] or summary['torch_loaded']:
+        failures.append('easyocr/torch imported by the web tier')
+    if args.max_import_seconds is not None and summary['import_seconds_median'] > args.max_import_seconds:
+        failures.append(f"import took {summary['import_seconds_median']:.3f}s > {args.max_import_seconds}s")
+    if args.max_rss_mb is not None and summary['rss_mb_median'] > args.max_rss_mb:
+        failures.append(f"RSS {summary['rss_mb_median']:.1f}MB > {args.max_rss_mb}MB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parser and extraction benchmark suite
+- micro-benchmarks for each parsing step (extract_unit_name, _scan_ocr_result,
+  _assign_vocab_lines, split_words, apply_ocr_corrections, classify_text,
+  fallback_vocabulary_extraction, parse_vocabulary_from_ocr) on the synthetic
+  worksheet fixtures in benchmarks/fixtures/ and on synthetic pages of --boxes boxes
+- end-to-end process_image() (read, OCR cache, OCR, parse, save unit) with the
+  deterministic fake OCR backend (benchmarks/fake_ocr.py), cold and cached;
+  runs in a temporary directory so uploads/, saved_vocab/ and ocr_cache/ are untouched
+
+Results are written as JSON with the git commit, so two commits can be compared:
+
+    python benchmarks/suite.py --output base.json          # on the old commit
+    python benchmarks/suite.py --compare base.json --max-regression 0.2
+
+`record` runs real EasyOCR over worksheet photos and saves their readtext
+output as new fixtures (needs easyocr installed):
+
+    python benchmarks/suite.py record path/to/worksheets/
+"""
+
+import os
+import sys
+import json
+import time
+import timeit
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import vocab_parser  # noqa: E402
+from fake_ocr import FakeOCRBackend, install, import_app, make_image  # noqa: E402
+from ocr_fixtures import load_fixtures, scaled_page, FIXTURES_DIR  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit, bool(dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def bench(fn, rounds):
+    """Median / min seconds per call, auto-scaling the loop to ~0.2s per round"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    samples = [seconds / number for seconds in timer.repeat(repeat=rounds, number=number)]
+    return {'median_us': statistics.median(samples) * 1e6, 'min_us': min(samples) * 1e6,
+            'calls': number * rounds}
+
+
+def bench_each(fn, inputs):
+    """Time fn once per input (for calls that must not repeat, e.g. cold cache)"""
+    samples = []
+    for value in inputs:
+        started = time.perf_counter()
+        fn(value)
+        samples.append(time.perf_counter() - started)
+    return {'median_us': statistics.median(samples) * 1e6, 'min_us': min(samples) * 1e6,
+            'calls': len(samples)}
+
+
+def datasets(box_counts, seed):
+    """[(name, ocr_result), ...]: worksheet fixtures, then synthetic pages"""
+    data = sorted(load_fixtures().items())
+    data.extend((f'synthetic_{boxes}', scaled_page(boxes, seed)) for boxes in box_counts)
+    return data
+
+
+def micro_benchmarks(app, data, rounds):
+    results = {}
+    for name, ocr_result in data:
+        text_items, vocabulary_lines, _ = vocab_parser._scan_ocr_result(ocr_result)
+        all_text = ' '.join(text for _, text, _ in ocr_result)
+        words = vocab_parser.extract_chinese_phrases_from_text(all_text)
+        texts = [item['text'] for item in text_items]
+        cases = {
+            'parse_vocabulary_from_ocr': lambda: vocab_parser.parse_vocabulary_from_ocr(ocr_result),
+            'extract_unit_name': lambda: app.extract_unit_name(ocr_result),
+            'scan_ocr_result': lambda: vocab_parser._scan_ocr_result(ocr_result),
+            'assign_vocab_lines': lambda: vocab_parser._assign_vocab_lines(text_items, vocabulary_lines),
+            'split_words': lambda: vocab_parser.extract_chinese_words_from_text(all_text),
+            'apply_ocr_corrections': lambda: vocab_parser.apply_ocr_corrections(words),
+            'classify_text': lambda: [vocab_parser.classify_text(text) for text in texts],
+            'fallback_vocabulary_extraction': lambda: vocab_parser.fallback_vocabulary_extraction(all_text),
+        }
+        for case, fn in cases.items():
+            key = f'{case}[{name}]'
+            results[key] = dict(bench(fn, rounds), boxes=len(ocr_result))
+            print(f"{key:<50} {results[key]['median_us']:>12.1f} us")
+    return results
+
+
+def e2e_benchmarks(app, images, latency):
+    backend = install(app, FakeOCRBackend(load_fixtures().values(), latency=latency))
+    filenames = []
+    for i in range(images):
+        filename = f'bench_{i}.png'
+        with open(os.path.join(app.UPLOAD_FOLDER, filename), 'wb') as f:
+            f.write(make_image(i))
+        filenames.append(filename)
+
+    results = {
+        'process_image[cold]': bench_each(app.process_image, filenames),
+        'process_image[cached]': bench_each(app.process_image, filenames)
+    }
+    for key, row in results.items():
+        print(f"{key:<50} {row['median_us']:>12.1f} us")
+    print(f"(fake OCR calls: {backend.completed}, latency {latency * 1000:.1f}ms)")
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """Print old vs new per benchmark; returns the names that slowed down beyond max_regression"""
+    regressions = []
+    print(f"\n{'benchmark':<50} {'base us':>12} {'new us':>12} {'change':>8}")
+    for key, row in results.items():
+        base = baseline.get(key)
+        if not base or not base['median_us']:
+            print(f"{key:<50} {'-':>12} {row['median_us']:>12.1f} {'new':>8}")
+            continue
+        change = row['median_us'] / base['median_us'] - 1
+        flag = ''
+        if change > max_regression:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f"{key:<50} {base['median_us']:>12.1f} {row['median_us']:>12.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def run(args):
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['benchmarks']
+    output = os.path.abspath(args.output) if args.output else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = import_app(workdir)
+        results = {}
+        results.update(micro_benchmarks(app, datasets(args.boxes, args.seed), args.rounds))
+        if args.e2e_images:
+            results.update(e2e_benchmarks(app, args.e2e_images, args.ocr_latency))
+
+    commit, dirty = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'boxes': args.boxes,
+            'seed': args.seed
+        },
+        'benchmarks': results
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.max_regression:.0%}")
+            return 1
+    return 0
+
+
+def record(args):
+    """Save EasyOCR readtext output for each worksheet photo as a fixture"""
+    images_dir = os.path.abspath(args.images_dir)
+    fixtures_dir = os.path.abspath(args.fixtures_dir)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory() as workdir:
+        app = import_app(workdir)
+        from ocr_pool import get_ocr, _run_readtext
+        reader = get_ocr(app.OCR_LANGUAGES)
+        for fname in sorted(os.listdir(images_dir)):
+            if not fname.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            with open(os.path.join(images_dir, fname), 'rb') as f:
+                image_bytes = f.read()
+            result, timings = _run_readtext(reader, image_bytes, app.OCR_PREPROCESS)
+            target = os.path.join(fixtures_dir, os.path.splitext(fname)[0].lower() + '.json')
+            with open(target, 'w', encoding='utf-8') as f:
+                json.dump([list(entry) for entry in result], f, ensure_ascii=False)
+            print(f"{fname}: {len(result)} boxes in {timings['readtext']:.2f}s -> {target}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--boxes', type=int, nargs='*', default=[100, 1000, 5000],
+                        help='Sizes of the synthetic pages')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--rounds', type=int, default=5, help='Timing rounds per micro-benchmark')
+    parser.add_argument('--e2e-images', type=int, default=200, help='Images for the end-to-end benchmark (0 = skip)')
+    parser.add_argument('--ocr-latency', type=float, default=0.0, help='Seconds the fake OCR sleeps per image')
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    parser.add_argument('--compare', default=None, help='Baseline results JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Allowed slowdown vs --compare before exiting non-zero (0.2 = 20%%)')
+    subparsers = parser.add_subparsers(dest='command')
+    recorder = subparsers.add_parser('record', help='Record readtext fixtures from worksheet photos')
+    recorder.add_argument('images_dir')
+    recorder.add_argument('--fixtures-dir', default=FIXTURES_DIR)
+    args = parser.parse_args()
+    return record(args) if args.command == 'record' else run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Saved-unit listing benchmark: full directory scan vs in-memory UnitCatalog
+Generates N synthetic unit files in a temp folder and times one listing with
+the old approach (listdir + json.load of every file) against the catalog's
+cold build and warm (cached) listing.
+
+Usage:
+    python benchmarks/unit_catalog_benchmark.py [--units 1000 10000] [--output catalog.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from unit_catalog import UnitCatalog, summarize_unit  # noqa: E402
+
+
+def write_units(folder, count):
+    for i in range(1, count + 1):
+        unit_data = {
+            'unit_name': f'Unit {i}',
+            'unit_chinese': f'单元{i}',
+            'spoken_vocab': ['我', '快乐', '眼睛', '耳朵', '鼻子', '嘴巴', '口', '头', '手', '脚'],
+            'practice_vocab': ['我', '手', '口', '一', '二', '三'],
+            'image_filename': f'{i:08x}_unit{i}.jpeg',
+            'saved_at': ''
+        }
+        with open(os.path.join(folder, f'Unit_{i}.json'), 'w', encoding='utf-8') as f:
+            json.dump(unit_data, f, ensure_ascii=False, indent=2)
+
+
+def scan_units(folder):
+    """The pre-catalog listing: read every unit file on every request"""
+    units = []
+    for fname in sorted(os.listdir(folder)):
+        if fname.endswith('.json'):
+            with open(os.path.join(folder, fname), 'r', encoding='utf-8') as f:
+                units.append(summarize_unit(json.load(f), fname))
+    return units
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--units', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    args = parser.parse_args()
+
+    results = []
+    for count in args.units:
+        folder = tempfile.mkdtemp(prefix='unit_catalog_bench_')
+        try:
+            write_units(folder, count)
+            scan_seconds = timed(lambda: scan_units(folder), args.repeat)
+            cold_seconds = timed(lambda: UnitCatalog(folder).list_units(), args.repeat)
+            catalog = UnitCatalog(folder)
+            catalog.list_units()
+            warm_seconds = timed(catalog.list_units, args.repeat * 100)
+            assert catalog.list_units() == scan_units(folder)
+        finally:
+            shutil.rmtree(folder)
+        row = {
+            'units': count,
+            'directory_scan_ms': scan_seconds * 1000,
+            'catalog_cold_ms': cold_seconds * 1000,
+            'catalog_warm_ms': warm_seconds * 1000,
+            'speedup_warm': scan_seconds / warm_seconds
+        }
+        results.append(row)
+        print(f"{count:>6} units: scan {row['directory_scan_ms']:.1f}ms, catalog cold {row['catalog_cold_ms']:.1f}ms, "
+              f"warm {row['catalog_warm_ms']:.4f}ms (x{row['speedup_warm']:.0f})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
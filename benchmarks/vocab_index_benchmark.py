@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cross-unit search benchmark: scanning every saved unit vs the VocabIndex
+Generates N synthetic units (16 words each, drawn from ~3000 characters so
+some are common and most are rare) in a temp JSON store. For each N it times
+one "which units contain X?" answered by loading and scanning every unit, then
+the index build, search for a common word, a rare character and a substring,
+and the all-units review set (first call after a save, then cached).
+
+Usage:
+    python benchmarks/vocab_index_benchmark.py [--units 1000 10000] [--output vocab_index.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from vocab_index import VocabIndex  # noqa: E402
+from vocab_store import SECTIONS, JSONVocabStore  # noqa: E402
+
+COMMON_WORDS = ['我', '快乐', '眼睛', '耳朵', '鼻子', '嘴巴']
+CHARS = [chr(code) for code in range(0x4E00, 0x4E00 + 3000)]
+
+
+def fill(store, count, seed=1):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        words = [''.join(rng.choice(CHARS) for _ in range(rng.randint(1, 3))) for _ in range(10)]
+        store.save_unit({
+            'unit_name': f'Unit {i}',
+            'unit_chinese': f'单元{i}',
+            'spoken_vocab': COMMON_WORDS + words[:4],
+            'practice_vocab': words[4:],
+            'image_filename': '',
+            'saved_at': ''
+        })
+
+
+def scan_search(store, query):
+    """The pre-index approach: load every unit and look through its words"""
+    found = []
+    for summary in store.list_units():
+        unit_data = store.load_unit(summary['unit_name'])
+        if any(query in word for section in SECTIONS for word in unit_data[section]):
+            found.append(unit_data['unit_name'])
+    return found
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--units', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=1000)
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    args = parser.parse_args()
+
+    results = []
+    for count in args.units:
+        folder = tempfile.mkdtemp(prefix='vocab_index_bench_')
+        try:
+            store = JSONVocabStore(folder)
+            fill(store, count)
+            rare = CHARS[1234]
+            scan_seconds = timed(lambda: scan_search(store, rare), 1)
+
+            index = VocabIndex()
+            started = time.perf_counter()
+            index.build(store)
+            build_seconds = time.perf_counter() - started
+            assert sorted(unit['unit_name'] for unit in index.search(rare, limit=count)['units']) == \
+                sorted(scan_search(store, rare))
+
+            common_seconds = timed(lambda: index.search('眼睛'), args.repeat)
+            rare_seconds = timed(lambda: index.search(rare), args.repeat)
+            substring_seconds = timed(lambda: index.search('睛'), args.repeat)
+            unit = store.load_unit('Unit 1')
+
+            def review_after_save():
+                index.update(unit)
+                index.review_set()
+
+            update_seconds = timed(lambda: index.update(unit), args.repeat)
+            review_cold_seconds = timed(review_after_save, 20) - update_seconds
+            review_warm_seconds = timed(index.review_set, args.repeat)
+        finally:
+            shutil.rmtree(folder)
+        row = {
+            'units': count,
+            'characters': index.stats()['characters'],
+            'scan_search_ms': scan_seconds * 1000,
+            'index_build_ms': build_seconds * 1000,
+            'search_common_word_ms': common_seconds * 1000,
+            'search_rare_char_ms': rare_seconds * 1000,
+            'search_substring_ms': substring_seconds * 1000,
+            'update_ms': update_seconds * 1000,
+            'review_set_after_save_ms': review_cold_seconds * 1000,
+            'review_set_cached_ms': review_warm_seconds * 1000
+        }
+        results.append(row)
+        print(f"{count:>6} units ({row['characters']} chars): scan {row['scan_search_ms']:.0f}ms, "
+              f"build {row['index_build_ms']:.0f}ms | search word {row['search_common_word_ms']:.4f}ms, "
+              f"rare char {row['search_rare_char_ms']:.4f}ms, substring {row['search_substring_ms']:.4f}ms, "
+              f"update {row['update_ms']:.4f}ms | review set after save {row['review_set_after_save_ms']:.2f}ms, "
+              f"cached {row['review_set_cached_ms']:.4f}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
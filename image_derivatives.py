@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Resized renditions of uploaded worksheet photos
+A 5MB phone photo is far more than the homepage thumbnail or the practice
+page needs. Each upload gets a small JPEG thumbnail and a screen-sized
+rendition (WebP plus a JPEG for browsers without WebP), generated once in a
+background thread right after upload and stored in uploads/derived/. An
+in-memory index maps (filename, size, format) to the derived file, so
+serving a rendition never resizes anything on the request path.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, features
+
+log = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'thumb': {'max_long_edge': 320, 'formats': ('JPEG',), 'quality': 70},
+    'display': {'max_long_edge': 1280, 'formats': ('WEBP', 'JPEG'), 'quality': 80},
+}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+MIMETYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+
+def derived_name(filename, size, fmt):
+    """uploads/derived/ file name of one rendition, e.g. 'abc_page.png.display.webp'"""
+    return f"{filename}.{size}.{EXTENSIONS[fmt]}"
+
+
+class DerivativeStore:
+    """Generates renditions in the background and looks them up from an in-memory index"""
+
+    def __init__(self, upload_folder, renditions=RENDITIONS, workers=1):
+        """
+        Args:
+            upload_folder (str): Folder with the original uploads
+            renditions (dict): size name -> {'max_long_edge', 'formats', 'quality'}
+            workers (int): Background threads doing the resizing
+        """
+        self.upload_folder = upload_folder
+        self.folder = os.path.join(upload_folder, 'derived')
+        self.renditions = {
+            size: dict(spec, formats=tuple(fmt for fmt in spec['formats'] if fmt != 'WEBP' or features.check('webp')))
+            for size, spec in renditions.items()
+        }
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='derivatives')
+        self._lock = threading.Lock()
+        self._index = set()  # (filename, size, fmt) with a file on disk
+        self._pending = {}  # filename -> Future
+        self._failed = set()  # uploads PIL could not read; not retried
+        os.makedirs(self.folder, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Pick up renditions written by previous runs (one listdir, no image reads)"""
+        formats = {ext: fmt for fmt, ext in EXTENSIONS.items()}
+        for fname in os.listdir(self.folder):
+            parts = fname.rsplit('.', 2)
+            if len(parts) == 3 and parts[1] in self.renditions and parts[2] in formats:
+                self._index.add((parts[0], parts[1], formats[parts[2]]))
+
+    def schedule(self, filename):
+        """Generate all renditions of an upload in the background (no-op if done or running)"""
+        with self._lock:
+            if filename in self._pending or filename in self._failed or self._has_all(filename):
+                return
+            self._pending[filename] = self._executor.submit(self._generate, filename)
+
+    def _has_all(self, filename):
+        return all((filename, size, fmt) in self._index
+                   for size, spec in self.renditions.items() for fmt in spec['formats'])
+
+    def _generate(self, filename):
+        try:
+            with Image.open(os.path.join(self.upload_folder, filename)) as original:
+                image = ImageOps.exif_transpose(original)
+                image = image.convert('RGB')
+            for size, spec in self.renditions.items():
+                rendition = image.copy()
+                rendition.thumbnail((spec['max_long_edge'], spec['max_long_edge']), Image.LANCZOS)
+                for fmt in spec['formats']:
+                    name = derived_name(filename, size, fmt)
+                    tmp_path = os.path.join(self.folder, f"{name}.tmp")
+                    rendition.save(tmp_path, fmt, quality=spec['quality'])
+                    os.replace(tmp_path, os.path.join(self.folder, name))
+                    with self._lock:
+                        self._index.add((filename, size, fmt))
+            log.debug("Generated renditions for %s", filename)
+        except FileNotFoundError:
+            log.debug("Upload %s was deleted before its renditions were generated", filename)
+        except Exception:
+            log.exception("Could not generate renditions for %s", filename)
+            with self._lock:
+                self._failed.add(filename)
+        finally:
+            with self._lock:
+                self._pending.pop(filename, None)
+
+    def lookup(self, filename, size, accept_webp=True, wait=0):
+        """
+        Find a rendition to serve
+        Args:
+            filename (str): Original upload filename
+            size (str): Rendition name ('thumb', 'display')
+            accept_webp (bool): Whether the client can display WebP
+            wait (float): Seconds to wait for a rendition that is still being generated
+        Returns:
+            tuple: (path, mimetype), or (None, None) if it is not available (yet) -
+                   generation is then scheduled and the caller serves the original
+        """
+        spec = self.renditions[size]
+        formats = [fmt for fmt in spec['formats'] if accept_webp or fmt != 'WEBP']
+        with self._lock:
+            future = self._pending.get(filename)
+        if future is not None and wait:
+            try:
+                future.result(timeout=wait)
+            except Exception:
+                pass
+        with self._lock:
+            for fmt in formats:
+                if (filename, size, fmt) in self._index:
+                    return os.path.join(self.folder, derived_name(filename, size, fmt)), MIMETYPES[fmt]
+        if os.path.exists(os.path.join(self.upload_folder, filename)):
+            self.schedule(filename)
+        return None, None
+
+    def remove(self, filename):
+        """Delete every rendition of an upload"""
+        with self._lock:
+            keys = [key for key in self._index if key[0] == filename]
+            for key in keys:
+                self._index.discard(key)
+        for _, size, fmt in keys:
+            try:
+                os.remove(os.path.join(self.folder, derived_name(filename, size, fmt)))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {'renditions': len(self._index), 'pending': len(self._pending), 'failed': len(self._failed)}
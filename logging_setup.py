@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Structured logging with request-ID correlation
+Every record carries the ID of the request that caused it - set per Flask
+request, carried into background OCR jobs and OCR worker processes - so the
+upload, OCR and parse lines of one worksheet can be grepped together.
+
+Large debug dumps (raw OCR results, full text, vocabulary) are only built
+when DEBUG is enabled and the request is in the sampled fraction; see
+dump_enabled().
+"""
+
+import json
+import time
+import uuid
+import zlib
+import logging
+import contextvars
+from contextlib import contextmanager
+
+_request_id = contextvars.ContextVar('request_id', default='-')
+_settings = {'dump_sample_rate': 1.0}
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """Set the request ID for the current context; returns a token for reset_request_id"""
+    return _request_id.set(request_id or new_request_id())
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+@contextmanager
+def request_context(request_id):
+    """Run a block (e.g. inside an OCR worker) under a given request ID"""
+    token = _request_id.set(request_id or '-')
+    try:
+        yield
+    finally:
+        _request_id.reset(token)
+
+
+def dump_enabled(logger):
+    """
+    Whether to build and log the big debug dumps for the current request
+    Requires DEBUG on the logger; the sampling decision is a hash of the
+    request ID so all dumps of one request are either logged or skipped together.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    rate = _settings['dump_sample_rate']
+    if rate >= 1:
+        return True
+    return zlib.crc32(get_request_id().encode('utf-8')) % 10000 < rate * 10000
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to every record"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, request_id, msg + extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'
+
+
+def configure_logging(level='INFO', fmt='json', dump_sample_rate=1.0):
+    """
+    Configure the root logger (call once per process - web app and OCR workers)
+    Args:
+        level (str): Log level name
+        fmt (str): 'json' for structured lines or 'text' for human-readable ones
+        dump_sample_rate (float): Fraction of requests whose DEBUG dumps are logged
+    """
+    _settings['dump_sample_rate'] = dump_sample_rate
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if getattr(existing, '_vocab_handler', False):
+            root.removeHandler(existing)
+    handler._vocab_handler = True
+    root.addHandler(handler)
+    root.setLevel(level)
+    # Pillow logs every PNG chunk at DEBUG
+    logging.getLogger('PIL').setLevel(logging.INFO)
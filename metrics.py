@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal Prometheus-style metrics (counters, gauges, latency histograms)
+Rendered in the Prometheus text exposition format by /metrics. Values are
+per Flask process; OCR worker processes report their stage timings back with
+each result and those are recorded here.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+# Seconds; OCR on CPU runs from ~1s to tens of seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named metric family with optional labels"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """[(suffix, label string, value), ...]"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(f'{self.name}{suffix}{labels} {_format_value(value)}' for suffix, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        super().__init__(name if name.endswith('_total') else f'{name}_total', documentation, labelnames, registry)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [('', _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Gauge(Metric):
+    """Current value, read from a callback at scrape time (no labels)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback, registry=None):
+        super().__init__(name, documentation, registry=registry)
+        self.callback = callback
+
+    def samples(self):
+        try:
+            return [('', '', self.callback())]
+        except Exception:
+            return []
+
+
+class Histogram(Metric):
+    """Cumulative latency histogram with _bucket / _sum / _count series"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, seconds, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += seconds
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, dict(state, counts=list(state['counts']))) for key, state in self._values.items())
+        samples = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                samples.append(('_bucket', _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"'),
+                                cumulative))
+            samples.append(('_sum', _format_labels(self.labelnames, key), state['sum']))
+            samples.append(('_count', _format_labels(self.labelnames, key), state['count']))
+        return samples
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# Metrics recorded by the app
+HTTP_REQUEST_SECONDS = Histogram('vocab_http_request_duration_seconds', 'HTTP request latency by endpoint',
+                                 ('endpoint', 'method', 'status'))
+EXTRACTION_SECONDS = Histogram('vocab_extraction_duration_seconds',
+                               'End-to-end vocabulary extraction for one image (OCR + parse + save)')
+STAGE_SECONDS = Histogram('vocab_stage_duration_seconds',
+                          'Time spent in each extraction stage (model_init, decode, readtext, parse, save_unit, ...)',
+                          ('stage',))
+OCR_CALLS = Counter('vocab_ocr_calls', 'Images sent to EasyOCR', ('mode',))
+OCR_CACHE_LOOKUPS = Counter('vocab_ocr_cache_lookups', 'OCR cache lookups by result', ('result',))
+PARSE_RESULTS = Counter('vocab_parse_results', 'Parsed images by extraction method', ('method',))
+ERRORS = Counter('vocab_errors', 'Failures by extraction stage', ('stage',))
+UPLOADS = Counter('vocab_uploads', 'Uploaded images by duplicate check result (new, duplicate, near_duplicate)',
+                  ('result',))
+UPLOADS_DELETED = Counter('vocab_uploads_deleted', 'Uploads removed by retention (expired, evicted)', ('reason',))
+REJECTIONS = Counter('vocab_busy_rejections', 'Requests answered 503 because an OCR queue was full or the request was shed', ('queue',))
+
+
+def observe_stages(timings):
+    """Record {stage: seconds} timings reported by an OCR worker"""
+    for name, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=name)
+
+
+@contextmanager
+def stage(name, timings=None, expected=()):
+    """
+    Time one extraction stage: observe it in STAGE_SECONDS, count an error on failure
+    Args:
+        name (str): Stage label
+        timings (dict): Optional dict that also receives {name: seconds}
+        expected (tuple): Exception types that are not counted as errors (e.g. queue full)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except expected:
+        raise
+    except Exception:
+        ERRORS.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if timings is not None:
+            timings[name] = elapsed
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of raw EasyOCR results
+Entries are keyed by the SHA-256 of the image bytes plus the OCR config,
+so the same worksheet is only OCR'd once no matter how often it is opened.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def make_cache_key(image_bytes, ocr_config):
+    """
+    Build a content-addressed cache key
+    Args:
+        image_bytes (bytes): Raw image file contents
+        ocr_config (dict): OCR settings that affect the result (languages, model version, ...)
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256(image_bytes)
+    digest.update(json.dumps(ocr_config, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def normalize_ocr_result(ocr_result):
+    """
+    Convert EasyOCR output (numpy numbers inside) into plain JSON-safe lists
+    Returns:
+        list: [[bbox, text, confidence], ...] with bbox as [[x, y], ...]
+    """
+    normalized = []
+    for bbox, text, confidence in ocr_result:
+        points = [[float(point[0]), float(point[1])] for point in bbox]
+        normalized.append([points, str(text), float(confidence)])
+    return normalized
+
+
+class OCRCache:
+    """Size-bounded LRU cache of OCR results stored as one JSON file per image"""
+
+    def __init__(self, cache_dir, max_entries=500, max_bytes=50 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> file size, oldest first
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        """Rebuild the LRU order from file access times left by previous runs"""
+        entries = []
+        for fname in os.listdir(self.cache_dir):
+            if not fname.endswith('.json'):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, fname))
+            entries.append((stat.st_mtime, fname[:-len('.json')], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def get(self, key):
+        """
+        Look up a cached OCR result
+        Returns:
+            list or None: Normalized OCR result, or None on a miss
+        """
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+                # Touch the file so LRU order survives restarts
+                os.utime(path, None)
+            except (OSError, ValueError):
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, ocr_result):
+        """
+        Store an OCR result and evict least recently used entries if over budget
+        Returns:
+            list: The normalized result that was stored
+        """
+        result = normalize_ocr_result(ocr_result)
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            if key in self._index:
+                self._total_bytes -= self._index[key]
+            self._index[key] = len(data)
+            self._index.move_to_end(key)
+            self._total_bytes += len(data)
+            self._evict()
+        return result
+
+    def _drop(self, key):
+        size = self._index.pop(key, 0)
+        self._total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._index and (len(self._index) > self.max_entries or self._total_bytes > self.max_bytes):
+            oldest_key = next(iter(self._index))
+            self._drop(oldest_key)
+            self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._index),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Background OCR job queue
+Uploads enqueue an OCR+parse job and get a job ID back immediately;
+worker threads run the jobs so Flask request threads stay free.
+While a job runs, process_fn can publish partial results with
+report_progress(); wait_for_events() hands them to streaming clients.
+
+Waiting jobs are ordered by start-time fair queuing per client: a client's
+n-th waiting job goes behind every other client's n-th, so one uploader
+queueing twenty worksheets delays the next parent by one job, not twenty.
+Jobs still waiting deadline_seconds after submission are shed (failed with
+retry_after) rather than run for a client that has likely given up.
+"""
+
+import math
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# (JobQueue, job ID) of the job running in the current context
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+def report_progress(event, data=None):
+    """
+    Publish a partial result for the job running in this context (no-op outside a job)
+    Args:
+        event (str): Event name, e.g. 'unit' or 'spoken'
+        data (dict): JSON-serializable payload
+    """
+    current = _current_job.get()
+    if current is not None:
+        job_queue, job_id = current
+        job_queue._add_event(job_id, event, data or {})
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"OCR job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Fair (per-client) queue of extraction jobs processed by a fixed set of worker threads"""
+
+    def __init__(self, process_fn, num_workers=1, history_limit=200, max_queued=50, deadline_seconds=None):
+        """
+        Args:
+            process_fn (callable): process_fn(filename) -> result dict
+            num_workers (int): Number of worker threads
+            history_limit (int): Finished jobs kept around for status lookups
+            max_queued (int): Jobs allowed to wait before submit() raises QueueFullError
+            deadline_seconds (float): Shed jobs still queued this long after submission (None = never)
+        """
+        self.process_fn = process_fn
+        self.num_workers = num_workers
+        self.history_limit = history_limit
+        self.max_queued = max_queued
+        self.deadline_seconds = deadline_seconds
+        self._avg_seconds = None
+        self._jobs = OrderedDict()
+        self._pending = []  # job IDs still waiting, in the order they will run
+        self._tags = {}  # job ID -> (fair-queuing tag, sequence) while waiting
+        self._client_tags = {}  # client -> tag of its last waiting job
+        self._round = 0  # tag of the job started last
+        self._sequence = 0
+        self.shed = 0
+        self._contexts = {}  # job ID -> submitter's context (request ID for log correlation)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # job status / events changed
+        self._workers = []
+        self._stopping = False
+
+    def start(self):
+        """Start worker threads (idempotent)"""
+        with self._lock:
+            if self._workers:
+                return
+            self._stopping = False
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"ocr-job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, filename, client=None):
+        """
+        Enqueue an extraction job
+        Args:
+            filename (str): Uploaded image filename
+            client (str): Who asked for it, for fair ordering between clients
+        Returns:
+            str: Job ID
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting
+        """
+        self.start()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._shed_expired()
+            if len(self._pending) >= self.max_queued:
+                raise QueueFullError(self._retry_after())
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'filename': filename,
+                'client': client,
+                'status': JOB_QUEUED,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None,
+                'retry_after': None,
+                'events': []
+            }
+            self._enqueue(job_id, client)
+            self._contexts[job_id] = contextvars.copy_context()
+            self._prune()
+            self._changed.notify_all()
+        log.info("Queued OCR job %s for %s", job_id, filename)
+        return job_id
+
+    def _enqueue(self, job_id, client):
+        """Insert a job behind every other client's job of the same round"""
+        tag = max(self._round, self._client_tags.get(client, 0)) + 1
+        self._client_tags[client] = tag
+        self._sequence += 1
+        key = self._tags[job_id] = (tag, self._sequence)
+        position = len(self._pending)
+        while position > 0 and self._tags[self._pending[position - 1]] > key:
+            position -= 1
+        self._pending.insert(position, job_id)
+
+    def _dequeue(self):
+        """Take the next job to run (called with the lock held, _pending not empty)"""
+        job_id = self._pending.pop(0)
+        tag, _ = self._tags.pop(job_id)
+        self._round = max(self._round, tag)
+        self._client_tags = {client: last for client, last in self._client_tags.items() if last > self._round}
+        return job_id
+
+    def _shed_expired(self):
+        """Fail queued jobs past the deadline (called with the lock held)"""
+        if self.deadline_seconds is None:
+            return
+        cutoff = time.time() - self.deadline_seconds
+        expired = [job_id for job_id in self._pending if self._jobs[job_id]['created_at'] < cutoff]
+        if not expired:
+            return
+        retry_after = self._retry_after()
+        for job_id in expired:
+            self._pending.remove(job_id)
+            self._tags.pop(job_id, None)
+            self._contexts.pop(job_id, None)
+            job = self._jobs[job_id]
+            job['status'] = JOB_FAILED
+            job['error'] = f"server busy, waited more than {self.deadline_seconds:g}s for OCR"
+            job['retry_after'] = retry_after
+            job['finished_at'] = time.time()
+        self.shed += len(expired)
+        log.warning("Shed %d OCR jobs queued for more than %gs", len(expired), self.deadline_seconds)
+        self._changed.notify_all()
+
+    def _until_next_expiry(self):
+        """Seconds until the oldest queued job passes the deadline (None = no deadline or nothing queued)"""
+        if self.deadline_seconds is None or not self._pending:
+            return None
+        oldest = min(self._jobs[job_id]['created_at'] for job_id in self._pending)
+        return max(0.0, oldest + self.deadline_seconds - time.time())
+
+    def get(self, job_id):
+        """
+        Get a snapshot of a job's state
+        Returns:
+            dict or None: Job info including queue_position while queued
+        """
+        with self._lock:
+            # Deadlines are enforced here too: with every worker busy nobody else would shed
+            self._shed_expired()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            info = dict(job, events=list(job['events']))
+            info['queue_position'] = self._pending.index(job_id) + 1 if job['status'] == JOB_QUEUED else 0
+            return info
+
+    def find_job(self, filename):
+        """
+        Latest job for an image that is queued, running or done (failed jobs are ignored)
+        Returns:
+            str or None: Job ID
+        """
+        with self._lock:
+            self._shed_expired()  # never hand out a job that is already past its deadline
+            for job_id in reversed(self._jobs):
+                job = self._jobs[job_id]
+                if job['filename'] == filename and job['status'] != JOB_FAILED:
+                    return job_id
+        return None
+
+    def active_filenames(self):
+        """Images of queued and running jobs"""
+        with self._lock:
+            return {job['filename'] for job in self._jobs.values() if job['status'] in (JOB_QUEUED, JOB_RUNNING)}
+
+    def wait_for_events(self, job_id, seen=0, timeout=15):
+        """
+        Block until the job has more than `seen` events, changes status or finishes
+        Args:
+            job_id (str): Job ID
+            seen (int): Number of events the caller already has
+            timeout (float): Max seconds to wait (callers send a keep-alive then)
+        Returns:
+            tuple: (new events [(event, data), ...], job snapshot) - snapshot is None for unknown jobs
+        """
+        with self._changed:
+            self._shed_expired()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return [], None
+            status = job['status']
+            position = self._queue_position(job_id)
+            deadline = time.time() + timeout
+            # Wake up when the oldest queued job expires, so a follower sees its job shed on time
+            while not (len(job['events']) > seen or job['status'] != status
+                       or self._queue_position(job_id) != position):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                expiry = self._until_next_expiry()
+                self._changed.wait(remaining if expiry is None else min(remaining, expiry + 0.01))
+                self._shed_expired()
+            info = {key: value for key, value in job.items() if key != 'events'}
+            info['queue_position'] = self._queue_position(job_id)
+            return job['events'][seen:], info
+
+    def _queue_position(self, job_id):
+        return self._pending.index(job_id) + 1 if job_id in self._pending else 0
+
+    def _add_event(self, job_id, event, data):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job['events'].append((event, data))
+                self._changed.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """
+        Wait until no job is queued or running
+        Returns:
+            bool: True if idle, False on timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._changed:
+            while self._pending or any(job['status'] == JOB_RUNNING for job in self._jobs.values()):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return True
+
+    def stop(self, timeout=None):
+        """Let the worker threads finish their current job and exit (queued jobs stay queued)"""
+        with self._changed:
+            self._stopping = True
+            workers, self._workers = self._workers, []
+            self._changed.notify_all()
+        for worker in workers:
+            worker.join(timeout)
+
+    def _run_job(self, job_id, filename):
+        _current_job.set((self, job_id))
+        return self.process_fn(filename)
+
+    def _retry_after(self):
+        """Estimate seconds until a queued job gets picked up"""
+        avg = self._avg_seconds or 5.0
+        return max(1, math.ceil(avg * len(self._pending) / self.num_workers))
+
+    def stats(self):
+        """Count jobs by status"""
+        with self._lock:
+            self._shed_expired()
+            counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            counts['workers'] = self.num_workers
+            counts['max_queued'] = self.max_queued
+            counts['shed'] = self.shed
+            counts['clients_waiting'] = len({self._jobs[job_id]['client'] for job_id in self._pending})
+            return counts
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond history_limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in (JOB_DONE, JOB_FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.history_limit)]:
+            del self._jobs[job_id]
+
+    def _worker_loop(self):
+        while True:
+            with self._changed:
+                while True:
+                    if self._stopping:
+                        return
+                    self._shed_expired()
+                    if self._pending:
+                        break
+                    self._changed.wait()
+                job_id = self._dequeue()
+                job = self._jobs[job_id]
+                context = self._contexts.pop(job_id, None) or contextvars.copy_context()
+                job['status'] = JOB_RUNNING
+                job['started_at'] = time.time()
+                filename = job['filename']
+                self._changed.notify_all()
+            try:
+                result = context.run(self._run_job, job_id, filename)
+                with self._lock:
+                    job['result'] = result
+                    job['status'] = JOB_DONE
+            except Exception as e:
+                context.run(log.exception, "OCR job %s failed: %s", job_id, e)
+                with self._lock:
+                    job['error'] = str(e)
+                    job['retry_after'] = getattr(e, 'retry_after', None)  # busy, not broken: worth retrying
+                    job['status'] = JOB_FAILED
+            finally:
+                with self._lock:
+                    job['finished_at'] = time.time()
+                    elapsed = job['finished_at'] - job['started_at']
+                    self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+                    self._prune()
+                    self._changed.notify_all()
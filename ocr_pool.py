@@ -0,0 +1,584 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-process EasyOCR worker pool
+Each worker process holds its own easyocr.Reader, so concurrent uploads run
+on separate cores instead of fighting over one shared torch model.
+
+With idle_unload_seconds set, the workers are stopped after that long without
+OCR, which hands their model memory back to the OS; the next call starts them
+again. Workers report their RSS (before/after loading the model, and the
+peak during each readtext) with every result, for /api/ocr-pool and /metrics.
+
+easyocr (and torch) are imported lazily inside get_ocr(), so the web
+process never pays for them unless it runs OCR in-process.
+"""
+
+import os
+import gc
+import math
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ocr_cache import normalize_ocr_result
+from image_preprocess import preprocess_image
+from region_ocr import readtext_regions
+from logging_setup import configure_logging, get_request_id, request_context
+
+log = logging.getLogger(__name__)
+
+
+class PoolFullError(Exception):
+    """Raised when the OCR submission queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"OCR queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+# Per-process EasyOCR reader (one per worker process, or one for in-process mode)
+ocr_instance = None
+_ocr_lock = threading.Lock()    # serializes in-process readtext calls
+_init_lock = threading.Lock()   # makes sure the model is only built once
+_model_info = {'load_seconds': None, 'warmup_seconds': None, 'rss_before_load_bytes': None,
+               'rss_after_load_bytes': None}
+_model_init_reported = False    # load time is returned with the first result of each process
+_warmup_barrier = None           # set in worker processes by _init_worker
+
+
+def _proc_status_bytes(field):
+    """A kB field of /proc/self/status (VmRSS, VmHWM) in bytes; None where there is no /proc"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    return _proc_status_bytes('VmRSS')
+
+
+def _reset_peak_rss():
+    """Restart VmHWM at the current RSS, so the next peak_rss_bytes() covers only what follows (Linux 4.0+)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """Peak resident set size since the last _reset_peak_rss() (or since the process started)"""
+    peak = _proc_status_bytes('VmHWM')
+    if peak is None:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # kB on Linux
+        except (ImportError, OSError):
+            pass
+    return peak
+
+
+def _memory_info(peak=None):
+    """RSS figures of this process, sent back to the pool with each result"""
+    return {'pid': os.getpid(), 'rss_bytes': rss_bytes(), 'peak_rss_bytes': peak,
+            'rss_before_load_bytes': _model_info['rss_before_load_bytes'],
+            'rss_after_load_bytes': _model_info['rss_after_load_bytes']}
+
+
+def _import_easyocr():
+    """Import easyocr on first use (pulls in torch - seconds and hundreds of MB)"""
+    # Fix for Pillow compatibility with EasyOCR
+    try:
+        from PIL import Image
+        if not hasattr(Image, 'ANTIALIAS'):
+            Image.ANTIALIAS = Image.LANCZOS
+    except ImportError:
+        pass
+    import easyocr
+    return easyocr
+
+
+def get_ocr(languages, torch_threads=None):
+    """Get EasyOCR instance (initialize once per process, thread-safe)"""
+    global ocr_instance
+    if ocr_instance is None:
+        with _init_lock:
+            if ocr_instance is None:
+                try:
+                    log.info("Initializing EasyOCR in process %d (one-time setup)", os.getpid())
+                    started = time.time()
+                    _model_info['rss_before_load_bytes'] = rss_bytes()
+                    easyocr = _import_easyocr()
+                    if torch_threads:
+                        import torch
+                        torch.set_num_threads(torch_threads)
+                    ocr_instance = easyocr.Reader(languages, gpu=False)
+                    _model_info['load_seconds'] = time.time() - started
+                    _model_info['rss_after_load_bytes'] = rss_bytes()
+                    log.info("EasyOCR %s initialized in %.2fs (RSS %s -> %s bytes)", languages,
+                             _model_info['load_seconds'], _model_info['rss_before_load_bytes'],
+                             _model_info['rss_after_load_bytes'])
+                except Exception:
+                    log.exception("Failed to initialize EasyOCR")
+                    raise
+    return ocr_instance
+
+
+def _unload_model():
+    """Drop this process's reader (in-process mode; worker processes are simply stopped)"""
+    global ocr_instance, _model_init_reported
+    with _init_lock:
+        ocr_instance = None
+        _model_init_reported = False
+        for key in _model_info:
+            _model_info[key] = None
+    gc.collect()
+
+
+def _dummy_image_bytes():
+    """Small PNG with a line of text, enough to exercise detector and recognizer"""
+    from io import BytesIO
+    from PIL import Image, ImageDraw
+    image = Image.new('RGB', (320, 64), 'white')
+    ImageDraw.Draw(image).text((10, 20), 'Unit 1 warm up', fill='black')
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def warm_up_model(languages, torch_threads=None):
+    """
+    Load the model and run one dummy inference (once per process)
+    Returns:
+        dict: pid, load_seconds, warmup_seconds
+    """
+    reader = get_ocr(languages, torch_threads)
+    with _init_lock:
+        if _model_info['warmup_seconds'] is None:
+            started = time.time()
+            reader.readtext(_dummy_image_bytes())
+            _model_info['warmup_seconds'] = time.time() - started
+            log.info("EasyOCR warm-up inference took %.2fs", _model_info['warmup_seconds'])
+    return _worker_model_info()
+
+
+def _worker_model_info():
+    return dict(_model_info, **_memory_info())
+
+
+def _worker_warmup_info():
+    """Block until every worker is running one of these, so each process reports once"""
+    _warmup_barrier.wait(timeout=600)
+    return _worker_model_info()
+
+
+def _init_worker(languages, torch_threads, warm_up, warmup_barrier, log_config, nice=0):
+    """Worker process initializer - set up logging, pin thread counts and load the model"""
+    global _warmup_barrier
+    _warmup_barrier = warmup_barrier
+    if log_config is not None:
+        configure_logging(**log_config)
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+    if torch_threads:
+        os.environ['OMP_NUM_THREADS'] = str(torch_threads)
+    if warm_up:
+        warm_up_model(languages, torch_threads)
+    else:
+        get_ocr(languages, torch_threads)
+
+
+def _run_readtext(reader, image_bytes, preprocess_options, region_keywords=None):
+    """
+    Preprocess (optional) and run readtext
+    Args:
+        region_keywords (dict): Header/end keywords for two-phase region recognition,
+                                None to recognize the whole page
+    Returns:
+        tuple: (normalized OCR result, {stage_name: seconds})
+    """
+    timings = {}
+    if preprocess_options is not None:
+        image_bytes, timings = preprocess_image(image_bytes, preprocess_options)
+    started = time.perf_counter()
+    if region_keywords is not None:
+        result, region_timings, stats = readtext_regions(reader, image_bytes, region_keywords)
+        timings.update(region_timings)
+        log.debug("Region OCR recognized %d/%d boxes", stats['boxes_recognized'], stats['boxes_detected'])
+    else:
+        result = reader.readtext(image_bytes)
+    result = normalize_ocr_result(result)
+    timings['readtext'] = time.perf_counter() - started
+    return result, timings
+
+
+def _report_model_init(timings):
+    """Add this process's model load time to the first timings it returns"""
+    global _model_init_reported
+    if not _model_init_reported and _model_info['load_seconds'] is not None:
+        timings['model_init'] = _model_info['load_seconds']
+        _model_init_reported = True
+    return timings
+
+
+def _worker_readtext(image_bytes, preprocess_options, region_keywords, request_id=None):
+    """
+    Run preprocessing + readtext inside a worker process
+    Returns:
+        tuple: (result, timings, memory) - memory is _memory_info() with the peak RSS of this call
+    """
+    _reset_peak_rss()
+    with request_context(request_id):
+        result, timings = _run_readtext(ocr_instance, image_bytes, preprocess_options, region_keywords)
+    return result, _report_model_init(timings), _memory_info(peak_rss_bytes())
+
+
+def _run_readtext_batch(reader, images, preprocess_options, region_keywords):
+    """
+    OCR several images in one call; a bad image does not fail the whole batch
+    Returns:
+        list: [(result, timings, error), ...] in input order
+    """
+    outputs = []
+    for image_bytes in images:
+        try:
+            result, timings = _run_readtext(reader, image_bytes, preprocess_options, region_keywords)
+            outputs.append((result, timings, None))
+        except Exception as e:
+            outputs.append((None, {}, str(e)))
+    return outputs
+
+
+def _worker_readtext_batch(images, preprocess_options, region_keywords, request_id=None):
+    """
+    Run a batch of images inside a worker process (one IPC round-trip per batch)
+    Returns:
+        tuple: (outputs, memory) - memory is _memory_info() with the peak RSS of the batch
+    """
+    _reset_peak_rss()
+    with request_context(request_id):
+        outputs = _run_readtext_batch(ocr_instance, images, preprocess_options, region_keywords)
+    if outputs:
+        _report_model_init(outputs[0][1])
+    return outputs, _memory_info(peak_rss_bytes())
+
+
+class OCRWorkerPool:
+    """
+    Bounded pool of OCR worker processes
+    num_workers=0 runs OCR in the calling thread (serialized by a lock),
+    which is handy for debugging.
+    """
+
+    def __init__(self, languages, num_workers=2, torch_threads=1, max_queued=8, eager_warmup=False, log_config=None,
+                 idle_unload_seconds=None, worker_nice=0):
+        """
+        Args:
+            languages (list): EasyOCR language codes
+            num_workers (int): Worker processes (0 = in-process)
+            torch_threads (int): torch intra-op threads per worker
+            max_queued (int): Submissions allowed to wait beyond the busy workers
+            eager_warmup (bool): Expect warm_up() at startup (see warm_up_in_background); not ready until it finishes
+            log_config (dict): configure_logging() arguments for the worker processes
+            idle_unload_seconds (float): Unload the model(s) after this long without OCR, None = keep them loaded
+            worker_nice (int): Niceness added to the worker processes, so the web process wins the CPU under load
+        """
+        self.languages = languages
+        self.num_workers = num_workers
+        self.torch_threads = torch_threads
+        self.eager_warmup = eager_warmup
+        self.log_config = log_config
+        self.worker_nice = worker_nice
+        self.model_loaded = False
+        self.warmup_seconds = None
+        self.worker_info = []
+        self._warm_lock = threading.Lock()
+        self.max_pending = max(1, num_workers) + max_queued
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._avg_seconds = None
+        self.completed = 0
+        self.rejected = 0
+        self.idle_unload_seconds = idle_unload_seconds
+        self.unloads = 0
+        self._unloaded_idle = False  # model dropped on purpose by unload_if_idle (still ready); cleared on crash/warm-up
+        self._last_used = time.time()
+        self._memory = {}  # pid -> last _memory_info() of each live worker
+        self._peak_readtext_bytes = None
+        self._closed = threading.Event()
+        if idle_unload_seconds:
+            threading.Thread(target=self._idle_watch, name='ocr-idle-unload', daemon=True).start()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: never fork a process that may already hold torch threads
+            context = multiprocessing.get_context('spawn')
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.languages, self.torch_threads, self.eager_warmup, context.Barrier(self.num_workers),
+                          self.log_config, self.worker_nice)
+            )
+        return self._executor
+
+    def warm_up(self):
+        """
+        Start every worker, load its model and run a dummy inference
+        Blocks until done; safe to call from several threads (runs once).
+        """
+        with self._warm_lock:
+            if self.warmup_seconds is not None:
+                return
+            self._unloaded_idle = False
+            started = time.time()
+            if self.num_workers == 0:
+                with _ocr_lock:
+                    self.worker_info = [warm_up_model(self.languages, self.torch_threads)]
+            else:
+                with self._lock:
+                    executor = self._get_executor()
+                # One blocking task per worker forces every process to spawn and initialize
+                futures = [executor.submit(_worker_warmup_info) for _ in range(self.num_workers)]
+                self.worker_info = [future.result() for future in futures]
+            self.warmup_seconds = time.time() - started
+            self.model_loaded = True
+            with self._lock:
+                self._last_used = time.time()
+                for info in self.worker_info:
+                    self._memory[info['pid']] = info
+            log.info("OCR warm-up finished in %.2fs (%d model(s))", self.warmup_seconds, max(1, self.num_workers))
+
+    def warm_up_in_background(self):
+        """Run warm_up() in a daemon thread (at startup, and again after a worker crash when eager_warmup is on)"""
+        def run():
+            try:
+                self.warm_up()
+            except Exception:
+                log.exception("OCR warm-up failed")
+
+        threading.Thread(target=run, name='ocr-warmup', daemon=True).start()
+
+    def _discard_broken(self, executor):
+        """A worker died (e.g. OOM): drop the pool so the next call rebuilds it, and warm that one up again"""
+        with self._lock:
+            if self._executor is not executor:
+                return  # already replaced by another caller
+            self._executor = None
+            self.model_loaded = False
+            self.warmup_seconds = None
+            self._unloaded_idle = False
+            self._memory.clear()
+        if self.eager_warmup:
+            self.warm_up_in_background()
+
+    def readiness(self):
+        """
+        Report whether this instance should receive traffic
+        With eager warm-up the instance is only ready once the model is warm,
+        or while it is unloaded after idling (the next call reloads it on
+        purpose). A crash or a warm-up in progress is not ready.
+        """
+        return {
+            'ready': self.model_loaded or not self.eager_warmup or self._unloaded_idle,
+            'model_loaded': self.model_loaded,
+            'eager_warmup': self.eager_warmup,
+            'warmup_seconds': round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            'workers': self.num_workers,
+            'worker_models': self.worker_info
+        }
+
+    def retry_after(self):
+        """Estimate seconds until a queue slot frees up"""
+        avg = self._avg_seconds or 5.0
+        return max(1, math.ceil(avg * self._pending / max(1, self.num_workers)))
+
+    def readtext(self, image_bytes, preprocess_options=None, region_keywords=None):
+        """
+        Run OCR on image bytes in a worker, blocking until the result is ready
+        Args:
+            image_bytes (bytes): Original image file contents
+            preprocess_options (dict): image_preprocess options, None to skip preprocessing
+            region_keywords (dict): Enables two-phase region recognition (see region_ocr.py)
+        Returns:
+            tuple: (normalized [[bbox, text, confidence], ...], {stage_name: seconds})
+        Raises:
+            PoolFullError: If max_pending submissions are already in flight
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolFullError(self.retry_after())
+            self._pending += 1
+
+        started = time.time()
+        try:
+            if self.num_workers == 0:
+                with _ocr_lock:
+                    reader = get_ocr(self.languages, self.torch_threads)
+                    _reset_peak_rss()
+                    result, timings = _run_readtext(reader, image_bytes, preprocess_options, region_keywords)
+                    _report_model_init(timings)
+                    self._record_memory(_memory_info(peak_rss_bytes()))
+                self.model_loaded = True
+                return result, timings
+
+            with self._lock:
+                executor = self._get_executor()
+            try:
+                result, timings, memory = executor.submit(_worker_readtext, image_bytes, preprocess_options,
+                                                          region_keywords, get_request_id()).result()
+                self._record_memory(memory)
+                self.model_loaded = True
+                return result, timings
+            except BrokenProcessPool:
+                self._discard_broken(executor)
+                raise
+        finally:
+            elapsed = time.time() - started
+            with self._lock:
+                self._last_used = time.time()
+                self._pending -= 1
+                self.completed += 1
+                self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+
+    def readtext_batch(self, images, preprocess_options=None, region_keywords=None, batch_size=4):
+        """
+        OCR many images, split into batches spread across the workers
+        Args:
+            images (list): Image bytes
+            batch_size (int): Images per worker call
+        Returns:
+            list: [(result, timings, error), ...] in input order
+        Raises:
+            PoolFullError: If there are not enough free submission slots for all batches
+        """
+        batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+        if not batches:
+            return []
+        with self._lock:
+            if self._pending + len(batches) > self.max_pending:
+                self.rejected += 1
+                raise PoolFullError(self.retry_after())
+            self._pending += len(batches)
+
+        started = time.time()
+        try:
+            if self.num_workers == 0:
+                outputs = []
+                for batch in batches:
+                    with _ocr_lock:
+                        reader = get_ocr(self.languages, self.torch_threads)
+                        _reset_peak_rss()
+                        batch_outputs = _run_readtext_batch(reader, batch, preprocess_options, region_keywords)
+                        if batch_outputs:
+                            _report_model_init(batch_outputs[0][1])
+                        self._record_memory(_memory_info(peak_rss_bytes()))
+                        outputs.extend(batch_outputs)
+                self.model_loaded = True
+                return outputs
+
+            with self._lock:
+                executor = self._get_executor()
+            try:
+                request_id = get_request_id()
+                futures = [executor.submit(_worker_readtext_batch, batch, preprocess_options, region_keywords, request_id)
+                           for batch in batches]
+                outputs = []
+                for future in futures:
+                    batch_outputs, memory = future.result()
+                    self._record_memory(memory)
+                    outputs.extend(batch_outputs)
+                self.model_loaded = True
+                return outputs
+            except BrokenProcessPool:
+                self._discard_broken(executor)
+                raise
+        finally:
+            elapsed = (time.time() - started) / len(images)
+            with self._lock:
+                self._last_used = time.time()
+                self._pending -= len(batches)
+                self.completed += len(images)
+                self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+
+    def _record_memory(self, memory):
+        with self._lock:
+            self._memory[memory['pid']] = memory
+            peak = memory['peak_rss_bytes']
+            if peak is not None and (self._peak_readtext_bytes is None or peak > self._peak_readtext_bytes):
+                self._peak_readtext_bytes = peak
+
+    def _idle_watch(self):
+        interval = min(30.0, self.idle_unload_seconds / 4)
+        while not self._closed.wait(interval):
+            try:
+                self.unload_if_idle()
+            except Exception:
+                log.exception("Idle OCR model unload failed")
+
+    def unload_if_idle(self):
+        """
+        Unload the model(s) if nothing has used them for idle_unload_seconds
+        Returns:
+            bool: True if a loaded model was unloaded
+        """
+        with self._warm_lock, self._lock:
+            idle = time.time() - self._last_used
+            loaded = self._executor is not None if self.num_workers else ocr_instance is not None
+            if not loaded or self._pending or idle < self.idle_unload_seconds:
+                return False
+            executor, self._executor = self._executor, None
+            resident = sum(info['rss_bytes'] or 0 for info in self._memory.values())
+            self._memory.clear()
+            self.model_loaded = False
+            self.warmup_seconds = None
+            self.worker_info = []
+            self.unloads += 1
+            self._unloaded_idle = True
+            if executor is None:
+                _unload_model()  # in-process; no call can pick up the reader while _pending is 0 under _lock
+        if executor is not None:
+            # Idle workers exit at once, and their whole address space goes back to the OS
+            executor.shutdown(wait=True)
+        log.info("Unloaded OCR model(s) after %.0fs idle (%d bytes resident)", idle, resident)
+        return True
+
+    def stats(self):
+        """Report pool size, load and model memory"""
+        with self._lock:
+            return {
+                'workers': self.num_workers,
+                'torch_threads': self.torch_threads,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_seconds': round(self._avg_seconds, 3) if self._avg_seconds is not None else None,
+                'model_loaded': self.model_loaded,
+                'idle_unload_seconds': self.idle_unload_seconds,
+                'unloads': self.unloads,
+                'memory': {
+                    'resident_bytes': sum(info['rss_bytes'] or 0 for info in self._memory.values()),
+                    'peak_readtext_bytes': self._peak_readtext_bytes,
+                    'workers': sorted(self._memory.values(), key=lambda info: info['pid'])
+                }
+            }
+
+    def shutdown(self):
+        self._closed.set()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Region-restricted recognition
+The parser only uses text between the 口语表达词汇 / 识读词语 headers and the
+end-section markers (儿歌, 句式, 笔画, 古诗), plus the unit title at the top.
+Instead of recognizing every box on the page:
+
+1. Detect all text boxes (cheap compared to recognition)
+2. Recognize only header-sized boxes and the top band, find the headers
+3. Recognize the remaining boxes inside the header -> end-marker bands
+
+Headers are found with the parser's own cleaning, MIN_CONFIDENCE and
+matcher (vocab_parser.classify_box). Unless phase 1 finds BOTH the spoken
+and the practice header, every box is recognized, so a page the parser
+would handle with a single header or its fallback gets readtext()'s exact
+result. The merged result has the same boxes in the same order as readtext()
+for everything inside the bands. benchmarks/region_benchmark.py checks the
+parsed output against full-page parsing on the fixtures.
+"""
+
+import time
+
+from vocab_parser import KeywordMatcher, classify_box
+
+HEADER_MAX_ASPECT = 10  # width / height; headers are a handful of characters
+TOP_BAND_RATIO = 0.15   # always recognize the top of the page (unit title)
+
+
+def _box_geometry(box, is_free):
+    """Return (y_top, height, aspect) for a horizontal [x0, x1, y0, y1] or free 4-point box"""
+    if is_free:
+        xs = [point[0] for point in box]
+        ys = [point[1] for point in box]
+        x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+    else:
+        x0, x1, y0, y1 = box
+    height = max(1, y1 - y0)
+    return y0, height, (x1 - x0) / height
+
+
+def find_vocab_bands(markers):
+    """
+    Turn header / end markers into vertical bands worth recognizing
+    Args:
+        markers (list): [(y_top, height, 'header' | 'end'), ...]
+    Returns:
+        list: [(y_start, y_end), ...] - a band runs from a header to the next end marker
+    """
+    bands = []
+    band_start = None
+    for y_top, height, kind in sorted(markers):
+        if kind == 'header' and band_start is None:
+            # Allow a line of slack so text level with the header is kept
+            band_start = y_top - height
+        elif kind == 'end' and band_start is not None:
+            bands.append((band_start, y_top))
+            band_start = None
+    if band_start is not None:
+        bands.append((band_start, float('inf')))
+    return bands
+
+
+def recognize_regions(boxes, page_height, recognize, keywords, header_max_aspect=HEADER_MAX_ASPECT,
+                      top_band_ratio=TOP_BAND_RATIO):
+    """
+    Pick and recognize the boxes the parser needs (the reader-independent part of readtext_regions)
+    Args:
+        boxes (list): [(box, is_free), ...] detected boxes in readtext() order
+        page_height (int): Image height in pixels
+        recognize (callable): recognize(indexes) -> {box index: (bbox, text, confidence)}
+        keywords (dict): {'spoken': [...], 'practice': [...], 'end': [...]}
+    Returns:
+        tuple: (raw readtext-style result, {stage_name: seconds}, {'boxes_detected', 'boxes_recognized'})
+    """
+    matcher = KeywordMatcher(keywords['spoken'], keywords['practice'], keywords['end'], {})
+    timings = {}
+    geometry = [_box_geometry(box, is_free) for box, is_free in boxes]
+    top_band = page_height * top_band_ratio
+
+    # Phase 1: header-sized boxes + the title band
+    started = time.perf_counter()
+    phase_one = [i for i, (y_top, _, aspect) in enumerate(geometry)
+                 if aspect <= header_max_aspect or y_top < top_band]
+    recognized = recognize(phase_one)
+    markers = []
+    found = set()
+    for i, (_, text, confidence) in recognized.items():
+        kind = classify_box(text, confidence, matcher)
+        if kind:
+            found.add(kind)
+            markers.append((geometry[i][0], geometry[i][1], 'end' if kind == 'end' else 'header'))
+    timings['recognize_headers'] = time.perf_counter() - started
+
+    # Phase 2: everything else inside the vocabulary bands, or the whole page unless both headers were found
+    started = time.perf_counter()
+    remaining = [i for i in range(len(boxes)) if i not in recognized]
+    if {'spoken', 'practice'} <= found:
+        bands = find_vocab_bands(markers)
+        remaining = [i for i in remaining if any(start <= geometry[i][0] < end for start, end in bands)]
+    recognized.update(recognize(remaining))
+    timings['recognize_regions'] = time.perf_counter() - started
+
+    result = [recognized[i] for i in sorted(recognized)]
+    stats = {'boxes_detected': len(boxes), 'boxes_recognized': len(recognized)}
+    return result, timings, stats
+
+
+def readtext_regions(reader, image, keywords, header_max_aspect=HEADER_MAX_ASPECT, top_band_ratio=TOP_BAND_RATIO):
+    """
+    Two-phase replacement for reader.readtext(image)
+    Args:
+        reader: easyocr.Reader
+        image: Anything readtext accepts (bytes, path, array)
+        keywords (dict): {'spoken': [...], 'practice': [...], 'end': [...]}
+    Returns:
+        tuple: (raw readtext-style result, {stage_name: seconds}, {'boxes_detected', 'boxes_recognized'})
+    """
+    from easyocr.utils import reformat_input
+
+    started = time.perf_counter()
+    img, img_cv_grey = reformat_input(image)
+    horizontal_list, free_list = reader.detect(img)
+    horizontal_list, free_list = horizontal_list[0], free_list[0]
+    detect_seconds = time.perf_counter() - started
+
+    # readtext() returns horizontal boxes first, then free-form boxes
+    boxes = [(box, False) for box in horizontal_list] + [(box, True) for box in free_list]
+
+    def recognize(indexes):
+        """Recognize a subset of boxes; returns {box index: (bbox, text, confidence)}"""
+        horizontal = [boxes[i][0] for i in indexes if not boxes[i][1]]
+        free = [boxes[i][0] for i in indexes if boxes[i][1]]
+        if not horizontal and not free:
+            return {}
+        results = reader.recognize(img_cv_grey, horizontal_list=horizontal, free_list=free, reformat=False)
+        ordered = [i for i in indexes if not boxes[i][1]] + [i for i in indexes if boxes[i][1]]
+        return dict(zip(ordered, results))
+
+    result, timings, stats = recognize_regions(boxes, img_cv_grey.shape[0], recognize, keywords,
+                                               header_max_aspect, top_band_ratio)
+    return result, {'detect': detect_seconds, **timings}, stats
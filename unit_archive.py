@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk export / import of saved units as one tar archive
+Layout (in this order, so an importer can work through it as it arrives):
+
+    manifest.json            {"format": "learning-ava-units", "version": 1, "units": N, ...}
+    images/<filename>        source photo of the unit that follows (each image once)
+    units/<unit_key>.json    the unit, same shape as saved_vocab/*.json
+
+export_archive() yields the archive in chunks as it is written, one unit at a
+time, so memory stays at about one image however many units there are.
+import_archive() reads the archive from a stream in the same way. Each unit is
+validated on its own and written with the store's atomic save_unit. A bad
+unit is reported and skipped, and does not abort the rest of the import.
+
+    curl -o units.tar http://host/api/export
+    curl --data-binary @units.tar -H 'Content-Type: application/x-tar' http://host/api/import
+"""
+
+import io
+import os
+import json
+import time
+import tarfile
+import logging
+from werkzeug.utils import secure_filename
+
+from vocab_store import SECTIONS, unit_key
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = 'learning-ava-units'
+ARCHIVE_VERSION = 1
+MAX_UNIT_BYTES = 1024 * 1024  # a unit JSON is a few KB; anything this big is not one
+MAX_UNIT_NAME_LENGTH = 100
+MAX_WORD_LENGTH = 200
+MAX_REPORTED_ERRORS = 100
+
+
+class ArchiveError(Exception):
+    """The upload is not a usable unit archive (not a tar, no manifest, unknown format)"""
+
+
+class _ChunkSink:
+    """Write-only file object collecting what tarfile writes until the next drain()"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _add_bytes(tar, name, data, mtime=None):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime if mtime is not None else time.time()
+    tar.addfile(info, io.BytesIO(data))
+
+
+def export_archive(vocab_store, upload_folder, include_images=True, is_stored_image=None):
+    """
+    Stream every saved unit (and its source image) as a tar archive
+    Args:
+        vocab_store: JSONVocabStore or SQLiteVocabStore
+        upload_folder (str): Folder holding the units' image_filename files
+        include_images (bool): Also pack the referenced images
+        is_stored_image (callable): is_stored_image(filename) -> bool; only these images are packed
+            (e.g. UploadStore.contains, so a unit's image_filename can never point outside the uploads)
+    Yields:
+        bytes: Consecutive chunks of the archive
+    """
+    units = vocab_store.list_units()
+    sink = _ChunkSink()
+    exported = images = 0
+    with tarfile.open(fileobj=sink, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+        manifest = {'format': ARCHIVE_FORMAT, 'version': ARCHIVE_VERSION, 'units': len(units),
+                    'images': include_images, 'exported_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+        _add_bytes(tar, 'manifest.json', json.dumps(manifest).encode('utf-8'))
+        sent_images = set()
+        for summary in units:
+            unit_data = vocab_store.load_unit(summary['unit_name'])
+            if unit_data is None:
+                continue  # deleted since the listing
+            image_filename = unit_data.get('image_filename')
+            if (include_images and image_filename and image_filename not in sent_images
+                    and (is_stored_image is None or is_stored_image(image_filename))):
+                sent_images.add(image_filename)
+                path = os.path.join(upload_folder, image_filename)
+                try:
+                    with open(path, 'rb') as f:
+                        info = tar.gettarinfo(arcname=f'images/{image_filename}', fileobj=f)
+                        tar.addfile(info, f)
+                    images += 1
+                except FileNotFoundError:
+                    pass  # removed by hand; the unit is still worth exporting
+            _add_bytes(tar, f'units/{unit_key(unit_data["unit_name"])}.json',
+                       json.dumps(unit_data, ensure_ascii=False).encode('utf-8'))
+            exported += 1
+            tar.members = []  # tarfile keeps every header it wrote otherwise
+            yield sink.drain()
+    yield sink.drain()  # end-of-archive blocks
+    log.info("Exported %d units and %d images", exported, images)
+
+
+def validate_unit(data, is_image=None):
+    """
+    Check an imported unit and keep only the known fields
+    Args:
+        data: Parsed unit JSON
+        is_image (callable): is_image(name) -> bool for a non-empty image_filename
+    Returns:
+        tuple: (unit_data, None) or (None, error message)
+    """
+    if not isinstance(data, dict):
+        return None, 'not a JSON object'
+    name = data.get('unit_name')
+    if not isinstance(name, str) or not name.strip() or len(name) > MAX_UNIT_NAME_LENGTH:
+        return None, 'missing or invalid unit_name'
+    if name.startswith('.') or any(char in name for char in '/\\\0'):
+        return None, f'unsafe unit_name {name!r}'
+    unit_data = {'unit_name': name}
+    for field in ('unit_chinese', 'image_filename', 'saved_at'):
+        value = data.get(field, '')
+        if not isinstance(value, str):
+            return None, f'{field} must be a string'
+        unit_data[field] = value
+    image_filename = unit_data['image_filename']
+    if image_filename and (image_filename != secure_filename(image_filename)
+                           or (is_image is not None and not is_image(image_filename))):
+        return None, f'unsafe image_filename {image_filename!r}'
+    for section in SECTIONS:
+        words = data.get(section, [])
+        if not isinstance(words, list) or not all(isinstance(word, str) and len(word) <= MAX_WORD_LENGTH
+                                                  for word in words):
+            return None, f'{section} must be a list of words'
+        unit_data[section] = words
+    return unit_data, None
+
+
+def import_archive(fileobj, save_unit, unit_exists, store_image=None, is_image=None, max_image_bytes=None,
+                   replace=False):
+    """
+    Import units from a tar archive read incrementally from fileobj
+    Args:
+        fileobj: Readable binary stream (e.g. the request body); plain or gzip-compressed tar
+        save_unit (callable): save_unit(unit_data), an atomic write
+        unit_exists (callable): unit_exists(unit_name) -> bool
+        store_image (callable): store_image(image_bytes, name) -> stored filename, None to skip images
+        is_image (callable): is_image(name) -> bool for image members
+        max_image_bytes (int): Larger images are skipped
+        replace (bool): Overwrite units that already exist (otherwise they are skipped)
+    Returns:
+        dict: units_imported, units_skipped, units_invalid, images_imported, complete, errors
+    Raises:
+        ArchiveError: If fileobj does not start with a unit archive manifest
+    """
+    started = time.time()
+    summary = {'units_imported': 0, 'units_skipped': 0, 'units_invalid': 0, 'images_imported': 0,
+               'complete': True, 'errors': []}
+
+    def error(message):
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append(message)
+
+    try:
+        tar = tarfile.open(fileobj=fileobj, mode='r|*')
+        manifest_member = tar.next()
+    except tarfile.TarError as e:
+        raise ArchiveError(f'not a tar archive: {e}')
+    with tar:
+        if manifest_member is None or manifest_member.name != 'manifest.json' or manifest_member.size > MAX_UNIT_BYTES:
+            raise ArchiveError('archive does not start with manifest.json')
+        try:
+            manifest = json.loads(tar.extractfile(manifest_member).read())
+        except ValueError:
+            raise ArchiveError('manifest.json is not valid JSON')
+        if not isinstance(manifest, dict) or manifest.get('format') != ARCHIVE_FORMAT:
+            raise ArchiveError('manifest.json is not a unit archive manifest')
+        if not isinstance(manifest.get('version'), int) or manifest['version'] > ARCHIVE_VERSION:
+            raise ArchiveError(f"archive version {manifest.get('version')!r} is newer than this app supports")
+
+        stored_images = {}  # image name in the archive -> stored filename
+        try:
+            for member in tar:
+                tar.members = []  # headers seen so far are not needed again; keeps memory flat
+                if not member.isfile():
+                    continue
+                folder, _, name = member.name.partition('/')
+                if folder == 'images' and store_image is not None:
+                    if '/' in name or (is_image is not None and not is_image(name)):
+                        error(f'{member.name}: not an image name')
+                    elif max_image_bytes is not None and member.size > max_image_bytes:
+                        error(f'{member.name}: larger than {max_image_bytes} bytes')
+                    else:
+                        stored_images[name] = store_image(tar.extractfile(member).read(), name)
+                        summary['images_imported'] += 1
+                elif folder == 'units' and name.endswith('.json'):
+                    if member.size > MAX_UNIT_BYTES:
+                        summary['units_invalid'] += 1
+                        error(f'{member.name}: larger than {MAX_UNIT_BYTES} bytes')
+                        continue
+                    try:
+                        data = json.loads(tar.extractfile(member).read())
+                    except ValueError:
+                        data = None
+                    unit_data, problem = validate_unit(data, is_image)
+                    if unit_data is None:
+                        summary['units_invalid'] += 1
+                        error(f'{member.name}: {problem}')
+                        continue
+                    if not replace and unit_exists(unit_data['unit_name']):
+                        summary['units_skipped'] += 1
+                        continue
+                    # Imported images may be stored under a different (content-hash) name; a unit
+                    # whose image was not in the archive keeps no reference to a file here
+                    unit_data['image_filename'] = stored_images.get(unit_data['image_filename'], '')
+                    save_unit(unit_data)
+                    summary['units_imported'] += 1
+        except (tarfile.TarError, EOFError, OSError) as e:
+            # Everything before this point is imported; tell the client the rest is missing
+            summary['complete'] = False
+            error(f'archive ended early: {e}')
+
+    summary['seconds'] = round(time.time() - started, 3)
+    log.info("Imported %d units (%d skipped, %d invalid) and %d images in %.2fs", summary['units_imported'],
+             summary['units_skipped'], summary['units_invalid'], summary['images_imported'], summary['seconds'])
+    return summary
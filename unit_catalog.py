@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory catalog of saved units
+The homepage and /api/saved-units only need per-unit counts, so instead of
+re-reading every saved_vocab/*.json on every request we keep the summaries in
+memory, update them on save, and revalidate against directory/file mtimes.
+"""
+
+import os
+import json
+import time
+import threading
+
+
+def summarize_unit(data, fname):
+    """Build the listing entry for one unit file"""
+    return {
+        'unit_name': data.get('unit_name', fname.replace('.json', '')),
+        'unit_chinese': data.get('unit_chinese', ''),
+        'spoken_count': len(data.get('spoken_vocab', [])),
+        'practice_count': len(data.get('practice_vocab', [])),
+        'image_filename': data.get('image_filename', '')
+    }
+
+
+class UnitCatalog:
+    """Unit summaries keyed by file name, revalidated cheaply via mtimes"""
+
+    def __init__(self, vocab_folder, revalidate_seconds=30):
+        """
+        Args:
+            vocab_folder (str): Folder holding Unit_*.json files
+            revalidate_seconds (int): How often to re-stat every file (catches in-place edits
+                                      made outside the app); the folder itself is stat'ed per call
+        """
+        self.vocab_folder = vocab_folder
+        self.revalidate_seconds = revalidate_seconds
+        self._lock = threading.Lock()
+        self._entries = {}      # fname -> (mtime, summary)
+        self._listing = None    # cached sorted list of summaries
+        self._dir_mtime = None
+        self._last_sweep = 0.0
+
+    def _load(self, fname):
+        """(Re)read one unit file; returns False if it is unreadable"""
+        fpath = os.path.join(self.vocab_folder, fname)
+        try:
+            mtime = os.path.getmtime(fpath)
+            with open(fpath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self._entries.pop(fname, None)
+            return False
+        self._entries[fname] = (mtime, summarize_unit(data, fname))
+        return True
+
+    def _sweep(self, check_files):
+        """Sync with the folder: pick up added/removed files, and changed ones if check_files"""
+        try:
+            fnames = {f for f in os.listdir(self.vocab_folder) if f.endswith('.json')}
+        except OSError:
+            fnames = set()
+        for fname in list(self._entries):
+            if fname not in fnames:
+                del self._entries[fname]
+        for fname in fnames:
+            if fname not in self._entries:
+                self._load(fname)
+            elif check_files:
+                try:
+                    if os.path.getmtime(os.path.join(self.vocab_folder, fname)) != self._entries[fname][0]:
+                        self._load(fname)
+                except OSError:
+                    self._entries.pop(fname, None)
+        self._listing = None
+
+    def _revalidate(self):
+        try:
+            dir_mtime = os.path.getmtime(self.vocab_folder)
+        except OSError:
+            dir_mtime = None
+        now = time.time()
+        check_files = now - self._last_sweep >= self.revalidate_seconds
+        if dir_mtime != self._dir_mtime or check_files:
+            self._sweep(check_files)
+            self._dir_mtime = dir_mtime
+            if check_files:
+                self._last_sweep = now
+
+    def list_units(self):
+        """
+        Get all unit summaries sorted by file name
+        Returns:
+            list: [{'unit_name', 'unit_chinese', 'spoken_count', 'practice_count', 'image_filename'}, ...]
+        """
+        with self._lock:
+            self._revalidate()
+            if self._listing is None:
+                self._listing = [self._entries[fname][1] for fname in sorted(self._entries)]
+            return self._listing
+
+    def update(self, fname, unit_data):
+        """Record a unit that was just saved (no disk read needed)"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(os.path.join(self.vocab_folder, fname))
+            except OSError:
+                mtime = None
+            self._entries[fname] = (mtime, summarize_unit(unit_data, fname))
+            self._listing = None
+
+    def remove(self, fname):
+        """Forget a unit file"""
+        with self._lock:
+            self._entries.pop(fname, None)
+            self._listing = None
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed storage for uploaded worksheet images
+New uploads are stored as <sha256 prefix>.<ext>, so uploading the same photo
+again finds the stored file (and with it the OCR cache entry, the saved unit
+and any finished job) instead of storing and OCR'ing a second copy.
+
+uploads/index.jsonl is an append-only log of {filename, sha256, phash, size,
+uploaded_at}; it is replayed on start, so listing uploads and adding up their
+size never scans the folder. Files from before content addressing keep their
+names and are adopted into the index by hashing them once (their retention
+age starts then):
+    python upload_store.py index uploads
+
+A 64-bit difference hash (dHash) of each image flags near-duplicates - the
+same sheet photographed again - by Hamming distance.
+
+collect() is the retention sweep: it deletes uploads no saved unit uses once
+they have been idle too long, then evicts the least recently used ones while
+the folder is over its byte budget.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+from io import BytesIO
+from PIL import Image, ImageOps
+
+log = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.jsonl'
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+HASH_PREFIX_CHARS = 32
+
+
+def content_filename(sha256, original_filename):
+    """Stored name for an upload: hash prefix + normalized extension of the original name"""
+    ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'bin'
+    return f"{sha256[:HASH_PREFIX_CHARS]}.{EXTENSION_ALIASES.get(ext, ext)}"
+
+
+def perceptual_hash(image_bytes):
+    """
+    64-bit difference hash: is each pixel brighter than its right neighbour on a 9x8 grayscale thumbnail
+    Returns:
+        int or None: The hash, or None if the image cannot be decoded
+    """
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        if image.format == 'JPEG':
+            image.draft('L', (64, 64))  # decode at 1/8 scale, plenty for a 9x8 thumbnail
+        image = ImageOps.exif_transpose(image).convert('L').resize((9, 8), Image.LANCZOS)
+    except Exception:
+        return None
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class UploadStore:
+    """Uploads keyed by content hash, with exact and near-duplicate lookup"""
+
+    def __init__(self, folder, near_duplicate_distance=6):
+        """
+        Args:
+            folder (str): Upload folder
+            near_duplicate_distance (int): Max dHash bit difference counted as the same sheet (0 = off)
+        """
+        self.folder = folder
+        self.near_duplicate_distance = near_duplicate_distance
+        self.index_path = os.path.join(folder, INDEX_FILE)
+        self._lock = threading.Lock()
+        self._by_hash = {}  # sha256 -> filename
+        self._entries = {}  # filename -> {sha256, phash, size, uploaded_at, accessed_at}
+        self._bytes = 0
+        os.makedirs(folder, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if entry.get('deleted'):
+                self._discard(entry['filename'])
+                continue
+            if entry.get('size') is None:
+                # Written before sizes were recorded; stat once, compact() persists it
+                try:
+                    stat = os.stat(os.path.join(self.folder, entry['filename']))
+                except OSError:
+                    continue
+                entry['size'], entry['uploaded_at'] = stat.st_size, stat.st_mtime
+            self._add(entry['filename'], entry['sha256'], entry.get('phash'), entry['size'], entry['uploaded_at'],
+                      entry.get('accessed_at'))
+
+    def _add(self, filename, sha256, phash, size, uploaded_at, accessed_at=None, primary=True):
+        self._discard(filename)
+        if primary or sha256 not in self._by_hash:
+            self._by_hash[sha256] = filename
+        self._entries[filename] = {'sha256': sha256, 'phash': phash, 'size': size, 'uploaded_at': uploaded_at,
+                                   'accessed_at': accessed_at or uploaded_at}
+        self._bytes += size
+
+    def _discard(self, filename):
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return None
+        self._bytes -= entry['size']
+        if self._by_hash.get(entry['sha256']) == filename:
+            del self._by_hash[entry['sha256']]
+            # Another stored copy of the same image (an adopted legacy file) takes over
+            for other, other_entry in self._entries.items():
+                if other_entry['sha256'] == entry['sha256']:
+                    self._by_hash[entry['sha256']] = other
+                    break
+        return entry
+
+    def _append(self, record):
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def _record(self, filename):
+        entry = self._entries[filename]
+        return {'filename': filename, 'sha256': entry['sha256'], 'phash': entry['phash'], 'size': entry['size'],
+                'uploaded_at': entry['uploaded_at'], 'accessed_at': entry['accessed_at']}
+
+    def find(self, sha256):
+        """Stored filename for a content hash (None if unknown or the file is gone)"""
+        with self._lock:
+            filename = self._by_hash.get(sha256)
+        if filename is not None and os.path.exists(os.path.join(self.folder, filename)):
+            return filename
+        return None
+
+    def contains(self, filename):
+        """True if filename is a stored upload (not the index or a temp file)"""
+        with self._lock:
+            return filename in self._entries
+
+    def content_hash(self, filename):
+        """SHA-256 recorded for a stored upload (None if it is not one)"""
+        with self._lock:
+            entry = self._entries.get(filename)
+            return entry['sha256'] if entry is not None else None
+
+    def touch(self, filename):
+        """Record a use of an upload (it is served or uploaded again), for age expiry and LRU eviction"""
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is not None:
+                entry['accessed_at'] = time.time()
+
+    def list_recent(self, limit=None):
+        """
+        Stored uploads, newest first (from the index, no directory scan)
+        Returns:
+            list: Filenames
+        """
+        with self._lock:
+            filenames = sorted(self._entries, key=lambda filename: self._entries[filename]['uploaded_at'],
+                               reverse=True)
+        return filenames[:limit] if limit is not None else filenames
+
+    def find_near_duplicate(self, phash, exclude=None):
+        """Closest stored image within near_duplicate_distance bits of phash"""
+        if not phash or not self.near_duplicate_distance:
+            return None  # 0 = flat image without any gradient, says nothing about the sheet
+        best, best_distance = None, self.near_duplicate_distance + 1
+        with self._lock:
+            candidates = [(filename, entry['phash']) for filename, entry in self._entries.items()
+                          if entry['phash'] is not None]
+        for filename, other in candidates:
+            distance = hamming_distance(phash, other)
+            if distance < best_distance and filename != exclude:
+                best, best_distance = filename, distance
+        return best
+
+    def save(self, image_bytes, original_filename):
+        """
+        Store an upload unless an identical one is already stored
+        Args:
+            image_bytes (bytes): Uploaded file contents
+            original_filename (str): Name the client sent (for the extension)
+        Returns:
+            dict: filename, duplicate (identical image already stored), near_duplicate_of (filename or None)
+        """
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        existing = self.find(sha256)
+        if existing is not None:
+            self.touch(existing)
+            return {'filename': existing, 'duplicate': True, 'near_duplicate_of': None}
+
+        filename = content_filename(sha256, original_filename)
+        path = os.path.join(self.folder, filename)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(image_bytes)
+
+        phash = perceptual_hash(image_bytes)
+        near_duplicate_of = self.find_near_duplicate(phash, exclude=filename)
+        with self._lock:
+            # Under the lock, so a concurrent collect() cannot delete the file it just wrote
+            os.replace(tmp_path, path)
+            self._add(filename, sha256, phash, len(image_bytes), time.time())
+            self._append(self._record(filename))
+        if near_duplicate_of:
+            log.info("Upload %s looks like a re-photographed %s", filename, near_duplicate_of)
+        return {'filename': filename, 'duplicate': False, 'near_duplicate_of': near_duplicate_of}
+
+    def adopt(self, filename):
+        """
+        Index one file put in the folder without save() (stored before the index existed, or copied in)
+        Args:
+            filename (str): Name of a file in the upload folder; the caller checks it is an image
+        Returns:
+            bool: True if it is now a stored upload
+        """
+        with self._lock:
+            if filename in self._entries:
+                return True
+        try:
+            with open(os.path.join(self.folder, filename), 'rb') as f:
+                image_bytes = f.read()
+        except OSError:
+            return False  # missing, a directory, or deleted meanwhile
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        phash = perceptual_hash(image_bytes)
+        with self._lock:
+            if filename not in self._entries:
+                # An identical newer upload keeps its entry; this copy just gets recorded. Its age counts from
+                # now, not its mtime, so retention never deletes a legacy upload on the first sweep.
+                self._add(filename, sha256, phash, len(image_bytes), time.time(), primary=False)
+                self._append(self._record(filename))
+        return True
+
+    def adopt_existing(self, is_image):
+        """
+        Hash uploads stored before the index existed so re-uploads of them are detected
+        Args:
+            is_image (callable): is_image(filename) -> bool, e.g. app.allowed_file
+        Returns:
+            int: Number of files added to the index
+        """
+        adopted = 0
+        for fname in sorted(os.listdir(self.folder)):
+            if fname.endswith('.tmp') or not is_image(fname) or self.contains(fname):
+                continue
+            if self.adopt(fname):
+                adopted += 1
+        if adopted:
+            log.info("Indexed %d existing uploads in %s", adopted, self.folder)
+        return adopted
+
+    def delete(self, filename, last_active=None):
+        """
+        Delete an upload and its index entry
+        Args:
+            filename (str): Stored filename
+            last_active (float): Only delete if it has not been used since (guards against a re-upload racing a sweep)
+        Returns:
+            bool: True if it was deleted
+        """
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is None or (last_active is not None and self._last_active(entry) > last_active):
+                return False
+            self._discard(filename)
+            self._append({'filename': filename, 'deleted': True})
+            try:
+                os.remove(os.path.join(self.folder, filename))
+            except FileNotFoundError:
+                pass
+        return True
+
+    @staticmethod
+    def _last_active(entry):
+        return max(entry['uploaded_at'], entry['accessed_at'])
+
+    def collect(self, keep, max_age_seconds=None, max_bytes=None, min_age_seconds=3600):
+        """
+        Retention sweep: delete unreferenced uploads idle for max_age_seconds, then evict the least
+        recently used unreferenced ones until the stored originals fit in max_bytes
+        Args:
+            keep (set): Filenames that must stay (images of saved units, uploads being extracted)
+            max_age_seconds (float): Idle time after which an unreferenced upload expires (None = never)
+            max_bytes (int): Budget for the stored originals (None = unlimited)
+            min_age_seconds (float): Uploads used more recently than this are never deleted
+        Returns:
+            dict: {'expired': [filename, ...], 'evicted': [filename, ...]}
+        """
+        now = time.time()
+        with self._lock:
+            candidates = sorted((self._last_active(entry), filename, entry['size'])
+                                for filename, entry in self._entries.items()
+                                if filename not in keep and self._last_active(entry) < now - min_age_seconds)
+            total = self._bytes
+
+        removed = {'expired': [], 'evicted': []}
+        for last_active, filename, size in candidates:  # least recently used first
+            if max_age_seconds is not None and last_active < now - max_age_seconds:
+                reason = 'expired'
+            elif max_bytes is not None and total > max_bytes:
+                reason = 'evicted'
+            else:
+                continue
+            if self.delete(filename, last_active=last_active):
+                removed[reason].append(filename)
+                total -= size
+        if removed['expired'] or removed['evicted']:
+            log.info("Upload retention removed %d expired and %d least recently used uploads (%d bytes stored)",
+                     len(removed['expired']), len(removed['evicted']), total)
+        if max_bytes is not None and total > max_bytes:
+            log.warning("Uploads use %d bytes, over the %d byte budget, but the rest are in use", total, max_bytes)
+        return removed
+
+    def compact(self):
+        """Rewrite the index with only live entries (drops deleted files and repeats, persists access times)"""
+        with self._lock:
+            records = [self._record(filename) for filename in self._entries]
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+            os.replace(tmp_path, self.index_path)
+        return len(records)
+
+    def stats(self):
+        with self._lock:
+            return {'images': len(self._entries), 'unique': len(self._by_hash), 'bytes': self._bytes}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'index':
+        print(__doc__)
+        sys.exit(1)
+    started = time.time()
+    store = UploadStore(sys.argv[2])
+    count = store.adopt_existing(lambda fname: fname.rsplit('.', 1)[-1].lower() in ('png', 'jpg', 'jpeg'))
+    store.compact()
+    print(f"Indexed {count} existing uploads in {sys.argv[2]} in {time.time() - started:.2f}s")
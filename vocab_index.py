@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Cross-unit inverted index of saved vocabulary
+Maps every word and every character to the units (and sections,
+spoken_vocab / practice_vocab) that contain it, so "which units have 眼睛?"
+or "every character practiced so far" is a dict lookup instead of loading
+every saved unit. The index lives in memory. It is built once from the vocab
+store in a background thread at startup and then kept current by update()
+whenever a unit is saved.
+
+search() walks the postings of the query's rarest character and stops at
+limit, so its cost does not grow with the number of units. The review set is
+kept as per-section counts and its sorted list is cached until the next save.
+"""
+
+import time
+import logging
+import threading
+
+from vocab_store import SECTIONS
+
+log = logging.getLogger(__name__)
+
+KINDS = ('characters', 'words')
+
+
+def indexed_chars(word):
+    """Distinct characters of a word worth indexing (no spaces or punctuation), in order"""
+    if word.isalnum():
+        return dict.fromkeys(word)
+    return dict.fromkeys(char for char in word if char.isalnum())
+
+
+class VocabIndex:
+    """In-memory word -> units and character -> units postings for all saved units"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._units = {}  # unit_name -> {'unit_chinese', 'spoken_vocab': tuple, 'practice_vocab': tuple}
+        self._words = {}  # word -> {unit_name: {section, ...}}
+        self._chars = {}  # char -> {unit_name: {section: [words containing char]}}
+        self._counts = {kind: {section: {} for section in SECTIONS} for kind in KINDS}  # units per text and section
+        self._building = None  # units saved while build() runs; build must not overwrite them
+        self._review_cache = {}  # (kind, section) -> review-set items
+        self.build_seconds = None
+
+    def build(self, vocab_store):
+        """Index every unit in the store (run once, in a background thread)"""
+        started = time.time()
+        with self._lock:
+            self._building = set()
+        try:
+            for summary in vocab_store.list_units():
+                unit_data = vocab_store.load_unit(summary['unit_name'])
+                if unit_data is None:
+                    continue  # deleted since the listing
+                with self._lock:
+                    if unit_data['unit_name'] not in self._building:
+                        self._add(unit_data)
+        finally:
+            with self._lock:
+                self._building = None
+                self._review_cache.clear()
+            self.build_seconds = time.time() - started
+            self._ready.set()
+        log.info("Indexed %d units (%d words, %d characters) in %.2fs", len(self._units), len(self._words),
+                 len(self._chars), self.build_seconds)
+
+    def wait_ready(self, timeout=None):
+        """True once the initial build has finished"""
+        return self._ready.wait(timeout)
+
+    def update(self, unit_data):
+        """Re-index one unit after it was saved (replaces what was indexed for it)"""
+        with self._lock:
+            self._remove(unit_data['unit_name'])
+            self._add(unit_data)
+            if self._building is not None:
+                self._building.add(unit_data['unit_name'])
+            self._review_cache.clear()
+
+    def remove(self, unit_name):
+        """Forget a deleted unit"""
+        with self._lock:
+            self._remove(unit_name)
+            if self._building is not None:
+                self._building.add(unit_name)
+            self._review_cache.clear()
+
+    def _add(self, unit_data):
+        name = unit_data['unit_name']
+        entry = {'unit_chinese': unit_data.get('unit_chinese', '')}
+        for section in SECTIONS:
+            words = tuple(dict.fromkeys(word for word in unit_data.get(section) or () if word))
+            entry[section] = words
+            section_chars = {}
+            for word in words:
+                self._words.setdefault(word, {}).setdefault(name, set()).add(section)
+                for char in indexed_chars(word):
+                    self._chars.setdefault(char, {}).setdefault(name, {}).setdefault(section, []).append(word)
+                    section_chars[char] = None
+            self._count(section, words, section_chars, 1)
+        self._units[name] = entry
+
+    def _count(self, section, words, chars, delta):
+        """Adjust the number of units each word and character appears in for one section"""
+        for kind, texts in (('words', words), ('characters', chars)):
+            counts = self._counts[kind][section]
+            for text in texts:
+                count = counts.get(text, 0) + delta
+                if count:
+                    counts[text] = count
+                else:
+                    del counts[text]
+
+    def _remove(self, name):
+        entry = self._units.pop(name, None)
+        if entry is None:
+            return
+        for section in SECTIONS:
+            words = entry[section]
+            self._count(section, words, dict.fromkeys(char for word in words for char in indexed_chars(word)), -1)
+            for word in words:
+                postings = self._words.get(word)
+                if postings is not None and postings.pop(name, None) is not None and not postings:
+                    del self._words[word]
+                for char in indexed_chars(word):
+                    postings = self._chars.get(char)
+                    if postings is not None and postings.pop(name, None) is not None and not postings:
+                        del self._chars[char]
+
+    def search(self, query, section=None, limit=50):
+        """
+        Find units with a word containing query (a word, part of one or a single character)
+        Args:
+            query (str): Text to look for
+            section (str): Only match words in this section (None = both)
+            limit (int): Maximum units to return
+        Returns:
+            dict: {'query', 'units': [{'unit_name', 'unit_chinese', <section>: [matching words]}, ...],
+                   'exact': [unit names where query is a whole word], 'truncated': bool}
+        """
+        query = query.strip()
+        sections = (section,) if section else SECTIONS
+        units, truncated = [], False
+        with self._lock:
+            exact = []
+            for name, found in self._words.get(query, {}).items():
+                if len(exact) == limit:
+                    break
+                if any(s in found for s in sections):
+                    exact.append(name)
+            chars = indexed_chars(query)
+            if chars:
+                # Walk the postings of the rarest character; every match contains it
+                postings = min((self._chars.get(char, {}) for char in chars), key=len)
+                for name, by_section in postings.items():
+                    match = {s: [word for word in by_section[s] if query in word]
+                             for s in sections if s in by_section}
+                    match = {s: words for s, words in match.items() if words}
+                    if not match:
+                        continue
+                    if len(units) == limit:
+                        truncated = True
+                        break
+                    units.append(dict(match, unit_name=name, unit_chinese=self._units[name]['unit_chinese']))
+        return {'query': query, 'units': units, 'exact': exact, 'truncated': truncated}
+
+    def review_set(self, kind='characters', section=None, unit_names=None):
+        """
+        Every distinct character (or word) practiced so far, most widespread first
+        Args:
+            kind (str): 'characters' or 'words'
+            section (str): Only this section (None = both)
+            unit_names (list): Only these units (None = all units)
+        Returns:
+            list: [{'text', 'units': number of units containing it, 'sections': [...]}, ...]
+        """
+        with self._lock:
+            if unit_names is not None:
+                units = [self._units[name] for name in unit_names if name in self._units]
+                return self._unit_review_items(kind, (section,) if section else SECTIONS, units)
+            key = (kind, section)
+            if key not in self._review_cache:
+                self._review_cache[key] = self._review_items(kind, section)
+            return self._review_cache[key]
+
+    def _review_items(self, kind, section):
+        """Review set over all units, from the maintained per-section counts (called with the lock held)"""
+        counts = self._counts[kind]
+        if section:
+            items = [{'text': text, 'units': count, 'sections': [section]} for text, count in counts[section].items()]
+        else:
+            postings = self._chars if kind == 'characters' else self._words
+            items = [{'text': text, 'units': len(units), 'sections': [s for s in SECTIONS if text in counts[s]]}
+                     for text, units in postings.items()]
+        items.sort(key=lambda item: -item['units'])  # stable: ties keep first-indexed order
+        return items
+
+    @staticmethod
+    def _unit_review_items(kind, sections, units):
+        found = {}  # text -> [unit count, sections]
+        for entry in units:
+            seen = {}
+            for section in sections:
+                for word in entry[section]:
+                    for text in (indexed_chars(word) if kind == 'characters' else (word,)):
+                        seen.setdefault(text, set()).add(section)
+            for text, text_sections in seen.items():
+                item = found.setdefault(text, [0, set()])
+                item[0] += 1
+                item[1] |= text_sections
+        items = [{'text': text, 'units': count, 'sections': [s for s in SECTIONS if s in text_sections]}
+                 for text, (count, text_sections) in found.items()]
+        items.sort(key=lambda item: -item['units'])
+        return items
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ready': self._ready.is_set(),
+                'units': len(self._units),
+                'words': len(self._words),
+                'characters': len(self._chars),
+                'build_seconds': round(self.build_seconds, 3) if self.build_seconds is not None else None
+            }
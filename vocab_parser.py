@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+"""
+Vocabulary parser for EasyOCR results
+Turns [(bbox, text, confidence), ...] into the 口语表达词汇 (spoken) and
+识读词语 (practice) word lists.
+
+Each text box is cleaned, measured (top y) and classified (section header /
+end marker) exactly once. Vocabulary lines are placed relative to the
+headers with one sorted sweep, and every word list is de-duplicated through
+a dict (ordered set) instead of `if w not in list`.
+
+Header aliases, end-section markers and OCR corrections are matched with
+regexes compiled once from a prefix trie, so the cost per box stays flat as
+aliases are added. Extra aliases / corrections can be loaded from a JSON file:
+
+    {
+        "spoken_headers": ["麦达词汇"],
+        "practice_headers": ["识读字"],
+        "end_markers": ["歌歌词"],
+        "corrections": {"眼晴": "眼睛"}
+    }
+
+benchmarks/parser_benchmark.py checks the output against the previous
+implementation on a golden corpus of recorded OCR results.
+"""
+
+import re
+import json
+import logging
+from bisect import bisect_right
+
+from logging_setup import dump_enabled
+
+log = logging.getLogger(__name__)
+
+# Section header keywords (including common OCR misreadings)
+SPOKEN_HEADER_KEYWORDS = ['口语表达词汇', '口语表达', '表达词汇', '口语', '表达', '麦达词汇', '达词汇', '适麦达']
+PRACTICE_HEADER_KEYWORDS = ['识读词语', '识读', '读词语', '词语', '识读字']
+END_SECTION_KEYWORDS = ['儿歌', '句式', '笔画', '古诗', '歌歌词']  # sections after the vocabulary
+
+OCR_CORRECTIONS = {
+    '眼晴': '眼睛',
+}
+
+MIN_CONFIDENCE = 0.05  # very low on purpose, vocabulary boxes are often low-confidence
+
+CHINESE_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+NON_CHINESE_RE = re.compile(r'[^\u4e00-\u9fff]')
+# Keep Chinese characters, English letters, and some punctuation
+ITEM_NOISE_RE = re.compile(r'[^\u4e00-\u9fffa-zA-Z，、。：\s]')
+VOCAB_LINE_SPLIT_RE = re.compile(r'[。，、\s;；]+')
+TEXT_SPLIT_RE = re.compile(r'[，、。：；;\s]+')
+
+# Joins cleaned box texts for substring lookups; ITEM_NOISE_RE removes it from box texts
+_HAYSTACK_SEP = '\x00'
+
+
+def trie_pattern(words):
+    """
+    Regex source matching any of the words, factored as a prefix trie
+    e.g. ['口语', '口语表达', '表达'] -> (?:口语(?:表达)?|表达)
+    Every branch starts with a different character and optional suffixes are
+    greedy, so the longest word at a position wins and adding words does not
+    add alternatives tried at each position.
+    """
+    trie = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie) or '(?!)'
+
+
+class KeywordMatcher:
+    """Compiled section-header / end-marker / OCR-correction matcher"""
+
+    def __init__(self, spoken_headers, practice_headers, end_markers, corrections):
+        self.spoken_headers = list(dict.fromkeys(spoken_headers))
+        self.practice_headers = list(dict.fromkeys(practice_headers))
+        self.end_markers = list(dict.fromkeys(end_markers))
+        self.corrections = dict(corrections)
+        # Checked in this order, like the original any() chain
+        self._sections = [
+            ('spoken', re.compile(trie_pattern(self.spoken_headers))),
+            ('practice', re.compile(trie_pattern(self.practice_headers))),
+            ('end', re.compile(trie_pattern(self.end_markers)))
+        ]
+        self._corrections_re = re.compile(trie_pattern(self.corrections)) if self.corrections else None
+
+    def classify(self, text):
+        """Section marker in a text box: 'spoken', 'practice', 'end' or None"""
+        for kind, pattern in self._sections:
+            if pattern.search(text):
+                return kind
+        return None
+
+    def correct(self, word):
+        """Apply OCR corrections in one pass (longest misread wins, replacements are not re-scanned)"""
+        if self._corrections_re is None:
+            return word
+        return self._corrections_re.sub(lambda m: self.corrections[m.group(0)], word)
+
+    def region_keywords(self):
+        """Keyword lists for region-restricted recognition (see region_ocr.py)"""
+        return {'spoken': self.spoken_headers, 'practice': self.practice_headers, 'end': self.end_markers}
+
+
+def load_keyword_config(path):
+    """
+    Build a matcher from the built-in keywords plus the ones in a JSON config file
+    Args:
+        path (str): Config file; a missing file just gives the built-in keywords
+    Returns:
+        KeywordMatcher
+    """
+    config = {}
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            pass
+    return KeywordMatcher(SPOKEN_HEADER_KEYWORDS + config.get('spoken_headers', []),
+                          PRACTICE_HEADER_KEYWORDS + config.get('practice_headers', []),
+                          END_SECTION_KEYWORDS + config.get('end_markers', []),
+                          {**OCR_CORRECTIONS, **config.get('corrections', {})})
+
+
+_matcher = load_keyword_config(None)
+
+
+def get_matcher():
+    return _matcher
+
+
+def set_matcher(matcher):
+    """Swap in a matcher (e.g. one built by load_keyword_config at startup)"""
+    global _matcher
+    _matcher = matcher
+
+
+def classify_text(text):
+    """Section marker in a cleaned text box: 'spoken', 'practice', 'end' or None"""
+    return _matcher.classify(text)
+
+
+def clean_item_text(text):
+    """A box's text as the parser reads it: OCR noise (digits, symbols, stray marks) stripped"""
+    return ITEM_NOISE_RE.sub('', text).strip()
+
+
+def classify_box(text, confidence, matcher=None):
+    """
+    Section marker in a raw OCR box, exactly as parse_vocabulary_from_ocr sees it
+    (boxes under MIN_CONFIDENCE are ignored, the text is cleaned first)
+    Returns:
+        str: 'spoken', 'practice', 'end' or None
+    """
+    if confidence < MIN_CONFIDENCE:
+        return None
+    return (matcher or _matcher).classify(clean_item_text(text))
+
+
+def split_words(text, separators, split_chars):
+    """
+    Split text into unique Chinese words, keeping first-seen order
+    Args:
+        text (str): OCR text
+        separators (re.Pattern): Word separator pattern
+        split_chars (bool): Break 3+ char groups into individual chars (practice)
+                            instead of keeping phrases intact (reading)
+    Returns:
+        list: Chinese words
+    """
+    words = {}
+    for word in separators.split(text):
+        clean_word = NON_CHINESE_RE.sub('', word)
+        if not clean_word:
+            continue
+        if split_chars and len(clean_word) > 2:
+            for ch in clean_word:
+                words.setdefault(ch)
+        else:
+            words.setdefault(clean_word)
+    return list(words)
+
+
+def apply_ocr_corrections(vocab_list):
+    """Fix common OCR misreads"""
+    correct = _matcher.correct
+    return list(dict.fromkeys(correct(word) for word in vocab_list))
+
+
+def extract_chinese_phrases_from_text(text):
+    """Extract Chinese phrases keeping multi-char words intact (for reading/spoken vocab)"""
+    return split_words(text, TEXT_SPLIT_RE, split_chars=False)
+
+
+def extract_chinese_words_from_text(text):
+    """Extract individual Chinese characters from text (for practice)"""
+    return split_words(text, TEXT_SPLIT_RE, split_chars=True)
+
+
+def _box_top(bbox):
+    return min(point[1] for point in bbox)
+
+
+def _scan_ocr_result(ocr_result, dump=False):
+    """
+    One pass over the raw OCR result
+    Returns:
+        tuple: (text_items sorted top to bottom, vocabulary_lines in OCR order,
+                raw text dump or None when dump is off)
+    """
+    text_items = []
+    vocabulary_lines = []
+    all_raw_text = [] if dump else None
+
+    for bbox, text, confidence in ocr_result:
+        if dump:
+            all_raw_text.append(f"{text}({confidence:.2f})")
+
+        # A vocab line looks like: "我。快乐。眼晴。耳朵。鼻子" or "小。大。长大。人。水。吃"
+        period_count = text.count('。') + text.count('、')
+        if period_count >= 3 and len(CHINESE_CHAR_RE.findall(text)) >= 4:
+            vocabulary_lines.append({'text': text, 'confidence': confidence})
+            log.debug("Found vocabulary line: %s (confidence: %.2f)", text, confidence)
+
+        if confidence >= MIN_CONFIDENCE:
+            cleaned_text = clean_item_text(text)
+            if cleaned_text:
+                text_items.append({
+                    'text': cleaned_text,
+                    'original': text,
+                    'y': _box_top(bbox),
+                    'kind': classify_text(cleaned_text)
+                })
+
+    # Stable sort: boxes on the same line keep their OCR order
+    text_items.sort(key=lambda item: item['y'])
+    return text_items, vocabulary_lines, all_raw_text
+
+
+def _assign_vocab_lines(text_items, vocabulary_lines):
+    """
+    Decide for each vocabulary line whether it is spoken (True) or practice (False)
+    With both headers found, a line goes by the top of the first box (top to bottom)
+    that is the line itself or whose cleaned text contains it. Without them, every
+    line but the last is spoken (repeated lines count at their first occurrence).
+    """
+    spoken_header_y = None
+    practice_header_y = None
+    for item in text_items:
+        if item['kind'] == 'spoken':
+            spoken_header_y = item['y']
+            log.debug("Found spoken header at y=%s: %s", item['y'], item['text'])
+        elif item['kind'] == 'practice':
+            practice_header_y = item['y']
+            log.debug("Found practice header at y=%s: %s", item['y'], item['text'])
+
+    if spoken_header_y is None or practice_header_y is None:
+        first_index = {}
+        for index, line in enumerate(vocabulary_lines):
+            first_index.setdefault((line['text'], line['confidence']), index)
+        last = len(vocabulary_lines) - 1
+        return [first_index[(line['text'], line['confidence'])] < last for line in vocabulary_lines]
+
+    first_exact = {}
+    starts = []
+    offset = 0
+    for index, item in enumerate(text_items):
+        first_exact.setdefault(item['original'], index)
+        starts.append(offset)
+        offset += len(item['text']) + len(_HAYSTACK_SEP)
+    haystack = _HAYSTACK_SEP.join(item['text'] for item in text_items)
+
+    assignments = []
+    for line in vocabulary_lines:
+        text = line['text']
+        index = first_exact.get(text)
+        if _HAYSTACK_SEP not in text:
+            # Only a box above the exact match can win
+            pos = haystack.find(text, 0, starts[index] if index is not None else len(haystack))
+            if pos != -1:
+                index = bisect_right(starts, pos) - 1
+        assignments.append(True if index is None else text_items[index]['y'] < practice_header_y)
+    return assignments
+
+
+def parse_vocabulary_from_ocr(ocr_result):
+    """
+    Parse EasyOCR result to extract vocabulary from specific sections
+    EasyOCR format: [(bbox, text, confidence), ...]
+    Returns: {
+        "spoken_vocab": [...],   # 口语表达词汇
+        "practice_vocab": [...], # 识读词语
+        "debug_info": {...}      # For debugging
+    }
+    """
+    if not ocr_result:
+        return {
+            "spoken_vocab": [],
+            "practice_vocab": [],
+            "debug_info": {"error": "No OCR result"}
+        }
+
+    # Only build the big dumps for sampled requests at DEBUG
+    dump = dump_enabled(log)
+    text_items, vocabulary_lines, all_raw_text = _scan_ocr_result(ocr_result, dump)
+    log.debug("Found %d vocabulary lines in %d OCR boxes", len(vocabulary_lines), len(ocr_result))
+
+    spoken_vocab = {}
+    practice_vocab = {}
+
+    # Direct extraction from period-separated vocabulary lines
+    if vocabulary_lines:
+        for line, is_spoken in zip(vocabulary_lines, _assign_vocab_lines(text_items, vocabulary_lines)):
+            if is_spoken:
+                # Reading: keep phrases intact
+                words = split_words(line['text'], VOCAB_LINE_SPLIT_RE, split_chars=False)
+                spoken_vocab.update(dict.fromkeys(words))
+            else:
+                # Practice: split into individual characters
+                words = split_words(line['text'], VOCAB_LINE_SPLIT_RE, split_chars=True)
+                practice_vocab.update(dict.fromkeys(words))
+
+        if dump:
+            log.debug("Direct extraction results - spoken: %s, practice: %s", list(spoken_vocab), list(practice_vocab))
+
+        if spoken_vocab and practice_vocab:
+            return {
+                "spoken_vocab": apply_ocr_corrections(spoken_vocab),
+                "practice_vocab": apply_ocr_corrections(practice_vocab),
+                "debug_info": {
+                    "total_text_items": len(text_items),
+                    "vocabulary_lines_found": len(vocabulary_lines),
+                    "extraction_method": "direct_vocabulary_lines",
+                    "spoken_section_found": True,
+                    "practice_section_found": True
+                }
+            }
+        log.debug("One section empty from vocab lines, falling through to section-based parsing")
+
+    full_text = ''.join(item['text'] for item in text_items)
+    if dump:
+        log.debug("EasyOCR raw results: %s", all_raw_text)
+        log.debug("EasyOCR full text (%d high-confidence items): %s", len(text_items), full_text)
+
+    # Section-based parsing (preserves any vocab already found from vocabulary lines)
+    spoken_section_found = bool(spoken_vocab)
+    practice_section_found = bool(practice_vocab)
+    current_section = None
+
+    for item in text_items:
+        kind = item['kind']
+        if kind == 'spoken':
+            spoken_section_found = True
+            log.debug("Found spoken section header: %s", item['text'])
+        elif kind == 'practice':
+            practice_section_found = True
+            log.debug("Found practice section header: %s", item['text'])
+        elif kind == 'end':
+            log.debug("Found end section: %s", item['text'])
+        elif current_section == 'spoken':
+            spoken_vocab.update(dict.fromkeys(extract_chinese_phrases_from_text(item['text'])))
+            continue
+        elif current_section == 'practice':
+            practice_vocab.update(dict.fromkeys(extract_chinese_words_from_text(item['text'])))
+            continue
+        else:
+            continue
+        current_section = kind if kind != 'end' else None
+
+    spoken_vocab = list(spoken_vocab)
+    practice_vocab = list(practice_vocab)
+
+    # If no sections found, try pattern-based extraction
+    if not spoken_section_found and not practice_section_found:
+        log.info("No sections found, using fallback extraction")
+        spoken_vocab, practice_vocab = fallback_vocabulary_extraction(full_text)
+
+    log.debug("Section parsing: spoken section %s, practice section %s, %d spoken / %d practice words",
+              spoken_section_found, practice_section_found, len(spoken_vocab), len(practice_vocab))
+    if dump:
+        log.debug("Section parsing results - spoken: %s, practice: %s", spoken_vocab, practice_vocab)
+
+    return {
+        "spoken_vocab": apply_ocr_corrections(spoken_vocab),
+        "practice_vocab": apply_ocr_corrections(practice_vocab),
+        "debug_info": {
+            "total_text_items": len(text_items),
+            "spoken_section_found": spoken_section_found,
+            "practice_section_found": practice_section_found,
+            "full_text": full_text[:200] + "..." if len(full_text) > 200 else full_text
+        }
+    }
+
+
+def fallback_vocabulary_extraction(text):
+    """Fallback extraction when sections are not clearly identified"""
+
+    # Based on the actual worksheet image, extract all visible vocabulary
+    # These are the actual words visible in the worksheet sections
+    worksheet_spoken = ['衣服', '小', '大', '长大', '爷爷', '奶奶', '客人', '爸爸', '妈妈', '我', '新年', '大扫除', '拜年', '谢谢']
+    worksheet_practice = ['小', '大', '长大', '人', '吃', '喝', '和']
+
+    # Extract all Chinese words from the text first
+    all_chinese_words = re.findall(r'[\u4e00-\u9fff]+', text)
+
+    # Find matches with the known worksheet vocabulary
+    spoken_found = [word for word in worksheet_spoken if word in text]
+    practice_found = [word for word in worksheet_practice if word in text]
+
+    # Also add any other Chinese words that might be vocabulary (2+ characters)
+    spoken_seen = set(spoken_found)
+    practice_seen = set(practice_found)
+    additional_words = [word for word in all_chinese_words
+                        if len(word) >= 2 and word not in spoken_seen and word not in practice_seen]
+
+    # Categorize additional words (longer words likely go to spoken vocab)
+    for word in additional_words:
+        if len(word) >= 3 or word in ('新年', '客人', '衣服'):
+            if word not in spoken_seen:
+                spoken_seen.add(word)
+                spoken_found.append(word)
+        else:
+            if word not in practice_seen:
+                practice_seen.add(word)
+                practice_found.append(word)
+
+    if dump_enabled(log):
+        log.debug("Fallback extraction from %s... - spoken: %s, practice: %s", text[:200], spoken_found, practice_found)
+
+    return spoken_found, practice_found
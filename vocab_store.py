@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Storage backends for saved unit vocabulary
+- JSONVocabStore: one saved_vocab/Unit_N.json per unit (the original layout),
+  now written atomically so readers never see a half-written file
+- SQLiteVocabStore: embedded SQLite database in WAL mode with units, vocab
+  items and source-image metadata, indexed by unit name
+
+Both expose save_unit / load_unit / list_units / delete_unit. Units are looked
+up by key = unit name with spaces replaced by underscores ("Unit 1" -> "Unit_1").
+
+One-shot migration of existing JSON files into SQLite:
+    python vocab_store.py migrate saved_vocab vocab.db
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+from unit_catalog import UnitCatalog
+
+SECTIONS = ('spoken_vocab', 'practice_vocab')
+
+
+def unit_key(unit_name):
+    """Storage key for a unit name (also its JSON file stem)"""
+    return unit_name.replace(' ', '_')
+
+
+class JSONVocabStore:
+    """Units stored as pretty-printed JSON files, listed through an in-memory UnitCatalog"""
+
+    def __init__(self, vocab_folder, revalidate_seconds=30):
+        self.vocab_folder = vocab_folder
+        os.makedirs(vocab_folder, exist_ok=True)
+        self.catalog = UnitCatalog(vocab_folder, revalidate_seconds=revalidate_seconds)
+
+    def _path(self, name):
+        return os.path.join(self.vocab_folder, f"{unit_key(name)}.json")
+
+    def save_unit(self, unit_data, image_meta=None):
+        """
+        Atomically write a unit (temp file + rename)
+        Returns:
+            str: Path of the unit file
+        """
+        vocab_path = self._path(unit_data['unit_name'])
+        tmp_path = f"{vocab_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(unit_data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, vocab_path)
+        self.catalog.update(os.path.basename(vocab_path), unit_data)
+        return vocab_path
+
+    def load_unit(self, name):
+        """Returns the unit dict, or None if it does not exist"""
+        try:
+            with open(self._path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list_units(self):
+        return self.catalog.list_units()
+
+    def delete_unit(self, name):
+        vocab_path = self._path(name)
+        try:
+            os.remove(vocab_path)
+        except FileNotFoundError:
+            return False
+        self.catalog.remove(os.path.basename(vocab_path))
+        return True
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    unit_key TEXT NOT NULL UNIQUE,
+    unit_name TEXT NOT NULL,
+    unit_chinese TEXT NOT NULL DEFAULT '',
+    image_filename TEXT NOT NULL DEFAULT '',
+    saved_at TEXT NOT NULL DEFAULT '',
+    spoken_count INTEGER NOT NULL DEFAULT 0,
+    practice_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS vocab_items (
+    unit_id INTEGER NOT NULL REFERENCES units(id) ON DELETE CASCADE,
+    section TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    PRIMARY KEY (unit_id, section, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS images (
+    filename TEXT PRIMARY KEY,
+    sha256 TEXT,
+    size_bytes INTEGER,
+    width INTEGER,
+    height INTEGER,
+    uploaded_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_vocab_items_word ON vocab_items(word);
+"""
+
+
+class SQLiteVocabStore:
+    """Units in an embedded SQLite database (WAL mode, one connection per thread)"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._listing = None
+        self._listing_version = None
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        # Only used under _lock, to read the listing and the data_version it was read at
+        self._listing_conn = sqlite3.connect(db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._listing_conn.row_factory = sqlite3.Row
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def save_unit(self, unit_data, image_meta=None):
+        """
+        Insert or replace a unit and its vocabulary in one transaction
+        Args:
+            unit_data (dict): unit_name, unit_chinese, spoken_vocab, practice_vocab, image_filename, saved_at
+            image_meta (dict): Optional source image metadata (filename, sha256, size_bytes, width, height, uploaded_at)
+        Returns:
+            str: The unit key
+        """
+        key = unit_key(unit_data['unit_name'])
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                """INSERT INTO units (unit_key, unit_name, unit_chinese, image_filename, saved_at, spoken_count, practice_count)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(unit_key) DO UPDATE SET
+                       unit_name=excluded.unit_name, unit_chinese=excluded.unit_chinese,
+                       image_filename=excluded.image_filename, saved_at=excluded.saved_at,
+                       spoken_count=excluded.spoken_count, practice_count=excluded.practice_count""",
+                (key, unit_data['unit_name'], unit_data.get('unit_chinese', ''), unit_data.get('image_filename', ''),
+                 unit_data.get('saved_at', ''), len(unit_data.get('spoken_vocab', [])),
+                 len(unit_data.get('practice_vocab', []))))
+            unit_id = conn.execute('SELECT id FROM units WHERE unit_key = ?', (key,)).fetchone()['id']
+            conn.execute('DELETE FROM vocab_items WHERE unit_id = ?', (unit_id,))
+            conn.executemany(
+                'INSERT INTO vocab_items (unit_id, section, position, word) VALUES (?, ?, ?, ?)',
+                [(unit_id, section, position, word)
+                 for section in SECTIONS
+                 for position, word in enumerate(unit_data.get(section, []))])
+            if image_meta and image_meta.get('filename'):
+                conn.execute(
+                    """INSERT OR REPLACE INTO images (filename, sha256, size_bytes, width, height, uploaded_at)
+                       VALUES (:filename, :sha256, :size_bytes, :width, :height, :uploaded_at)""",
+                    {field: image_meta.get(field) for field in
+                     ('filename', 'sha256', 'size_bytes', 'width', 'height', 'uploaded_at')})
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._invalidate_listing()
+        return key
+
+    def load_unit(self, name):
+        """Returns the unit dict (same shape as the JSON files), or None"""
+        conn = self._connect()
+        # One read transaction so the unit row and its items are consistent
+        conn.execute('BEGIN')
+        try:
+            row = conn.execute('SELECT * FROM units WHERE unit_key = ?', (unit_key(name),)).fetchone()
+            if row is None:
+                return None
+            unit_data = {
+                'unit_name': row['unit_name'],
+                'unit_chinese': row['unit_chinese'],
+                'spoken_vocab': [],
+                'practice_vocab': [],
+                'image_filename': row['image_filename'],
+                'saved_at': row['saved_at']
+            }
+            for item in conn.execute('SELECT section, word FROM vocab_items WHERE unit_id = ? ORDER BY section, position',
+                                     (row['id'],)):
+                unit_data[item['section']].append(item['word'])
+            return unit_data
+        finally:
+            conn.execute('COMMIT')
+
+    def _invalidate_listing(self):
+        with self._lock:
+            self._listing = None
+
+    def list_units(self):
+        """
+        Unit summaries sorted by key, cached in memory
+        Our own writes drop the cache directly. Every other commit (another
+        thread's connection, another store or process) is noticed through
+        PRAGMA data_version on one dedicated connection, which changes whenever
+        any other connection commits; the cache keeps the value it was read at.
+        """
+        with self._lock:
+            data_version = self._listing_conn.execute('PRAGMA data_version').fetchone()[0]
+            if self._listing is None or self._listing_version != data_version:
+                self._listing = [
+                    {
+                        'unit_name': row['unit_name'],
+                        'unit_chinese': row['unit_chinese'],
+                        'spoken_count': row['spoken_count'],
+                        'practice_count': row['practice_count'],
+                        'image_filename': row['image_filename']
+                    }
+                    for row in self._listing_conn.execute('SELECT * FROM units ORDER BY unit_key')
+                ]
+                self._listing_version = data_version
+            return self._listing
+
+    def delete_unit(self, name):
+        conn = self._connect()
+        cursor = conn.execute('DELETE FROM units WHERE unit_key = ?', (unit_key(name),))
+        self._invalidate_listing()
+        return cursor.rowcount > 0
+
+    def image_metadata(self, filename):
+        """Stored metadata for a source image, or None"""
+        row = self._connect().execute('SELECT * FROM images WHERE filename = ?', (filename,)).fetchone()
+        return dict(row) if row else None
+
+    def count_units(self):
+        return self._connect().execute('SELECT COUNT(*) FROM units').fetchone()[0]
+
+
+def migrate_json_to_sqlite(vocab_folder, store):
+    """
+    Copy every saved_vocab/*.json unit into a SQLiteVocabStore
+    Returns:
+        int: Number of units migrated
+    """
+    migrated = 0
+    for fname in sorted(os.listdir(vocab_folder)):
+        if not fname.endswith('.json'):
+            continue
+        with open(os.path.join(vocab_folder, fname), 'r', encoding='utf-8') as f:
+            unit_data = json.load(f)
+        unit_data.setdefault('unit_name', fname[:-len('.json')].replace('_', ' '))
+        store.save_unit(unit_data)
+        migrated += 1
+    return migrated
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'migrate':
+        print(__doc__)
+        sys.exit(1)
+    started = time.time()
+    count = migrate_json_to_sqlite(sys.argv[2], SQLiteVocabStore(sys.argv[3]))
+    print(f"Migrated {count} units from {sys.argv[2]} to {sys.argv[3]} in {time.time() - started:.2f}s")